@@ -3,10 +3,14 @@ from django.urls import path
 from django.http import JsonResponse
 from django.utils.html import format_html
 from django import forms
-from .models import Empresa, CuentaContable, Factura, Concepto, Poliza, MovimientoPoliza, UsuarioEmpresa, PlantillaPoliza, PlantillaPoliza
+from .models import Empresa, CuentaContable, Factura, Concepto, Poliza, MovimientoPoliza, UsuarioEmpresa, PlantillaPoliza, ReglaClasificacion
 from .forms import MovimientoPolizaFormSet
 from decimal import Decimal
-from satcfdi.cfdi import CFDI
+from .services.cfdi_fast_parser import extraer_cfdi
+from django.contrib.admin.views.main import ChangeList, ORDER_VAR
+from django.db.models import DecimalField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from .utils.paginacion import PARAM_ANTES, PARAM_DESPUES, PaginadorConteoAproximado, PaginadorKeyset
 import logging
 
 logger = logging.getLogger(__name__)
@@ -54,6 +58,73 @@ class EmpresaFilterMixin:
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
 
+# --- Paginación por cursor en changelists grandes ---
+class KeysetChangeList(ChangeList):
+    """
+    Changelist paginado por cursor sobre model_admin.keyset_campos (descendente)
+    con conteo aproximado. Al ordenar por otra columna (?o=), con "mostrar todo"
+    o con list_editable vuelve a la paginación por páginas de Django.
+    """
+    CURSORES = (PARAM_DESPUES, PARAM_ANTES)
+    pagina_keyset = None
+
+    def __init__(self, request, *args, **kwargs):
+        self.cursores = {param: request.GET.get(param) for param in self.CURSORES}
+        super().__init__(request, *args, **kwargs)
+
+    @property
+    def usa_keyset(self):
+        return not self.params.get(ORDER_VAR) and not self.show_all and not self.list_editable
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        for param in self.CURSORES:
+            lookup_params.pop(param, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Filtros, búsquedas y ordenamientos empiezan en la primera página
+        return super().get_query_string(new_params, list(remove or []) + list(self.CURSORES))
+
+    def get_results(self, request):
+        if not self.usa_keyset:
+            return super().get_results(request)
+
+        paginador = PaginadorKeyset(
+            self.queryset, self.list_per_page, self.model_admin.keyset_campos, descendente=True
+        )
+        pagina = paginador.pagina(**self.cursores)
+        self.result_count = paginador.count
+        self.full_result_count = None
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.result_list = pagina.object_list
+        self.can_show_all = False
+        self.multi_page = pagina.has_other_pages()
+        self.paginator = paginador
+        self.pagina_keyset = pagina
+        self.url_primera = self.get_query_string()
+        self.url_anterior = self.get_query_string({PARAM_ANTES: pagina.cursor_anterior}) if pagina.has_previous() else None
+        self.url_siguiente = self.get_query_string({PARAM_DESPUES: pagina.cursor_siguiente}) if pagina.has_next() else None
+
+
+class KeysetAdminMixin:
+    """
+    Usa KeysetChangeList; el modelo necesita un índice sobre keyset_campos.
+    Sin conteos completos: el total es aproximado (también al paginar por
+    números) y los filtros no muestran facetas (un COUNT por opción).
+    """
+    keyset_campos = ('fecha', 'id')
+    ordering = ('-fecha', '-id')
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+    paginator = PaginadorConteoAproximado
+    change_list_template = 'admin/core/change_list_keyset.html'
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+
 @admin.register(UsuarioEmpresa)
 class UsuarioEmpresaAdmin(admin.ModelAdmin):
     list_display = ('usuario', 'empresa', 'rol')
@@ -62,8 +133,29 @@ class UsuarioEmpresaAdmin(admin.ModelAdmin):
 
 @admin.register(Empresa)
 class EmpresaAdmin(EmpresaFilterMixin, admin.ModelAdmin):
-    list_display = ('nombre', 'rfc', 'regimen_fiscal', 'fecha_creacion')
+    list_display = ('nombre', 'rfc', 'regimen_fiscal', 'contabilizacion_automatica', 'fecha_creacion')
+    list_filter = ('contabilizacion_automatica',)
     search_fields = ('nombre', 'rfc')
+    readonly_fields = ('estado_inicializacion',)
+
+    def estado_inicializacion(self, obj):
+        from .services.inicializacion_empresa import InicializacionEmpresa
+        task = InicializacionEmpresa.ultima_tarea(obj.pk) if obj.pk else None
+        if task is None:
+            return '-'
+        payload = task.payload or {}
+        pasos = ', '.join(
+            f"{p} {'✓' if p in payload.get('completados', []) else '…'}" for p in payload.get('pasos', [])
+        )
+        return f"{task.get_status_display()} (tarea {task.id}): {pasos}"
+    estado_inicializacion.short_description = 'Inicialización'
+
+@admin.register(ReglaClasificacion)
+class ReglaClasificacionAdmin(EmpresaFilterMixin, admin.ModelAdmin):
+    list_display = ('tipo', 'patron', 'cuenta_codigo', 'empresa', 'prioridad', 'activa')
+    list_filter = ('tipo', 'activa', 'empresa')
+    list_editable = ('prioridad', 'activa')
+    search_fields = ('patron', 'cuenta_codigo')
 
 @admin.register(CuentaContable)
 class CuentaContableAdmin(EmpresaFilterMixin, admin.ModelAdmin):
@@ -77,12 +169,14 @@ class ConceptoInline(admin.TabularInline):
     readonly_fields = ('descripcion', 'importe', 'clave_prod_serv')
 
 @admin.register(Factura)
-class FacturaAdmin(EmpresaFilterMixin, admin.ModelAdmin):
+class FacturaAdmin(KeysetAdminMixin, EmpresaFilterMixin, admin.ModelAdmin):
     list_display = ('uuid', 'empresa', 'fecha', 'emisor_nombre', 'total', 'tipo_comprobante')
     list_filter = ('empresa', 'tipo_comprobante', 'fecha')
+    list_select_related = ('empresa',)
     search_fields = ('uuid', 'emisor_nombre', 'empresa__nombre')
     inlines = [ConceptoInline]
-    date_hierarchy = 'fecha'
+    # Sin date_hierarchy: arma su barra con SELECT DISTINCT sobre toda la tabla;
+    # el filtro 'fecha' cubre los mismos periodos
     
     class Media:
         js = ('admin/js/factura_admin.js',)
@@ -105,63 +199,23 @@ class FacturaAdmin(EmpresaFilterMixin, admin.ModelAdmin):
             return JsonResponse({'error': 'No XML file'}, status=400)
             
         try:
-            cfdi = CFDI.from_file(xml_file)
-            xml_file.seek(0)
-            
-            def get_val(node, key):
-                if hasattr(node, key.lower()): return getattr(node, key.lower()) 
-                if isinstance(node, dict): return node.get(key)
-                try: return node[key]
-                except: return None
-            
-            uuid_str = None
-            if hasattr(cfdi, 'complemento') and cfdi.complemento:
-                tfd = getattr(cfdi.complemento, 'timbre_fiscal_digital', None)
-                if tfd: uuid_str = tfd.uuid
-            if not uuid_str:
-                try: uuid_str = cfdi['Complemento']['TimbreFiscalDigital']['UUID']
-                except: pass
-
-            raw_fecha = get_val(cfdi, 'Fecha')
-            fecha_str = ''
-            hora_str = '00:00:00'
-            
-            if raw_fecha:
-                s_fecha = str(raw_fecha)
-                if 'T' in s_fecha:
-                    fecha_part, hora_part = s_fecha.split('T')
-                    fecha_str = fecha_part
-                    hora_str = hora_part[:8]
-                else:
-                    fecha_str = s_fecha[:10]
-                    if len(s_fecha) > 10:
-                        hora_str = s_fecha[11:19]
+            datos = extraer_cfdi(xml_file)
             
+            fecha = datos['fecha']
             comprobante_data = {
-                'uuid': uuid_str,
-                'fecha': fecha_str,
-                'hora': hora_str,
-                'subtotal': float(get_val(cfdi, 'SubTotal') or 0),
-                'descuento': float(get_val(cfdi, 'Descuento') or 0),
-                'total': float(get_val(cfdi, 'Total') or 0),
+                'uuid': datos['uuid'],
+                'fecha': fecha.strftime('%Y-%m-%d') if fecha else '',
+                'hora': fecha.strftime('%H:%M:%S') if fecha else '00:00:00',
+                'subtotal': float(datos['subtotal']),
+                'descuento': float(datos['descuento']),
+                'total': float(datos['total']),
+                'tipo_comprobante': datos['tipo_comprobante'],
+                'emisor_rfc': datos['emisor'].get('rfc'),
+                'emisor_nombre': datos['emisor'].get('nombre'),
+                'receptor_rfc': datos['receptor'].get('rfc'),
+                'receptor_nombre': datos['receptor'].get('nombre'),
             }
 
-            raw_tipo = str(get_val(cfdi, 'TipoDeComprobante')).upper().strip()
-            if raw_tipo.startswith('I'): tipo_norm = 'I'
-            elif raw_tipo.startswith('E'): tipo_norm = 'E'
-            elif raw_tipo.startswith('P'): tipo_norm = 'P'
-            elif raw_tipo.startswith('N'): tipo_norm = 'N'
-            elif raw_tipo.startswith('T'): tipo_norm = 'T'
-            else: tipo_norm = raw_tipo
-            comprobante_data['tipo_comprobante'] = tipo_norm
-
-            emisor = get_val(cfdi, 'Emisor')
-            receptor = get_val(cfdi, 'Receptor')
-            comprobante_data['emisor_rfc'] = get_val(emisor, 'Rfc')
-            comprobante_data['emisor_nombre'] = get_val(emisor, 'Nombre')
-            comprobante_data['receptor_rfc'] = get_val(receptor, 'Rfc')
-            comprobante_data['receptor_nombre'] = get_val(receptor, 'Nombre')
-
             naturaleza = 'C'
             if empresa_id:
                 try:
@@ -180,17 +234,8 @@ class FacturaAdmin(EmpresaFilterMixin, admin.ModelAdmin):
             
             comprobante_data['naturaleza'] = naturaleza
             
-            impuestos = get_val(cfdi, 'Impuestos')
-            total_tr = 0
-            total_ret = 0
-            if impuestos:
-                try: total_tr = float(get_val(impuestos, 'TotalImpuestosTrasladados') or 0)
-                except: pass
-                try: total_ret = float(get_val(impuestos, 'TotalImpuestosRetenidos') or 0)
-                except: pass
-
-            comprobante_data['total_tr'] = total_tr
-            comprobante_data['total_ret'] = total_ret
+            comprobante_data['total_tr'] = float(datos['total_impuestos_trasladados'])
+            comprobante_data['total_ret'] = float(datos['total_impuestos_retenidos'])
 
             return JsonResponse(comprobante_data)
 
@@ -203,10 +248,32 @@ class MovimientoInline(admin.TabularInline):
     formset = MovimientoPolizaFormSet
 
 @admin.register(Poliza)
-class PolizaAdmin(EmpresaFilterMixin, admin.ModelAdmin):
+class PolizaAdmin(KeysetAdminMixin, EmpresaFilterMixin, admin.ModelAdmin):
     list_display = ('id', 'factura', 'fecha', 'descripcion', 'total_debe', 'total_haber')
     list_filter = ('factura__empresa', 'fecha')
+    list_select_related = ('factura',)
     inlines = [MovimientoInline]
+
+    def get_queryset(self, request):
+        # Totales como subconsultas por póliza: solo se calculan para las filas de la página
+        def suma(campo):
+            return Coalesce(
+                Subquery(
+                    MovimientoPoliza.objects.filter(poliza=OuterRef('pk')).order_by()
+                    .values('poliza').annotate(total=Sum(campo)).values('total')
+                ),
+                Decimal('0'),
+                output_field=DecimalField(max_digits=14, decimal_places=2),
+            )
+        return super().get_queryset(request).annotate(debe_total=suma('debe'), haber_total=suma('haber'))
+
+    @admin.display(description='Total debe', ordering='debe_total')
+    def total_debe(self, obj):
+        return obj.debe_total
+
+    @admin.display(description='Total haber', ordering='haber_total')
+    def total_haber(self, obj):
+        return obj.haber_total
     
     class Media:
         js = ('admin/js/poliza_admin.js',)
@@ -255,11 +322,28 @@ class PlantillaPolizaAdmin(EmpresaFilterMixin, admin.ModelAdmin):
 from .models import BackgroundTask
 
 
+class TipoTareaFilter(admin.SimpleListFilter):
+    """Tipos de tarea registrados (el filtro por defecto hace SELECT DISTINCT sobre toda la tabla)."""
+    title = 'task type'
+    parameter_name = 'task_type'
+
+    def lookups(self, request, model_admin):
+        from .tasks import TASK_HANDLERS
+        return [(tipo, tipo) for tipo in sorted(TASK_HANDLERS)]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(task_type=self.value())
+        return queryset
+
+
 @admin.register(BackgroundTask)
-class BackgroundTaskAdmin(admin.ModelAdmin):
+class BackgroundTaskAdmin(KeysetAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'task_type', 'status', 'attempts', 'created_at', 'started_at', 'finished_at')
-    list_filter = ('task_type', 'status')
-    search_fields = ('task_type',)
+    list_filter = (TipoTareaFilter, 'status')
+    keyset_campos = ('created_at', 'id')
+    ordering = ('-created_at', '-id')
+    search_fields = ('task_type', 'dedup_key')
     readonly_fields = ('created_at', 'started_at', 'finished_at', 'error')
     actions = ['retry_task']
 
@@ -272,5 +356,17 @@ class BackgroundTaskAdmin(admin.ModelAdmin):
                 if task.task_type == 'contabilizar_factura' and payload.get('factura_uuid'):
                     enqueue_contabilizar(payload.get('factura_uuid'), payload.get('usuario_id'))
                     retried += 1
+                elif task.task_type in (
+                    'validar_sat', 'ingestar_xml', 'contabilizar_lote', 'aplicar_cancelaciones', 'inicializar_empresa',
+                ):
+                    if task.dedup_key and BackgroundTask.objects.filter(
+                        dedup_key=task.dedup_key, status__in=('PENDING', 'IN_PROGRESS')
+                    ).exclude(pk=task.pk).exists():
+                        # Ya hay otra tarea activa con la misma clave
+                        continue
+                    # Reanuda desde el checkpoint (payload / archivos pendientes)
+                    task.status = 'PENDING'
+                    task.save(update_fields=['status'])
+                    retried += 1
         self.message_user(request, f"{retried} tarea(s) re-encolada(s)")
     retry_task.short_description = 'Re-enqueue selected tasks'
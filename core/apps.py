@@ -1,4 +1,14 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def _asegurar_particiones(sender, using='default', **kwargs):
+    """Crea las particiones de MovimientoPoliza del año en curso y siguientes (solo PostgreSQL)."""
+    from django.db import connections
+    from core.models import MovimientoPoliza
+    from core.utils.particiones import asegurar_particiones
+
+    asegurar_particiones(connections[using], MovimientoPoliza._meta.db_table)
 
 
 class CoreConfig(AppConfig):
@@ -8,3 +18,4 @@ class CoreConfig(AppConfig):
     def ready(self):
         """Importar signals cuando la app esté lista"""
         import core.signals  # noqa
+        post_migrate.connect(_asegurar_particiones, sender=self)
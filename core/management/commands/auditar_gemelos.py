@@ -19,7 +19,8 @@ Fecha: 2025-12-15
 from django.core.management.base import BaseCommand
 from django.db import transaction
 from django.db.models import Count
-from core.models import Factura, Poliza, MovimientoPoliza
+from core.models import Factura, Poliza
+from core.services.eliminacion_masiva import EliminacionMasiva
 from core.services.sat_status import SatStatusValidator
 from decimal import Decimal
 from datetime import timedelta
@@ -119,6 +120,7 @@ class Command(BaseCommand):
         
         for idx, grupo in enumerate(gemelos_encontrados, 1):
             self.stdout.write(f'\n\n📋 Grupo {idx}/{len(gemelos_encontrados)}:')
+            canceladas_ids = []
             self.stdout.write(f'   Monto: ${grupo[0].subtotal:,.2f}')
             self.stdout.write(f'   Facturas: {len(grupo)}')
             
@@ -143,21 +145,13 @@ class Command(BaseCommand):
                     # Buscar pólizas
                     polizas = Poliza.objects.filter(factura=factura)
                     
-                    if polizas.exists():
-                        polizas_count = polizas.count()
+                    polizas_count = polizas.count()
+                    if polizas_count:
                         self.stdout.write(f'         └─ Eliminando {polizas_count} póliza(s)...')
-                        
-                        if not dry_run:
-                            # Eliminar movimientos
-                            MovimientoPoliza.objects.filter(poliza__in=polizas).delete()
-                            # Eliminar pólizas
-                            polizas.delete()
-                            # Actualizar estado
-                            factura.estado_contable = 'EXCLUIDA'
-                            factura.save()
-                        
                         total_polizas_eliminadas += polizas_count
                     
+                    # Pólizas, movimientos y estado EXCLUIDA se aplican en bloque por grupo
+                    canceladas_ids.append(factura.id)
                     total_canceladas += 1
                     suma_descontada += factura.subtotal
                     
@@ -173,6 +167,9 @@ class Command(BaseCommand):
                     self.stdout.write(self.style.WARNING(
                         f'      ⚠️  Error al consultar: {mensaje}'
                     ))
+            
+            if not dry_run and canceladas_ids:
+                EliminacionMasiva.descontabilizar(canceladas_ids, estado='EXCLUIDA')
         
         # RESUMEN FINAL
         self.stdout.write(self.style.SUCCESS('\n\n' + '=' * 70))
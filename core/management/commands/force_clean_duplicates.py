@@ -21,7 +21,8 @@ Fecha: 2025-12-15
 from django.core.management.base import BaseCommand
 from django.db import transaction
 from django.db.models import Count
-from core.models import Factura, Poliza, MovimientoPoliza
+from core.models import Factura, Poliza
+from core.services.eliminacion_masiva import EliminacionMasiva
 from decimal import Decimal
 import logging
 
@@ -101,6 +102,12 @@ class Command(BaseCommand):
         total_eliminadas = 0
         polizas_eliminadas = 0
         suma_eliminada = Decimal('0.00')
+        ids_a_eliminar = []
+        con_poliza = set(
+            Poliza.objects.filter(
+                factura_id__in=[f.id for grupo in grupos_con_duplicados.values() for f in grupo]
+            ).values_list('factura_id', flat=True)
+        )
         
         for idx, (clave, grupo) in enumerate(grupos_con_duplicados.items(), 1):
             # Ordenar por ID (la última es la más reciente)
@@ -122,23 +129,21 @@ class Command(BaseCommand):
             for factura in facturas_a_eliminar:
                 self.stdout.write(f'   ❌ Eliminar: {factura.uuid} (ID: {factura.id})')
                 
-                # Eliminar pólizas
-                polizas = Poliza.objects.filter(factura=factura)
-                if polizas.exists():
-                    polizas_count = polizas.count()
-                    if not dry_run:
-                        MovimientoPoliza.objects.filter(poliza__in=polizas).delete()
-                        polizas.delete()
-                    polizas_eliminadas += polizas_count
-                    self.stdout.write(f'      └─ Eliminando {polizas_count} póliza(s)')
-                
-                # Eliminar factura
-                if not dry_run:
-                    factura.delete()
+                # Su póliza se elimina junto con la factura
+                if factura.id in con_poliza:
+                    polizas_eliminadas += 1
+                    self.stdout.write(f'      └─ Eliminando 1 póliza(s)')
                 
+                ids_a_eliminar.append(factura.id)
                 total_eliminadas += 1
                 suma_eliminada += factura.subtotal
         
+        # Eliminar facturas, pólizas y movimientos en bloque (con auditoría)
+        if not dry_run and ids_a_eliminar:
+            EliminacionMasiva.eliminar_facturas(
+                ids_a_eliminar, motivo='force_clean_duplicates: mismo total, fecha y emisor'
+            )
+        
         # RESUMEN FINAL
         self.stdout.write(self.style.SUCCESS('\n\n' + '=' * 70))
         self.stdout.write(self.style.SUCCESS('📊 RESUMEN'))
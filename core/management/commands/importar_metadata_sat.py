@@ -0,0 +1,105 @@
+"""
+Management Command: Importar Metadata SAT
+
+Actualiza estado_sat de forma masiva con el archivo de metadata de la
+descarga masiva del SAT (TXT o el .zip tal cual se descarga), sin hacer
+una sola consulta SOAP. Las facturas que resulten canceladas se encolan
+para descontabilizarse en el worker.
+
+Uso:
+    python manage.py importar_metadata_sat /ruta/metadata.zip
+    python manage.py importar_metadata_sat metadata.txt --empresa-rfc=ABC123456XYZ
+    python manage.py importar_metadata_sat metadata.txt --fecha-corte=2025-06-30 --dry-run
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from core.models import Empresa
+from core.services.sat_metadata import ImportadorMetadataSat
+import datetime
+import os
+import time
+
+
+class Command(BaseCommand):
+    help = 'Actualiza estado_sat en bloque desde metadata de descarga masiva SAT'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', type=str, help='TXT o ZIP de metadata SAT')
+        parser.add_argument(
+            '--empresa-rfc',
+            type=str,
+            help='Limitar la actualización a una empresa (opcional)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=ImportadorMetadataSat.BATCH_SIZE,
+            help='UUIDs por bloque de consulta/actualización',
+        )
+        parser.add_argument(
+            '--fecha-corte',
+            type=str,
+            help='Fecha de generación de la metadata (YYYY-MM-DD); default: ahora',
+        )
+        parser.add_argument(
+            '--sin-descontabilizar',
+            action='store_true',
+            help='Solo actualizar estado_sat, sin encolar eliminación de pólizas',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo reporta los cambios que se harían',
+        )
+
+    def handle(self, *args, **options):
+        archivo = options['archivo']
+        if not os.path.exists(archivo):
+            raise CommandError(f'No existe el archivo: {archivo}')
+
+        empresa_id = None
+        if options.get('empresa_rfc'):
+            empresa = Empresa.objects.filter(rfc=options['empresa_rfc']).first()
+            if not empresa:
+                raise CommandError(f"Empresa con RFC {options['empresa_rfc']} no encontrada")
+            empresa_id = empresa.id
+
+        fecha_corte = None
+        if options.get('fecha_corte'):
+            try:
+                fecha = datetime.datetime.strptime(options['fecha_corte'], '%Y-%m-%d')
+            except ValueError:
+                raise CommandError('--fecha-corte debe tener formato YYYY-MM-DD')
+            fecha_corte = timezone.make_aware(fecha)
+
+        importador = ImportadorMetadataSat(
+            empresa_id=empresa_id,
+            batch_size=options['batch_size'],
+            fecha_corte=fecha_corte,
+            descontabilizar=not options['sin_descontabilizar'],
+            dry_run=options['dry_run'],
+        )
+
+        self.stdout.write(f'📄 Importando metadata: {archivo}')
+        inicio = time.monotonic()
+        stats = importador.importar(archivo)
+        duracion = time.monotonic() - inicio
+
+        self.stdout.write(self.style.SUCCESS('\n✅ Importación completada'))
+        self.stdout.write(f"   Líneas leídas:           {stats['lineas']:,}")
+        self.stdout.write(f"   Líneas inválidas:        {stats['invalidas']:,}")
+        self.stdout.write(f"   UUIDs en BD:             {stats['coincidencias']:,}")
+        self.stdout.write(f"   UUIDs no registrados:    {stats['no_en_bd']:,}")
+        self.stdout.write(f"   Nuevas canceladas:       {stats['nuevas_canceladas']:,}")
+        self.stdout.write(f"   Actualizadas a Vigente:  {stats['actualizadas_vigente']:,}")
+        self.stdout.write(f"   Sin cambio:              {stats['sin_cambio']:,}")
+        if stats['tareas_cancelacion']:
+            self.stdout.write(
+                f"   Tareas de descontabilización encoladas: {len(stats['tareas_cancelacion'])}"
+            )
+        tasa = stats['lineas'] / duracion if duracion else 0
+        self.stdout.write(f'⏱️  {duracion:.2f}s ({tasa:,.0f} líneas/s)')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('\n⚠️  DRY-RUN: no se guardaron cambios'))
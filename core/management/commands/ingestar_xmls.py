@@ -0,0 +1,93 @@
+"""
+Management Command: Ingestar XMLs
+
+Procesa los XML depositados en xmls/ (o el directorio indicado). Solo lee
+archivos nuevos o modificados según el manifiesto (ruta, tamaño, mtime,
+sha256); con --watch queda corriendo y revisa el directorio periódicamente.
+
+Uso:
+    python manage.py ingestar_xmls
+    python manage.py ingestar_xmls --directorio=/data/xmls --batch-size=500
+    python manage.py ingestar_xmls --watch --intervalo=60
+    python manage.py ingestar_xmls --empresa-id=3 --reintentar
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Empresa
+from core.services.ingesta_directorio import IngestaDirectorio
+import time
+
+
+class Command(BaseCommand):
+    help = 'Ingiere XML nuevos o modificados de un directorio usando un manifiesto'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directorio', type=str, help='Directorio a ingerir (default: xmls/)')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=IngestaDirectorio.BATCH_SIZE,
+            help='Archivos por transacción',
+        )
+        parser.add_argument(
+            '--empresa-id',
+            type=int,
+            help='Asignar todos los XML a esta empresa (default: detectar por RFC)',
+        )
+        parser.add_argument(
+            '--reintentar',
+            action='store_true',
+            help='Volver a procesar archivos con ERROR o SIN_EMPRESA aunque no hayan cambiado',
+        )
+        parser.add_argument('--watch', action='store_true', help='Revisar el directorio continuamente')
+        parser.add_argument('--intervalo', type=int, default=30, help='Segundos entre revisiones con --watch')
+
+    def handle(self, *args, **options):
+        if options.get('empresa_id') and not Empresa.objects.filter(pk=options['empresa_id']).exists():
+            raise CommandError(f"Empresa {options['empresa_id']} no encontrada")
+
+        ingesta = IngestaDirectorio(
+            directorio=options.get('directorio'),
+            batch_size=options['batch_size'],
+            empresa_id=options.get('empresa_id'),
+            reintentar=options['reintentar'],
+        )
+        self.stdout.write(f'📂 Directorio: {ingesta.directorio}')
+
+        if not options['watch']:
+            self._corrida(ingesta)
+            return
+
+        self.stdout.write(f"👀 Modo watch (cada {options['intervalo']}s). Ctrl+C para salir.")
+        try:
+            while True:
+                stats = self._corrida(ingesta, silenciosa=True)
+                # --reintentar solo aplica en la primera pasada
+                ingesta.reintentar = False
+                # Los archivos ilegibles siguen siendo candidatos en cada pasada:
+                # solo se repite sin esperar si hubo archivos que sí se leyeron
+                if stats['candidatos'] == stats['ilegibles']:
+                    time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            self.stdout.write('Ingesta detenida por el usuario')
+
+    def _corrida(self, ingesta, silenciosa=False):
+        inicio = time.monotonic()
+        stats = ingesta.ejecutar()
+        duracion = time.monotonic() - inicio
+
+        if silenciosa and stats['candidatos'] == stats['ilegibles']:
+            return stats
+
+        self.stdout.write(self.style.SUCCESS(f"\n✅ Pasada completada en {duracion:.2f}s"))
+        self.stdout.write(f"   Escaneados:           {stats['escaneados']:,}")
+        self.stdout.write(f"   Sin cambios:          {stats['sin_cambio']:,}")
+        self.stdout.write(f"   Nuevos/modificados:   {stats['candidatos']:,}")
+        self.stdout.write(f"   Solo manifiesto:      {stats['solo_manifiesto']:,}")
+        self.stdout.write(f"   Facturas creadas:     {stats['procesados']:,}")
+        self.stdout.write(f"   Duplicados:           {stats['duplicados']:,}")
+        self.stdout.write(f"   Sin empresa (RFC):    {stats['sin_empresa']:,}")
+        self.stdout.write(f"   Errores:              {stats['errores']:,}")
+        self.stdout.write(f"   Ilegibles:            {stats['ilegibles']:,}")
+        self.stdout.write(f"   Lotes a contabilizar: {stats['tareas_contabilizacion']:,}")
+        return stats
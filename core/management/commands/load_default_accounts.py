@@ -1,9 +1,13 @@
 from django.core.management.base import BaseCommand
-from core.models import CuentaContable, Empresa
+from core.models import Empresa
+from core.services.seeder import SeederMasivo
 
 class Command(BaseCommand):
     help = 'Carga el catálogo de cuentas básicas para todas las empresas existentes'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help='Procesos en paralelo (default: 1)')
+
     def handle(self, *args, **kwargs):
         cuentas_base = [
             {'codigo': '102', 'nombre': 'Bancos', 'es_deudora': True},
@@ -21,16 +25,14 @@ class Command(BaseCommand):
             Empresa.objects.create(nombre="Mi Empresa Default", rfc="XAXX010101000", regimen_fiscal="General")
             empresas = Empresa.objects.all()
 
+        # Una consulta de comparación y un bulk_create por empresa
+        seeder = SeederMasivo(cuentas_base, plantillas=())
+        nombres = dict(empresas.values_list('id', 'nombre'))
         total_creadas = 0
-        for empresa in empresas:
-            self.stdout.write(f"Procesando empresa: {empresa}")
-            for c in cuentas_base:
-                obj, created = CuentaContable.objects.get_or_create(
-                    empresa=empresa,
-                    codigo=c['codigo'],
-                    defaults={'nombre': c['nombre'], 'es_deudora': c['es_deudora']}
-                )
-                if created:
-                    total_creadas += 1
-                    
+        for resultado in seeder.ejecutar(list(nombres), workers=kwargs['workers']):
+            self.stdout.write(f"Procesando empresa: {nombres[resultado['empresa_id']]}")
+            if resultado.get('error'):
+                self.stdout.write(self.style.ERROR(f"  Error: {resultado['error']}"))
+            total_creadas += resultado['cuentas']
+
         self.stdout.write(self.style.SUCCESS(f"Operación finalizada. Se crearon {total_creadas} cuentas nuevas."))
@@ -61,7 +61,9 @@ class Command(BaseCommand):
         for empresa in empresas:
             self.stdout.write(f'\n📊 Procesando empresa: {empresa.nombre} ({empresa.rfc})')
             
-            migrados, errores = self._migrar_empresa(empresa, dry_run)
+            # Caché de subcuentas por (mayor, RFC) durante la migración de la empresa
+            with AccountResolver.lote():
+                migrados, errores = self._migrar_empresa(empresa, dry_run)
             total_migrados += migrados
             total_errores += errores
         
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+
+class Command(BaseCommand):
+    help = 'Administra las particiones por ejercicio de MovimientoPoliza (solo PostgreSQL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--crear', type=int, nargs='+', metavar='AÑO',
+                            help='Crea las particiones de los años indicados')
+        parser.add_argument('--adelante', type=int, default=None,
+                            help='Crea las particiones del año en curso y N años más')
+        parser.add_argument('--desprender', type=int, metavar='AÑO',
+                            help='Separa la partición del año para archivarla (queda como tabla independiente)')
+        parser.add_argument('--concurrente', action='store_true',
+                            help='Usa DETACH PARTITION ... CONCURRENTLY (PostgreSQL 14+)')
+
+    def handle(self, *args, **options):
+        from core.models import MovimientoPoliza
+        from core.utils import particiones
+
+        tabla = MovimientoPoliza._meta.db_table
+        if not particiones.es_particionada(connection, tabla):
+            raise CommandError(f'{tabla} no está particionada (requiere PostgreSQL y la migración 0025)')
+
+        if options['crear'] or options['adelante'] is not None:
+            kwargs = {'anios': options['crear']} if options['crear'] else {'adelante': options['adelante']}
+            creados = particiones.asegurar_particiones(connection, tabla, **kwargs)
+            self.stdout.write(f"Particiones creadas: {', '.join(map(str, creados)) or 'ninguna'}")
+
+        if options['desprender']:
+            nombre = particiones.desprender_particion(
+                connection, tabla, options['desprender'], concurrente=options['concurrente']
+            )
+            self.stdout.write(f"Partición {nombre} desprendida; archívela con pg_dump -t {nombre} y luego DROP TABLE")
+
+        for nombre, limites, filas in particiones.listar_particiones(connection, tabla):
+            self.stdout.write(f"{nombre:40} {limites:45} ~{max(filas, 0)} filas")
@@ -1,5 +1,4 @@
 from django.core.management.base import BaseCommand
-from django.db import transaction
 import traceback
 
 
@@ -8,36 +7,24 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         from core.models import BackgroundTask
-        from core.tasks import mark_started, mark_completed, mark_failed
-        from core.services.accounting_service import AccountingService
+        from core.tasks import reclamar_siguiente, mark_completed, mark_failed, ejecutar_tarea
+        from core.utils.escritor_unico import escritor_unico
 
         try:
-            with transaction.atomic():
-                task = BackgroundTask.objects.select_for_update(skip_locked=True).filter(status='PENDING').order_by('created_at').first()
-                if not task:
-                    self.stdout.write('No hay tareas PENDING en la cola.')
-                    return
-                mark_started(task)
+            task = reclamar_siguiente()
+            if not task:
+                self.stdout.write('No hay tareas PENDING en la cola.')
+                return
 
-            payload = task.payload or {}
-            if task.task_type == 'contabilizar_factura':
-                factura_uuid = payload.get('factura_uuid')
+            with escritor_unico():
                 try:
-                    AccountingService.contabilizar_factura(factura_uuid, usuario_id=payload.get('usuario_id'))
+                    mensaje = ejecutar_tarea(task)
                     mark_completed(task)
-                    self.stdout.write(f'Processed task {task.id} factura {factura_uuid}')
-                except ValueError as ve:
-                    msg = str(ve or '').lower()
-                    if 'ya está contabilizada' in msg or 'ya esta contabilizada' in msg or 'ya está contabilizado' in msg:
-                        mark_completed(task)
-                        self.stdout.write(f'WARNING: Factura ya procesada, saltando task {task.id} (factura {factura_uuid})')
-                    else:
-                        tb = traceback.format_exc()
-                        mark_failed(task, tb)
-                        self.stderr.write(f'Error processing task {task.id}: {ve}\n{tb}')
-            else:
-                mark_failed(task, f'Unknown task_type: {task.task_type}')
-                self.stderr.write(f'Unknown task_type: {task.task_type}')
+                    self.stdout.write(f'Processed task {task.id} {mensaje}')
+                except Exception as e:
+                    tb = traceback.format_exc()
+                    mark_failed(task, tb)
+                    self.stderr.write(f'Error processing task {task.id}: {e}\n{tb}')
 
         except Exception as e:
             tb = traceback.format_exc()
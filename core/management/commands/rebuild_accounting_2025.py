@@ -8,13 +8,21 @@ PROBLEMA CRÍTICO: Sistema en estado inconsistente
 
 SOLUCIÓN: Reconstrucción completa con lógica fiscal correcta
 
-PASOS:
-1. WIPE: Eliminar TODAS las pólizas de 2025
+PASOS (por partición empresa/mes, ver ReconstruccionContable):
+1. WIPE: Eliminar las pólizas de la partición que no se van a regenerar
+   (con --completo: todas las pólizas de la partición)
 2. REBUILD: Regenerar solo facturas Vigentes/Sin Validar
+   (modo diferencial: solo se escriben los movimientos que cambian)
 3. VERIFY: Verificar que totales coincidan con esperado
 
+Cada partición se confirma por separado junto con su checkpoint; si la corrida
+se interrumpe, volver a ejecutar el comando retoma las particiones pendientes.
+Si la corrida anterior terminó, el comando vuelve a procesar todo el año.
+
 Uso:
     python manage.py rebuild_accounting_2025
+    python manage.py rebuild_accounting_2025 --workers 4
+    python manage.py rebuild_accounting_2025 --reiniciar --completo
     python manage.py rebuild_accounting_2025 --dry-run
 
 Autor: Sistema Konta
@@ -22,12 +30,14 @@ Fecha: 2025-12-15
 """
 
 from django.core.management.base import BaseCommand
-from django.db import transaction
-from django.db.models import Sum, Q
-from core.models import Factura, Poliza, MovimientoPoliza, CuentaContable
-from core.services.accounting_service import AccountingService
+from django.db.models import Sum
+from core.models import Factura, MovimientoPoliza
+from core.services.reconstruccion_contable import ReconstruccionContable, NATURALEZAS
+from core.utils.procesos import workers_efectivos
 from decimal import Decimal
+import datetime
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -39,7 +49,12 @@ class Command(BaseCommand):
         parser.add_argument(
             '--dry-run',
             action='store_true',
-            help='Simula sin guardar cambios',
+            help='Muestra las particiones sin guardar cambios',
+        )
+        parser.add_argument(
+            '--completo',
+            action='store_true',
+            help='Elimina y recrea todas las pólizas en lugar de aplicar solo diferencias',
         )
         parser.add_argument(
             '--year',
@@ -47,186 +62,180 @@ class Command(BaseCommand):
             default=2025,
             help='Año a reconstruir (default: 2025)',
         )
+        parser.add_argument(
+            '--empresa-id',
+            type=int,
+            action='append',
+            dest='empresa_ids',
+            help='Limitar a una empresa (se puede repetir)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Procesos en paralelo (en SQLite siempre 1)',
+        )
+        parser.add_argument(
+            '--reiniciar',
+            action='store_true',
+            help='Vuelve a procesar también las particiones completadas de una corrida interrumpida',
+        )
+        parser.add_argument(
+            '--esperado',
+            type=Decimal,
+            default=Decimal('414886.64'),
+            help='Subtotal de ventas esperado para la verificación final',
+        )
 
     def handle(self, *args, **options):
         dry_run = options['dry_run']
         year = options['year']
-        
+        completo = options['completo']
+
         self.stdout.write(self.style.ERROR('=' * 70))
         self.stdout.write(self.style.ERROR('🔨 RECONSTRUCCIÓN TOTAL DE CONTABILIDAD'))
         self.stdout.write(self.style.ERROR('=' * 70))
         self.stdout.write(f'\n📅 Año: {year}')
-        
+        self.stdout.write(f'   Modo: {"completo (eliminar y recrear)" if completo else "diferencial"}')
+
+        reconstruccion = ReconstruccionContable(year, empresa_ids=options['empresa_ids'], completo=completo)
+        plan = reconstruccion.planificar()
+        total_facturas = sum(plan.values())
+
+        self.stdout.write(f'\n📊 Particiones (empresa/mes): {len(plan)}')
+        self.stdout.write(f'   Facturas a procesar: {total_facturas:,}')
+        self.stdout.write(f'   Condición: estado_sat != "Cancelado"')
+
         if dry_run:
             self.stdout.write(self.style.WARNING('\n⚠️  MODO DRY-RUN'))
-        else:
-            self.stdout.write(self.style.ERROR('\n🔥 MODO REAL - Se eliminarán y regenerarán datos'))
-            confirm = input('\n¿Estás seguro? Escribe "REBUILD" para continuar: ')
-            if confirm != 'REBUILD':
-                self.stdout.write(self.style.WARNING('\nOperación cancelada'))
-                return
-        
-        # ============================================================
-        # PASO 1: LIMPIEZA TOTAL (WIPE)
-        # ============================================================
-        self.stdout.write('\n\n🗑️  PASO 1: LIMPIEZA TOTAL')
-        self.stdout.write('=' * 70)
-        
-        movimientos_count = MovimientoPoliza.objects.filter(
-            poliza__fecha__year=year
-        ).count()
-        
-        polizas_count = Poliza.objects.filter(
-            fecha__year=year
-        ).count()
-        
-        self.stdout.write(f'\n📊 Registros a eliminar:')
-        self.stdout.write(f'   Movimientos: {movimientos_count:,}')
-        self.stdout.write(f'   Pólizas: {polizas_count:,}')
-        
-        if not dry_run:
-            MovimientoPoliza.objects.filter(poliza__fecha__year=year).delete()
-            Poliza.objects.filter(fecha__year=year).delete()
-            # CRÍTICO: Resetear estado_contable a PENDIENTE
-            Factura.objects.filter(
-                fecha__year=year,
-                naturaleza__in=['I', 'E']
-            ).exclude(
-                estado_sat='Cancelado'
-            ).update(estado_contable='PENDIENTE')
-            self.stdout.write(self.style.SUCCESS('\n   ✅ Limpieza completada'))
-            self.stdout.write(self.style.SUCCESS('   ✅ Estados reseteados a PENDIENTE'))
-        
+            for (empresa_id, mes), n in plan.items():
+                self.stdout.write(f'   Empresa {empresa_id} {year}-{mes:02d}: {n:,} facturas')
+            self.stdout.write(self.style.WARNING('\n\n⚠️  DRY-RUN: No se guardaron cambios'))
+            return
+
         # ============================================================
-        # PASO 2: REGENERACIÓN SELECTIVA (REBUILD)
+        # PASOS 1 y 2: LIMPIEZA + REGENERACIÓN POR PARTICIÓN
         # ============================================================
-        self.stdout.write('\n\n♻️  PASO 2: REGENERACIÓN SELECTIVA')
+        self.stdout.write('\n\n♻️  LIMPIEZA Y REGENERACIÓN POR PARTICIÓN')
         self.stdout.write('=' * 70)
-        
-        # Filtrar facturas VIGENTES o SIN VALIDAR (excluir canceladas)
-        facturas = Factura.objects.filter(
-            fecha__year=year,
-            naturaleza__in=['I', 'E']
-        ).exclude(
-            estado_sat='Cancelado'
-        ).order_by('fecha')
-        
-        total_facturas = facturas.count()
-        
-        self.stdout.write(f'\n📊 Facturas a procesar: {total_facturas}')
-        self.stdout.write(f'   Condición: estado_sat != "Cancelado"')
-        
-        # Estadísticas
-        procesadas = 0
-        errores = 0
-        
-        suma_ventas_subtotal = Decimal('0.00')
-        suma_ventas_iva = Decimal('0.00')
-        suma_ventas_total = Decimal('0.00')
-        
-        suma_gastos_subtotal = Decimal('0.00')
-        suma_gastos_iva = Decimal('0.00')
-        suma_gastos_total = Decimal('0.00')
-        
-        # Procesar
-        for idx, factura in enumerate(facturas, 1):
-            try:
-                # Progreso
-                if idx % 10 == 0 or idx == total_facturas:
-                    self.stdout.write(
-                        f'   ⏳ {idx}/{total_facturas} ({int(idx/total_facturas*100)}%)',
-                        ending='\r'
-                    )
-                
-                # Acumular estadísticas
-                if factura.naturaleza == 'I':
-                    suma_ventas_subtotal += factura.subtotal
-                    suma_ventas_iva += factura.total_impuestos_trasladados
-                    suma_ventas_total += factura.total
-                else:  # 'E'
-                    suma_gastos_subtotal += factura.subtotal
-                    suma_gastos_iva += factura.total_impuestos_trasladados
-                    suma_gastos_total += factura.total
-                
-                # Contabilizar con lógica fiscal correcta
-                if not dry_run:
-                    poliza = AccountingService.contabilizar_factura(
-                        factura.uuid,
-                        usuario_id=None
-                    )
-                    procesadas += 1
-                else:
-                    procesadas += 1
-            
-            except Exception as e:
-                errores += 1
-                if errores <= 5:
-                    self.stdout.write(
-                        f'\n   ❌ Error en {factura.uuid}: {str(e)[:60]}'
-                    )
-                logger.error(f'Error en {factura.uuid}: {e}', exc_info=True)
-        
-        self.stdout.write('')  # Nueva línea
-        
+
+        particiones = reconstruccion.registrar(plan, reiniciar=options['reiniciar'])
+        omitidas = len(plan) - len(particiones)
+        if omitidas:
+            self.stdout.write(f'\n⏭️  {omitidas} partición(es) ya completadas en la corrida interrumpida (usa --reiniciar para repetirlas)')
+
+        workers = workers_efectivos(options['workers'])
+        if workers != options['workers']:
+            self.stdout.write(self.style.WARNING(f'   ⚠️  Ejecutando con {workers} worker (base de datos de un solo escritor)'))
+
+        pendientes = sum(p.facturas for p in particiones)
+        hechas = 0
+        totales = {'procesadas': 0, 'sin_cambios': 0, 'errores': 0, 'polizas_eliminadas': 0, 'fallidas': 0}
+        inicio = time.perf_counter()
+
+        for idx, resultado in enumerate(reconstruccion.ejecutar(particiones, workers=workers), 1):
+            hechas += resultado['facturas']
+            for clave in ('procesadas', 'sin_cambios', 'errores', 'polizas_eliminadas'):
+                totales[clave] += resultado[clave]
+
+            transcurrido = time.perf_counter() - inicio
+            ritmo = hechas / transcurrido if transcurrido else 0
+            eta = datetime.timedelta(seconds=int((pendientes - hechas) / ritmo)) if ritmo else '?'
+            etiqueta = f"Empresa {resultado['empresa_id']} {resultado['anio']}-{resultado['mes']:02d}"
+
+            if resultado['estado'] == 'ERROR':
+                totales['fallidas'] += 1
+                self.stdout.write(self.style.ERROR(
+                    f'   ❌ [{idx}/{len(particiones)}] {etiqueta}: partición revertida, se reintentará en la próxima corrida'
+                ))
+            else:
+                self.stdout.write(
+                    f'   ✅ [{idx}/{len(particiones)}] {etiqueta}: {resultado["procesadas"]}/{resultado["facturas"]} '
+                    f'({resultado["sin_cambios"]} sin cambios, {resultado["errores"]} errores) '
+                    f'en {resultado["segundos"]:.1f}s · {ritmo:,.1f} facturas/s · ETA {eta}'
+                )
+            for mensaje in resultado['mensajes']:
+                self.stdout.write(f'      ❌ {mensaje[:100]}')
+
+        duracion = time.perf_counter() - inicio
+
         # ============================================================
         # PASO 3: VERIFICACIÓN FINAL
         # ============================================================
         self.stdout.write('\n\n📊 VERIFICACIÓN FINAL')
         self.stdout.write('=' * 70)
-        
-        self.stdout.write(f'\n✅ Facturas procesadas: {procesadas}')
-        self.stdout.write(f'❌ Errores: {errores}')
-        
+
+        self.stdout.write(f'\n✅ Facturas procesadas: {totales["procesadas"]}')
+        if not completo:
+            self.stdout.write(f'   Sin cambios (0 escrituras): {totales["sin_cambios"]}')
+        self.stdout.write(f'   Pólizas eliminadas: {totales["polizas_eliminadas"]}')
+        self.stdout.write(f'❌ Errores: {totales["errores"]}')
+        if totales['fallidas']:
+            self.stdout.write(self.style.ERROR(f'❌ Particiones fallidas: {totales["fallidas"]}'))
+        if duracion:
+            self.stdout.write(f'⏱️  {duracion:.1f}s ({hechas / duracion:,.1f} facturas/s)')
+
+        facturas = Factura.objects.filter(fecha__year=year, naturaleza__in=NATURALEZAS).exclude(estado_sat='Cancelado')
+        movimientos = MovimientoPoliza.objects.filter(poliza__fecha__year=year)
+        if options['empresa_ids']:
+            facturas = facturas.filter(empresa_id__in=options['empresa_ids'])
+            movimientos = movimientos.filter(poliza__factura__empresa_id__in=options['empresa_ids'])
+        sumas = {
+            naturaleza: facturas.filter(naturaleza=naturaleza).aggregate(
+                subtotal=Sum('subtotal'), iva=Sum('total_impuestos_trasladados'), total=Sum('total')
+            )
+            for naturaleza in NATURALEZAS
+        }
+        ventas = {k: v or Decimal('0.00') for k, v in sumas['I'].items()}
+        gastos = {k: v or Decimal('0.00') for k, v in sumas['E'].items()}
+
         self.stdout.write('\n\n💰 INGRESOS (VENTAS):')
-        self.stdout.write(f'   Subtotal (401-01): ${suma_ventas_subtotal:,.2f}')
-        self.stdout.write(f'   IVA (208-01):      ${suma_ventas_iva:,.2f}')
-        self.stdout.write(f'   Total (105-01):    ${suma_ventas_total:,.2f}')
-        
+        self.stdout.write(f'   Subtotal (401-01): ${ventas["subtotal"]:,.2f}')
+        self.stdout.write(f'   IVA (208-01):      ${ventas["iva"]:,.2f}')
+        self.stdout.write(f'   Total (105-01):    ${ventas["total"]:,.2f}')
+
         self.stdout.write('\n📝 EGRESOS (GASTOS):')
-        self.stdout.write(f'   Subtotal (601-01): ${suma_gastos_subtotal:,.2f}')
-        self.stdout.write(f'   IVA (118-01):      ${suma_gastos_iva:,.2f}')
-        self.stdout.write(f'   Total (201-01):    ${suma_gastos_total:,.2f}')
-        
+        self.stdout.write(f'   Subtotal (601-01): ${gastos["subtotal"]:,.2f}')
+        self.stdout.write(f'   IVA (118-01):      ${gastos["iva"]:,.2f}')
+        self.stdout.write(f'   Total (201-01):    ${gastos["total"]:,.2f}')
+
         # Verificación contra esperado
         self.stdout.write('\n\n🎯 VERIFICACIÓN CONTRA ESPERADO:')
-        esperado = Decimal('414886.64')
-        diferencia = abs(suma_ventas_subtotal - esperado)
-        
+        esperado = options['esperado']
+        diferencia = abs(ventas['subtotal'] - esperado)
+
         self.stdout.write(f'   Esperado (Excel):  ${esperado:,.2f}')
-        self.stdout.write(f'   Obtenido (Sistema): ${suma_ventas_subtotal:,.2f}')
+        self.stdout.write(f'   Obtenido (Sistema): ${ventas["subtotal"]:,.2f}')
         self.stdout.write(f'   Diferencia:        ${diferencia:,.2f}')
-        
+
         if diferencia < Decimal('100.00'):
             self.stdout.write(self.style.SUCCESS('   ✅ ¡COINCIDE! (diferencia < $100)'))
         elif diferencia < Decimal('1000.00'):
             self.stdout.write(self.style.WARNING('   ⚠️  Diferencia aceptable (< $1,000)'))
         else:
             self.stdout.write(self.style.ERROR('   ❌ Diferencia significativa'))
-        
-        # Verificar en base de datos (solo si no es dry-run)
-        if not dry_run:
-            self.stdout.write('\n\n💾 VERIFICACIÓN EN BASE DE DATOS:')
-            
-            # Sumar HABER en cuentas 400 (Ventas)
-            ventas_db = MovimientoPoliza.objects.filter(
-                poliza__fecha__year=year,
-                cuenta__codigo__startswith='40'
-            ).aggregate(total=Sum('haber'))['total'] or Decimal('0.00')
-            
-            self.stdout.write(f'   Total Ventas (Cuentas 400): ${ventas_db:,.2f}')
-            
-            if abs(ventas_db - esperado) < Decimal('100.00'):
-                self.stdout.write(self.style.SUCCESS('   ✅ Base de datos CORRECTA'))
-            else:
-                self.stdout.write(self.style.WARNING(f'   ⚠️  Diferencia: ${abs(ventas_db - esperado):,.2f}'))
-        
+
+        self.stdout.write('\n\n💾 VERIFICACIÓN EN BASE DE DATOS:')
+
+        # Sumar HABER en cuentas 400 (Ventas)
+        ventas_db = movimientos.filter(
+            cuenta__codigo__startswith='40'
+        ).aggregate(total=Sum('haber'))['total'] or Decimal('0.00')
+
+        self.stdout.write(f'   Total Ventas (Cuentas 400): ${ventas_db:,.2f}')
+
+        if abs(ventas_db - esperado) < Decimal('100.00'):
+            self.stdout.write(self.style.SUCCESS('   ✅ Base de datos CORRECTA'))
+        else:
+            self.stdout.write(self.style.WARNING(f'   ⚠️  Diferencia: ${abs(ventas_db - esperado):,.2f}'))
+
         # Resumen final
-        if dry_run:
-            self.stdout.write(self.style.WARNING('\n\n⚠️  DRY-RUN: No se guardaron cambios'))
+        if totales['fallidas']:
+            self.stdout.write(self.style.WARNING('\n\n⚠️  Reconstrucción incompleta: vuelve a ejecutar el comando para retomar'))
         else:
             self.stdout.write(self.style.SUCCESS('\n\n✅ Reconstrucción completada'))
-            self.stdout.write('\n💡 SIGUIENTE PASO:')
-            self.stdout.write('   1. Refresca los reportes en el navegador')
-            self.stdout.write('   2. Verifica Balanza de Comprobación')
-            self.stdout.write('   3. Verifica Estado de Resultados')
-            self.stdout.write('   4. Verifica Balance General')
+        self.stdout.write('\n💡 SIGUIENTE PASO:')
+        self.stdout.write('   1. Refresca los reportes en el navegador')
+        self.stdout.write('   2. Verifica Balanza de Comprobación')
+        self.stdout.write('   3. Verifica Estado de Resultados')
+        self.stdout.write('   4. Verifica Balance General')
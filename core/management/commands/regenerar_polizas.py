@@ -1,6 +1,10 @@
 """
 Comando de gestión para limpiar y regenerar TODAS las pólizas contables
 Esto eliminará los ajustes incorrectos de la cuenta 702-99
+
+Las pólizas se regeneran en modo diferencial (AccountingService.recontabilizar_factura):
+solo se escriben los movimientos que cambian. Usa --completo para el método
+anterior de eliminar y recrear cada póliza.
 """
 from django.core.management.base import BaseCommand
 from core.models import Factura, Poliza, MovimientoPoliza
@@ -19,6 +23,11 @@ class Command(BaseCommand):
             type=int,
             help='ID de la empresa (opcional, si no se especifica procesa todas)'
         )
+        parser.add_argument(
+            '--completo',
+            action='store_true',
+            help='Elimina y recrea cada póliza en lugar de aplicar solo diferencias'
+        )
         parser.add_argument(
             '--dry-run',
             action='store_true',
@@ -28,6 +37,7 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         empresa_id = options.get('empresa_id')
         dry_run = options.get('dry_run', False)
+        completo = options.get('completo', False)
         
         if dry_run:
             self.stdout.write(self.style.WARNING('🔍 MODO SIMULACIÓN - No se harán cambios reales'))
@@ -52,12 +62,18 @@ class Command(BaseCommand):
                 return
         
         exitosas = 0
+        sin_cambios = 0
         errores = 0
         errores_detalle = []
         
         for i, factura in enumerate(facturas_qs, 1):
             try:
-                if not dry_run:
+                if not dry_run and not completo:
+                    _, cambios = AccountingService.recontabilizar_factura(factura.uuid, usuario_id=None)
+                    if not (cambios['insertados'] or cambios['actualizados']
+                            or cambios['eliminados'] or cambios['cabecera']):
+                        sin_cambios += 1
+                elif not dry_run:
                     with transaction.atomic():
                         # 1. Eliminar póliza existente
                         Poliza.objects.filter(factura=factura).delete()
@@ -87,6 +103,8 @@ class Command(BaseCommand):
         # Resumen
         self.stdout.write('\n' + '='*70)
         self.stdout.write(self.style.SUCCESS(f'✅ Exitosas: {exitosas}'))
+        if not completo and not dry_run:
+            self.stdout.write(f'   Sin cambios (0 escrituras): {sin_cambios}')
         if errores > 0:
             self.stdout.write(self.style.ERROR(f'❌ Errores: {errores}'))
             if errores_detalle:
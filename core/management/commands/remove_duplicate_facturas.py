@@ -23,7 +23,8 @@ Fecha: 2025-12-15
 from django.core.management.base import BaseCommand
 from django.db import transaction
 from django.db.models import Count
-from core.models import Factura, Poliza, MovimientoPoliza
+from core.models import Factura, Poliza
+from core.services.eliminacion_masiva import EliminacionMasiva
 import logging
 
 logger = logging.getLogger(__name__)
@@ -74,6 +75,7 @@ class Command(BaseCommand):
         
         total_eliminadas = 0
         polizas_eliminadas = 0
+        ids_a_eliminar = []
         
         for dup in duplicados:
             uuid = dup['uuid']
@@ -105,25 +107,23 @@ class Command(BaseCommand):
                 f'Eliminar: {facturas_a_eliminar.count()}'
             )
             
-            # Eliminar pólizas de las facturas duplicadas
-            for factura in facturas_a_eliminar:
-                polizas = Poliza.objects.filter(factura=factura)
-                if polizas.exists():
-                    polizas_count = polizas.count()
-                    if not dry_run:
-                        # Eliminar movimientos primero
-                        MovimientoPoliza.objects.filter(poliza__in=polizas).delete()
-                        # Luego pólizas
-                        polizas.delete()
-                    polizas_eliminadas += polizas_count
-                    self.stdout.write(
-                        f'         └─ Eliminando {polizas_count} póliza(s) de factura ID={factura.id}'
-                    )
+            # Pólizas de las facturas duplicadas (se eliminan junto con ellas)
+            for factura_id in Poliza.objects.filter(
+                factura__in=facturas_a_eliminar
+            ).values_list('factura_id', flat=True):
+                polizas_eliminadas += 1
+                self.stdout.write(
+                    f'         └─ Eliminando 1 póliza(s) de factura ID={factura_id}'
+                )
             
-            # Eliminar las facturas duplicadas
-            if not dry_run:
-                eliminadas = facturas_a_eliminar.delete()[0]
-                total_eliminadas += eliminadas
+            ids_a_eliminar.extend(facturas_a_eliminar.values_list('id', flat=True))
+        
+        # Eliminar las facturas duplicadas (con pólizas, movimientos y auditoría) en bloque
+        if not dry_run and ids_a_eliminar:
+            resultado = EliminacionMasiva.eliminar_facturas(
+                ids_a_eliminar, motivo='remove_duplicate_facturas: UUID duplicado'
+            )
+            total_eliminadas = resultado['facturas']
         
         # RESUMEN FINAL
         self.stdout.write(self.style.SUCCESS('\n' + '=' * 70))
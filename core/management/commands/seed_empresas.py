@@ -1,11 +1,17 @@
 """
 Comando de management para inicializar empresas existentes con plantillas contables.
-Uso: python manage.py seed_empresas
+Uso: python manage.py seed_empresas [--empresa-id 1 --empresa-id 2] [--workers 4]
+
+Usa SeederMasivo: una consulta de comparación por empresa y bulk_create de
+lo que falte. Con --workers > 1 las empresas se reparten entre procesos
+(en SQLite se procesan en serie).
 """
 
 from django.core.management.base import BaseCommand
 from core.models import Empresa
-from core.services.seeder import inicializar_empresa
+from core.services.seeder import SeederMasivo
+from core.utils.procesos import workers_efectivos
+import time
 
 
 class Command(BaseCommand):
@@ -15,34 +21,50 @@ class Command(BaseCommand):
         parser.add_argument(
             '--empresa-id',
             type=int,
-            help='ID de empresa específica a inicializar (opcional)',
+            action='append',
+            dest='empresa_ids',
+            help='ID de empresa específica a inicializar (opcional, repetible)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Procesos en paralelo (default: 1)',
         )
 
     def handle(self, *args, **options):
-        empresa_id = options.get('empresa_id')
-        
-        if empresa_id:
-            # Inicializar empresa específica
-            try:
-                empresa = Empresa.objects.get(id=empresa_id)
-                self.stdout.write(f"Inicializando empresa: {empresa.nombre}")
-                inicializar_empresa(empresa)
-                self.stdout.write(self.style.SUCCESS(f'✅ Empresa {empresa.nombre} inicializada'))
-            except Empresa.DoesNotExist:
-                self.stdout.write(self.style.ERROR(f'❌ Empresa con ID {empresa_id} no encontrada'))
-        else:
-            # Inicializar todas las empresas
-            empresas = Empresa.objects.all()
-            total = empresas.count()
-            
-            self.stdout.write(f"Inicializando {total} empresa(s)...")
-            
-            for empresa in empresas:
-                try:
-                    self.stdout.write(f"  → {empresa.nombre}")
-                    inicializar_empresa(empresa)
-                    self.stdout.write(self.style.SUCCESS(f'    ✅ OK'))
-                except Exception as e:
-                    self.stdout.write(self.style.ERROR(f'    ❌ Error: {e}'))
-            
-            self.stdout.write(self.style.SUCCESS(f'\n✅ Proceso completado para {total} empresa(s)'))
+        empresa_ids = options.get('empresa_ids')
+        qs = Empresa.objects.order_by('id')
+        if empresa_ids:
+            qs = qs.filter(id__in=empresa_ids)
+        empresas = dict(qs.values_list('id', 'nombre'))
+
+        faltantes = set(empresa_ids or []) - set(empresas)
+        for empresa_id in sorted(faltantes):
+            self.stdout.write(self.style.ERROR(f'❌ Empresa con ID {empresa_id} no encontrada'))
+        if not empresas:
+            return
+
+        seeder = SeederMasivo()
+        workers = workers_efectivos(options['workers'])
+        total = len(empresas)
+        self.stdout.write(f"Inicializando {total} empresa(s) con {workers} worker(s)...")
+
+        inicio = time.perf_counter()
+        cuentas = plantillas = errores = 0
+        for resultado in seeder.ejecutar(list(empresas), workers=workers):
+            nombre = empresas[resultado['empresa_id']]
+            if resultado.get('error'):
+                errores += 1
+                self.stdout.write(self.style.ERROR(f"  → {nombre}: ❌ Error: {resultado['error']}"))
+                continue
+            cuentas += resultado['cuentas']
+            plantillas += resultado['plantillas']
+            self.stdout.write(
+                f"  → {nombre}: {resultado['cuentas']} cuentas, {resultado['plantillas']} plantillas nuevas"
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✅ Proceso completado para {total} empresa(s) en {time.perf_counter() - inicio:.1f}s: '
+            f'{cuentas} cuentas y {plantillas} plantillas creadas, {errores} con error'
+        ))
@@ -0,0 +1,121 @@
+"""
+Management Command: Validar SAT Pendientes
+
+Envía al SAT únicamente las facturas cuyo estatus está caducado según
+SatRevalidationPolicy (nunca validadas, 'Vigente' vencido, reintentos de
+'Error'/'No Encontrado'). Las 'Cancelado' son terminales y se omiten.
+
+Prioriza las facturas nunca validadas y, después, las más recientes
+(las más propensas a cancelarse).
+
+Uso:
+    python manage.py validar_sat_pendientes
+    python manage.py validar_sat_pendientes --empresa-rfc=ABC123456XYZ --limite=500
+    python manage.py validar_sat_pendientes --dry-run
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from core.models import Factura, Poliza, MovimientoPoliza
+from core.services.sat_status import SatStatusValidator
+from core.services.sat_revalidacion import SatRevalidationPolicy
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Valida en el SAT solo las facturas con estatus caducado (política de revalidación)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--empresa-rfc',
+            type=str,
+            help='RFC de empresa específica (opcional)',
+        )
+        parser.add_argument(
+            '--limite',
+            type=int,
+            default=None,
+            help='Máximo de facturas a consultar en esta corrida',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo muestra cuántas facturas se consultarían',
+        )
+
+    def handle(self, *args, **options):
+        policy = SatRevalidationPolicy()
+
+        qs = Factura.objects.all()
+        if options.get('empresa_rfc'):
+            qs = qs.filter(empresa__rfc=options['empresa_rfc'])
+
+        total_facturas = qs.count()
+        pendientes = policy.pendientes(qs)
+        if options.get('limite'):
+            # Las omitidas se cuentan antes del límite: las que difiere --limite se reportan aparte
+            total_pendientes = pendientes.count()
+            pendientes = list(pendientes[:options['limite']])
+        else:
+            pendientes = list(pendientes)
+            total_pendientes = len(pendientes)
+
+        self.stdout.write(f'📊 Facturas en alcance: {total_facturas:,}')
+        self.stdout.write(f'🔎 Requieren consulta SAT: {total_pendientes:,}')
+        self.stdout.write(f'⏭️  Omitidas (frescas o terminales): {total_facturas - total_pendientes:,}')
+        if total_pendientes > len(pendientes):
+            self.stdout.write(
+                f'⏸️  Diferidas por --limite: {total_pendientes - len(pendientes):,} '
+                f'(se consultan {len(pendientes):,} en esta corrida)'
+            )
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('\n⚠️  DRY-RUN: no se consultó al SAT'))
+            return
+
+        contadores = {'Vigente': 0, 'Cancelado': 0, 'No Encontrado': 0, 'Error': 0}
+
+        for idx, factura in enumerate(pendientes, 1):
+            resultado = SatStatusValidator.validar_factura_model(factura)
+            estado_sat = resultado['estado']
+            contadores[estado_sat] = contadores.get(estado_sat, 0) + 1
+
+            # Falla del servicio: conservar el estado conocido para el siguiente ciclo
+            if resultado.get('transitorio'):
+                if SatStatusValidator.circuito.estado == SatStatusValidator.circuito.ABIERTO:
+                    self.stdout.write(self.style.ERROR(
+                        f'\n🔌 Servicio SAT no disponible (circuito abierto). '
+                        f'Se detiene la corrida en {idx}/{len(pendientes)}.'
+                    ))
+                    break
+                continue
+
+            with transaction.atomic():
+                campos = {'estado_sat': estado_sat, 'ultima_validacion': timezone.now()}
+                if estado_sat == 'Cancelado':
+                    MovimientoPoliza.objects.filter(poliza__factura=factura).delete()
+                    Poliza.objects.filter(factura=factura).delete()
+                    campos['estado_contable'] = 'EXCLUIDA'
+                    logger.warning(f"❌ Factura {factura.uuid}: CANCELADA - pólizas eliminadas")
+                Factura.objects.filter(pk=factura.pk).update(**campos)
+
+            if idx % 25 == 0 or idx == len(pendientes):
+                self.stdout.write(f'   ⏳ {idx}/{len(pendientes)}', ending='\r')
+
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS('\n✅ Validación completada'))
+        for estado, n in contadores.items():
+            self.stdout.write(f'   {estado}: {n}')
+
+        metricas = SatStatusValidator.metricas()
+        self.stdout.write('\n📈 Cliente SAT:')
+        self.stdout.write(
+            f"   Intentos: {metricas['intentos']} | Reintentos: {metricas['reintentos']} | "
+            f"Tasa de error: {metricas['tasa_error']:.1%} | Circuito: {metricas['circuito']}"
+        )
+        self.stdout.write(
+            f"   Latencia p50: {metricas['latencia_p50']:.2f}s | p95: {metricas['latencia_p95']:.2f}s"
+        )
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_poliza_editada_manualmente_poliza_fecha_edicion_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivoIngesta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=255)),
+                ('ruta', models.CharField(help_text='Ruta del archivo en el directorio de spool', max_length=500)),
+                ('tamano', models.IntegerField(default=0)),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('CREADA', 'Factura creada'), ('DUPLICADA', 'Duplicada'), ('ERROR', 'Error')], default='PENDIENTE', max_length=15)),
+                ('factura_uuid', models.UUIDField(blank=True, null=True)),
+                ('mensaje', models.TextField(blank=True, null=True)),
+                ('procesado_en', models.DateTimeField(blank=True, null=True)),
+                ('tarea', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archivos_ingesta', to='core.backgroundtask')),
+            ],
+            options={
+                'verbose_name': 'Archivo de Ingesta',
+                'verbose_name_plural': 'Archivos de Ingesta',
+                'indexes': [models.Index(fields=['tarea', 'estado'], name='core_archiv_tarea_i_71719c_idx')],
+            },
+        ),
+    ]
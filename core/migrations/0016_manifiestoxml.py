@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_archivoingesta'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ManifiestoXML',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ruta', models.CharField(max_length=500, unique=True)),
+                ('tamano', models.BigIntegerField()),
+                ('mtime', models.FloatField(help_text='Fecha de modificación del archivo (epoch)')),
+                ('sha256', models.CharField(db_index=True, max_length=64)),
+                ('estado', models.CharField(choices=[('PROCESADO', 'Procesado'), ('DUPLICADO', 'Duplicado'), ('SIN_EMPRESA', 'Sin empresa'), ('ERROR', 'Error')], max_length=15)),
+                ('factura_uuid', models.UUIDField(blank=True, db_index=True, null=True)),
+                ('mensaje', models.TextField(blank=True, null=True)),
+                ('procesado_en', models.DateTimeField(auto_now=True)),
+                ('empresa', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='xmls_ingeridos', to='core.empresa')),
+            ],
+            options={
+                'verbose_name': 'Manifiesto XML',
+                'verbose_name_plural': 'Manifiesto XML',
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_manifiestoxml'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HuellaXML',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('factura', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='huellas', to='core.factura')),
+            ],
+            options={
+                'verbose_name': 'Huella XML',
+                'verbose_name_plural': 'Huellas XML',
+            },
+        ),
+    ]
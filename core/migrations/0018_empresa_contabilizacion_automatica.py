@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_huellaxml'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='empresa',
+            name='contabilizacion_automatica',
+            field=models.BooleanField(default=True, help_text='Contabilizar en segundo plano las facturas de ingreso/egreso recién cargadas'),
+        ),
+        migrations.AddField(
+            model_name='empresa',
+            name='contabilizar_solo_con_default',
+            field=models.BooleanField(default=True, help_text='Solo contabilizar automáticamente si existe una plantilla default para la naturaleza'),
+        ),
+        migrations.AddField(
+            model_name='empresa',
+            name='lote_contabilizacion',
+            field=models.PositiveIntegerField(default=100, help_text='Facturas por tarea de contabilización automática'),
+        ),
+    ]
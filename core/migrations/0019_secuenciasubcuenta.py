@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_empresa_contabilizacion_automatica'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SecuenciaSubcuenta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ultimo', models.PositiveIntegerField(default=0)),
+                ('padre', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='secuencia', to='core.cuentacontable')),
+            ],
+            options={
+                'verbose_name': 'Secuencia de Subcuentas',
+                'verbose_name_plural': 'Secuencias de Subcuentas',
+            },
+        ),
+    ]
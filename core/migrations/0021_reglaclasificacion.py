@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_versioncatalogo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReglaClasificacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('RFC', 'RFC del emisor'), ('CLAVE', 'ClaveProdServ (prefijo)'), ('PALABRA', 'Palabra clave en la descripción')], default='PALABRA', max_length=10)),
+                ('patron', models.CharField(help_text='RFC, prefijo de ClaveProdServ o palabra clave', max_length=100)),
+                ('cuenta_codigo', models.CharField(help_text='Código de la cuenta destino (ej: 601-05)', max_length=20)),
+                ('prioridad', models.PositiveIntegerField(default=100, help_text='Menor = se evalúa primero')),
+                ('activa', models.BooleanField(default=True)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+                ('empresa', models.ForeignKey(blank=True, help_text='Vacío = regla general para todas las empresas', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reglas_clasificacion', to='core.empresa')),
+            ],
+            options={
+                'verbose_name': 'Regla de Clasificación de Gasto',
+                'verbose_name_plural': 'Reglas de Clasificación de Gasto',
+                'ordering': ['prioridad', 'id'],
+                'indexes': [models.Index(fields=['empresa', 'activa'], name='core_reglac_empresa_2483ef_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_reglaclasificacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParticionReconstruccion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('anio', models.PositiveSmallIntegerField()),
+                ('mes', models.PositiveSmallIntegerField()),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('EN_PROCESO', 'En proceso'), ('COMPLETADA', 'Completada'), ('ERROR', 'Error')], default='PENDIENTE', max_length=15)),
+                ('facturas', models.PositiveIntegerField(default=0)),
+                ('procesadas', models.PositiveIntegerField(default=0)),
+                ('sin_cambios', models.PositiveIntegerField(default=0)),
+                ('errores', models.PositiveIntegerField(default=0)),
+                ('polizas_eliminadas', models.PositiveIntegerField(default=0)),
+                ('mensaje', models.TextField(blank=True, null=True)),
+                ('iniciada_en', models.DateTimeField(blank=True, null=True)),
+                ('terminada_en', models.DateTimeField(blank=True, null=True)),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='particiones_reconstruccion', to='core.empresa')),
+            ],
+            options={
+                'verbose_name': 'Partición de Reconstrucción',
+                'verbose_name_plural': 'Particiones de Reconstrucción',
+                'ordering': ['anio', 'mes', 'empresa_id'],
+                'unique_together': {('empresa', 'anio', 'mes')},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations, models
+
+
+def llenar_ejercicio(apps, schema_editor):
+    Poliza = apps.get_model('core', 'Poliza')
+    MovimientoPoliza = apps.get_model('core', 'MovimientoPoliza')
+    # fecha__year convierte a la zona horaria local (USE_TZ), igual que ejercicio_de()
+    for fecha in Poliza.objects.datetimes('fecha', 'year'):
+        MovimientoPoliza.objects.filter(poliza__fecha__year=fecha.year).update(ejercicio=fecha.year)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_backgroundtask_dedup_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movimientopoliza',
+            name='ejercicio',
+            field=models.PositiveSmallIntegerField(editable=False, null=True),
+        ),
+        migrations.RunPython(llenar_ejercicio, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='movimientopoliza',
+            name='ejercicio',
+            field=models.PositiveSmallIntegerField(editable=False),
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations
+
+from core.utils.particiones import convertir_a_particionada
+
+
+def particionar(apps, schema_editor):
+    # Solo PostgreSQL; en SQLite no hace nada
+    convertir_a_particionada(schema_editor, apps.get_model('core', 'MovimientoPoliza'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_movimientopoliza_ejercicio'),
+    ]
+
+    operations = [
+        migrations.RunPython(particionar, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_particionar_movimientopoliza'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='factura',
+            index=models.Index(fields=['empresa', 'fecha'], name='core_factur_empresa_954d02_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='factura',
+            index=models.Index(fields=['empresa', 'estado_contable', 'fecha'], name='core_factur_empresa_f45610_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='factura',
+            index=models.Index(fields=['empresa', 'naturaleza', 'fecha'], name='core_factur_empresa_3c9236_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='factura',
+            index=models.Index(fields=['naturaleza', 'fecha'], name='core_factur_natural_0a731c_idx'),
+        ),
+        # El índice simple de empresa se elimina hasta que existen los compuestos que lo cubren
+        migrations.AlterField(
+            model_name='factura',
+            name='empresa',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='facturas', to='core.empresa'),
+        ),
+    ]
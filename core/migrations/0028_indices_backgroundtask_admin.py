@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_indices_paginacion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='backgroundtask',
+            index=models.Index(fields=['status', 'finished_at'], name='core_backgr_status_95c797_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='backgroundtask',
+            index=models.Index(fields=['created_at', 'id'], name='core_backgr_created_5adcb5_idx'),
+        ),
+    ]
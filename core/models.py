@@ -38,6 +38,20 @@ class Empresa(models.Model):
         help_text="Selecciona el régimen fiscal según el SAT"
     )
     fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    # Contabilización automática después de cargar XML
+    contabilizacion_automatica = models.BooleanField(
+        default=True,
+        help_text="Contabilizar en segundo plano las facturas de ingreso/egreso recién cargadas"
+    )
+    contabilizar_solo_con_default = models.BooleanField(
+        default=True,
+        help_text="Solo contabilizar automáticamente si existe una plantilla default para la naturaleza"
+    )
+    lote_contabilizacion = models.PositiveIntegerField(
+        default=100,
+        help_text="Facturas por tarea de contabilización automática"
+    )
     
     def __str__(self):
         return f"{self.nombre} ({self.rfc})"
@@ -129,6 +143,51 @@ class CuentaContable(models.Model):
     def __str__(self):
         return f"{self.codigo} - {self.nombre} ({self.empresa.rfc})"
 
+    def clean(self):
+        """Valida agrupador_sat/codigo_sat contra el código agrupador SAT cargado (si lo hay)."""
+        from core.services.codigo_agrupador import CodigoAgrupador
+        if not CodigoAgrupador.mapa():
+            return
+        errores = {
+            campo: f"'{valor}' no está en el código agrupador SAT (Anexo 24)."
+            for campo, valor in (('agrupador_sat', self.agrupador_sat), ('codigo_sat', self.codigo_sat))
+            if valor and not CodigoAgrupador.es_valido(valor)
+        }
+        if errores:
+            raise ValidationError(errores)
+
+
+class VersionCatalogo(models.Model):
+    """
+    Versión del catálogo de cuentas de una empresa. Se incrementa con cada cambio
+    para invalidar las copias en memoria (core.services.catalogo_cuentas).
+    """
+    empresa = models.OneToOneField(Empresa, on_delete=models.CASCADE, primary_key=True, related_name='version_catalogo')
+    version = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Versión de Catálogo"
+        verbose_name_plural = "Versiones de Catálogo"
+
+    def __str__(self):
+        return f"{self.empresa_id}: v{self.version}"
+
+
+class SecuenciaSubcuenta(models.Model):
+    """
+    Último consecutivo asignado a las subcuentas de una cuenta padre.
+    Se incrementa con UPDATE atómico para que varios workers no generen el mismo código.
+    """
+    padre = models.OneToOneField(CuentaContable, on_delete=models.CASCADE, related_name='secuencia')
+    ultimo = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Secuencia de Subcuentas"
+        verbose_name_plural = "Secuencias de Subcuentas"
+
+    def __str__(self):
+        return f"{self.padre.codigo}: {self.ultimo}"
+
 
 class Factura(models.Model):
     TIPO_CHOICES = (
@@ -150,7 +209,8 @@ class Factura(models.Model):
         ('EXCLUIDA', 'Excluida'),
     )
 
-    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='facturas')
+    # Sin índice propio: lo cubren los índices compuestos de Meta (empresa primero)
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='facturas', db_index=False)
     uuid = models.UUIDField(unique=True, db_index=True)  # ← CRÍTICO: unique=True previene duplicados
     fecha = models.DateTimeField()
     emisor_rfc = models.CharField(max_length=13)
@@ -197,6 +257,20 @@ class Factura(models.Model):
         help_text='Fecha y hora de la última validación con el SAT'
     )
     
+    class Meta:
+        indexes = [
+            # Dashboard (periodo) y exportación a Excel (orden por fecha)
+            models.Index(fields=['empresa', 'fecha']),
+            # Bandeja de contabilización: pendientes de la empresa por fecha
+            models.Index(fields=['empresa', 'estado_contable', 'fecha']),
+            # Totales de ingresos/egresos del dashboard y particiones de la reconstrucción
+            models.Index(fields=['empresa', 'naturaleza', 'fecha']),
+            # Consultas sin empresa: rebuild anual y auditoría de gemelos
+            models.Index(fields=['naturaleza', 'fecha']),
+            # Changelist del admin sin filtro de empresa (paginación por cursor)
+            models.Index(fields=['fecha', 'id']),
+        ]
+
     def __str__(self):
         return f"{self.uuid} - {self.emisor_nombre}"
 
@@ -223,6 +297,12 @@ class Poliza(models.Model):
     usuario_edicion = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name='polizas_editadas', help_text="Usuario que editó la póliza")
     fecha_edicion = models.DateTimeField(null=True, blank=True, help_text="Fecha de la última edición manual")
     
+    class Meta:
+        indexes = [
+            # Changelist del admin (paginación por cursor) y filtros por periodo
+            models.Index(fields=['fecha', 'id']),
+        ]
+
     @property
     def total_debe(self):
         return sum(m.debe for m in self.movimientopoliza_set.all())
@@ -234,12 +314,72 @@ class Poliza(models.Model):
     def __str__(self):
         return f"Póliza {self.id} - {self.fecha.date()}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        poliza = super().from_db(db, field_names, values)
+        # Ejercicio con el que se leyó; save() lo compara para resincronizar movimientos
+        if 'fecha' in field_names and poliza.fecha is not None:
+            poliza._ejercicio_cargado = ejercicio_de(poliza.fecha)
+        return poliza
+
+    def save(self, *args, **kwargs):
+        """
+        Si la fecha cambia de año, MovimientoPoliza.ejercicio se actualiza en la
+        misma transacción (en PostgreSQL mueve los renglones de partición).
+        QuerySet.update(fecha=...) no pasa por aquí.
+        """
+        from django.db import router, transaction
+        update_fields = kwargs.get('update_fields')
+        ejercicio = ejercicio_de(self.fecha) if self.fecha is not None else None
+        if (self._state.adding or ejercicio is None or getattr(self, '_ejercicio_cargado', None) == ejercicio
+                or (update_fields is not None and 'fecha' not in update_fields)):
+            super().save(*args, **kwargs)
+        else:
+            with transaction.atomic(using=kwargs.get('using') or router.db_for_write(Poliza, instance=self)):
+                super().save(*args, **kwargs)
+                self.movimientopoliza_set.exclude(ejercicio=ejercicio).update(ejercicio=ejercicio)
+        if ejercicio is not None and (update_fields is None or 'fecha' in update_fields):
+            self._ejercicio_cargado = ejercicio
+
+def ejercicio_de(fecha):
+    """Año contable (hora local) de la fecha de una póliza."""
+    from django.utils import timezone
+    import datetime
+    if isinstance(fecha, str):
+        fecha = Poliza._meta.get_field('fecha').to_python(fecha)
+    if isinstance(fecha, datetime.datetime) and timezone.is_aware(fecha):
+        fecha = timezone.localtime(fecha)
+    return fecha.year
+
+
+class MovimientoPolizaQuerySet(models.QuerySet):
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        MovimientoPoliza.asignar_ejercicio(objs)
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def del_periodo(self, fecha_inicio, fecha_fin):
+        """
+        Movimientos con póliza entre fecha_inicio y fecha_fin (fechas, inclusive).
+        El filtro por ejercicio deja que PostgreSQL solo lea las particiones del periodo.
+        """
+        return self.filter(
+            ejercicio__gte=fecha_inicio.year, ejercicio__lte=fecha_fin.year,
+            poliza__fecha__date__gte=fecha_inicio, poliza__fecha__date__lte=fecha_fin,
+        )
+
+
 class MovimientoPoliza(models.Model):
     poliza = models.ForeignKey(Poliza, on_delete=models.CASCADE)
     cuenta = models.ForeignKey(CuentaContable, on_delete=models.CASCADE)
     debe = models.DecimalField(max_digits=14, decimal_places=2, default=0)
     haber = models.DecimalField(max_digits=14, decimal_places=2, default=0)
     descripcion = models.CharField(max_length=255, blank=True)
+    # Año de poliza.fecha (copia): llave de partición en PostgreSQL (core/utils/particiones.py)
+    ejercicio = models.PositiveSmallIntegerField(editable=False)
+
+    objects = MovimientoPolizaQuerySet.as_manager()
 
     class Meta:
         indexes = [
@@ -254,6 +394,22 @@ class MovimientoPoliza(models.Model):
     def __str__(self):
         return f"{self.cuenta.codigo} | D:{self.debe} H:{self.haber}"
 
+    def save(self, *args, **kwargs):
+        if self.ejercicio is None:
+            MovimientoPoliza.asignar_ejercicio([self])
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def asignar_ejercicio(movimientos):
+        """Completa 'ejercicio' desde la póliza (cargada o con una consulta para todas)."""
+        pendientes = [m for m in movimientos if m.ejercicio is None]
+        sin_poliza = {m.poliza_id for m in pendientes if not MovimientoPoliza.poliza.is_cached(m)}
+        fechas = dict(Poliza.objects.filter(id__in=sin_poliza).values_list('id', 'fecha')) if sin_poliza else {}
+        for mov in pendientes:
+            fecha = mov.poliza.fecha if MovimientoPoliza.poliza.is_cached(mov) else fechas.get(mov.poliza_id)
+            if fecha is not None:
+                mov.ejercicio = ejercicio_de(fecha)
+
 class PlantillaPoliza(models.Model):
     empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='plantillas')
     nombre = models.CharField(max_length=100)
@@ -279,6 +435,38 @@ class PlantillaPoliza(models.Model):
             raise ValidationError("La cuenta de impuesto no está configurada en la plantilla.")
 
 
+class ReglaClasificacion(models.Model):
+    """
+    Regla para clasificar conceptos de gasto en una cuenta (ver core.services.clasificador_gastos).
+    Las reglas sin empresa son generales; las de la empresa se evalúan antes.
+    """
+    TIPO_CHOICES = (
+        ('RFC', 'RFC del emisor'),
+        ('CLAVE', 'ClaveProdServ (prefijo)'),
+        ('PALABRA', 'Palabra clave en la descripción'),
+    )
+
+    empresa = models.ForeignKey(
+        Empresa, on_delete=models.CASCADE, null=True, blank=True, related_name='reglas_clasificacion',
+        help_text="Vacío = regla general para todas las empresas"
+    )
+    tipo = models.CharField(max_length=10, choices=TIPO_CHOICES, default='PALABRA')
+    patron = models.CharField(max_length=100, help_text="RFC, prefijo de ClaveProdServ o palabra clave")
+    cuenta_codigo = models.CharField(max_length=20, help_text="Código de la cuenta destino (ej: 601-05)")
+    prioridad = models.PositiveIntegerField(default=100, help_text="Menor = se evalúa primero")
+    activa = models.BooleanField(default=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Regla de Clasificación de Gasto"
+        verbose_name_plural = "Reglas de Clasificación de Gasto"
+        ordering = ['prioridad', 'id']
+        indexes = [models.Index(fields=['empresa', 'activa'])]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()}: {self.patron} → {self.cuenta_codigo}"
+
+
 class SatCodigo(models.Model):
     codigo = models.CharField(max_length=20, unique=True, db_index=True)
     nombre = models.CharField(max_length=255)
@@ -308,14 +496,143 @@ class BackgroundTask(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     started_at = models.DateTimeField(null=True, blank=True)
     finished_at = models.DateTimeField(null=True, blank=True)
+    # Solo puede haber una tarea activa (PENDING/IN_PROGRESS) por clave
+    dedup_key = models.CharField(max_length=150, null=True, blank=True)
 
     class Meta:
-        indexes = [models.Index(fields=['status', 'created_at'])]
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+            # Widget del admin: completadas hoy
+            models.Index(fields=['status', 'finished_at']),
+            # Changelist del admin sin filtro (paginación por cursor)
+            models.Index(fields=['created_at', 'id']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedup_key'],
+                condition=models.Q(status__in=['PENDING', 'IN_PROGRESS']),
+                name='backgroundtask_dedup_activa',
+            ),
+        ]
 
     def __str__(self):
         return f"Task {self.id} - {self.task_type} - {self.status}"
 
 
+class ArchivoIngesta(models.Model):
+    """
+    Resultado por archivo de una tarea 'ingestar_xml'.
+    El XML se guarda en disco (spool) al subirlo y el worker lo procesa después.
+    """
+    ESTADO_CHOICES = (
+        ('PENDIENTE', 'Pendiente'),
+        ('CREADA', 'Factura creada'),
+        ('DUPLICADA', 'Duplicada'),
+        ('ERROR', 'Error'),
+    )
+
+    tarea = models.ForeignKey(BackgroundTask, on_delete=models.CASCADE, related_name='archivos_ingesta')
+    nombre = models.CharField(max_length=255)
+    ruta = models.CharField(max_length=500, help_text="Ruta del archivo en el directorio de spool")
+    tamano = models.IntegerField(default=0)
+    estado = models.CharField(max_length=15, choices=ESTADO_CHOICES, default='PENDIENTE')
+    factura_uuid = models.UUIDField(null=True, blank=True)
+    mensaje = models.TextField(blank=True, null=True)
+    procesado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['tarea', 'estado'])]
+        verbose_name = 'Archivo de Ingesta'
+        verbose_name_plural = 'Archivos de Ingesta'
+
+    def __str__(self):
+        return f"{self.nombre} - {self.estado}"
+
+
+class ManifiestoXML(models.Model):
+    """
+    Manifiesto de archivos XML ingeridos desde un directorio (xmls/).
+    Permite procesar solo archivos nuevos o modificados en cada corrida.
+    """
+    ESTADO_CHOICES = (
+        ('PROCESADO', 'Procesado'),
+        ('DUPLICADO', 'Duplicado'),
+        ('SIN_EMPRESA', 'Sin empresa'),
+        ('ERROR', 'Error'),
+    )
+
+    ruta = models.CharField(max_length=500, unique=True)
+    tamano = models.BigIntegerField()
+    mtime = models.FloatField(help_text="Fecha de modificación del archivo (epoch)")
+    sha256 = models.CharField(max_length=64, db_index=True)
+    estado = models.CharField(max_length=15, choices=ESTADO_CHOICES)
+    empresa = models.ForeignKey(Empresa, on_delete=models.SET_NULL, null=True, blank=True, related_name='xmls_ingeridos')
+    factura_uuid = models.UUIDField(null=True, blank=True, db_index=True)
+    mensaje = models.TextField(blank=True, null=True)
+    procesado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Manifiesto XML'
+        verbose_name_plural = 'Manifiesto XML'
+
+    def __str__(self):
+        return f"{self.ruta} - {self.estado}"
+
+
+class HuellaXML(models.Model):
+    """
+    Índice de huellas (sha256 del contenido) de XML ya registrados.
+    Permite descartar re-cargas idénticas sin parsear el XML.
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    factura = models.ForeignKey(Factura, on_delete=models.CASCADE, related_name='huellas')
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Huella XML'
+        verbose_name_plural = 'Huellas XML'
+
+    def __str__(self):
+        return f"{self.sha256[:12]}… → {self.factura_id}"
+
+
+class ParticionReconstruccion(models.Model):
+    """
+    Checkpoint de rebuild_accounting por (empresa, año, mes).
+    Cada partición se reconstruye y se marca COMPLETADA en la misma
+    transacción; si la corrida se interrumpe, la siguiente omite las
+    completadas y retoma el resto (ver ReconstruccionContable.registrar).
+    """
+    ESTADO_CHOICES = (
+        ('PENDIENTE', 'Pendiente'),
+        ('EN_PROCESO', 'En proceso'),
+        ('COMPLETADA', 'Completada'),
+        ('ERROR', 'Error'),
+    )
+
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='particiones_reconstruccion')
+    anio = models.PositiveSmallIntegerField()
+    mes = models.PositiveSmallIntegerField()
+    estado = models.CharField(max_length=15, choices=ESTADO_CHOICES, default='PENDIENTE')
+    facturas = models.PositiveIntegerField(default=0)
+    procesadas = models.PositiveIntegerField(default=0)
+    sin_cambios = models.PositiveIntegerField(default=0)
+    errores = models.PositiveIntegerField(default=0)
+    polizas_eliminadas = models.PositiveIntegerField(default=0)
+    mensaje = models.TextField(blank=True, null=True)
+    iniciada_en = models.DateTimeField(null=True, blank=True)
+    terminada_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('empresa', 'anio', 'mes')
+        ordering = ['anio', 'mes', 'empresa_id']
+        verbose_name = 'Partición de Reconstrucción'
+        verbose_name_plural = 'Particiones de Reconstrucción'
+
+    def __str__(self):
+        return f"{self.empresa_id} {self.anio}-{self.mes:02d} - {self.estado}"
+
+
 class AuditoriaEliminacion(models.Model):
     """
     Registro de auditoría para eliminaciones de XMLs
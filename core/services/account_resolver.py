@@ -8,12 +8,32 @@ REGLA CRÍTICA SAT:
 Las subcuentas DEBEN heredar el agrupador_sat de su cuenta padre.
 """
 
+from contextlib import contextmanager
 from decimal import Decimal
-from core.models import CuentaContable, Factura, Empresa
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from core.models import CuentaContable, Factura, Empresa, SecuenciaSubcuenta
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
+MAYOR_CLIENTES = '105-01'  # Clientes Nacionales
+MAYOR_PROVEEDORES = '201-01'  # Proveedores Nacionales
+
+# Reintentos si el código reservado ya fue ocupado fuera del resolver
+MAX_INTENTOS_CODIGO = 5
+
+_estado = threading.local()
+
+
+class CacheSubcuentas:
+    """Caché de un lote: cuentas mayor y subcuentas por (empresa_id, mayor, RFC)."""
+
+    def __init__(self):
+        self.mayores = {}
+        self.subcuentas = {}
+
 
 class AccountResolver:
     """
@@ -21,11 +41,74 @@ class AccountResolver:
     
     Características:
     - Herencia automática de agrupador_sat
-    - Generación de códigos secuenciales
+    - Generación de códigos secuenciales (SecuenciaSubcuenta, sin colisiones entre workers)
     - Validación de jerarquía
     - Idempotencia (get_or_create)
+    - Caché por lote (ver AccountResolver.lote)
     """
     
+    @staticmethod
+    @contextmanager
+    def lote(empresa=None, facturas=None):
+        """
+        Activa la caché de subcuentas (empresa, mayor, RFC) para el hilo actual.
+        
+        Pensado para procesos por lotes: con `facturas` se precargan en una sola
+        consulta las subcuentas de sus clientes/proveedores. La caché se descarta
+        al salir, de modo que no sobrevive a cambios de catálogo entre lotes.
+        
+        Uso:
+            with AccountResolver.lote(empresa, facturas):
+                for f in facturas:
+                    AccountingService.contabilizar_factura(f.uuid)
+        """
+        previa = getattr(_estado, 'cache', None)
+        if previa is None:
+            _estado.cache = CacheSubcuentas()
+        try:
+            if empresa is not None and facturas:
+                AccountResolver.precargar(empresa, facturas)
+            yield _estado.cache
+        finally:
+            if previa is None:
+                _estado.cache = None
+    
+    @staticmethod
+    def precargar(empresa, facturas):
+        """Carga en la caché activa las cuentas mayor y subcuentas de los terceros de `facturas`."""
+        cache = getattr(_estado, 'cache', None)
+        if cache is None:
+            return
+        rfcs_por_mayor = {}
+        for factura in facturas:
+            tercero = AccountResolver.tercero_de_factura(factura)
+            if tercero:
+                rfcs_por_mayor.setdefault(tercero[0], set()).add(tercero[1])
+        if not rfcs_por_mayor:
+            return
+        
+        mayores = CuentaContable.objects.filter(
+            empresa=empresa, codigo__in=list(rfcs_por_mayor), nivel=1
+        )
+        for mayor in mayores:
+            cache.mayores[(empresa.id, mayor.codigo)] = mayor
+        
+        rfcs = set().union(*rfcs_por_mayor.values())
+        subcuentas = CuentaContable.objects.filter(
+            empresa=empresa, padre__in=mayores, rfc_tercero__in=rfcs
+        ).select_related('padre').order_by('id')
+        for subcuenta in subcuentas:
+            cache.subcuentas.setdefault((empresa.id, subcuenta.padre.codigo, subcuenta.rfc_tercero), subcuenta)
+    
+    @staticmethod
+    def tercero_de_factura(factura):
+        """(cuenta_mayor_codigo, rfc) del cliente o proveedor de la factura, o None."""
+        if factura.naturaleza == 'I':
+            return MAYOR_CLIENTES, factura.receptor_rfc
+        if factura.naturaleza == 'E':
+            return MAYOR_PROVEEDORES, factura.emisor_rfc
+        return None
+    
     @staticmethod
     def get_or_create_subcuenta(empresa, cuenta_mayor_codigo, rfc, nombre_tercero):
         """
@@ -43,61 +126,123 @@ class AccountResolver:
         Raises:
             ValueError: Si la cuenta mayor no existe
         """
+        cache = getattr(_estado, 'cache', None)
+        clave = (empresa.id, cuenta_mayor_codigo, rfc)
+        if cache is not None and clave in cache.subcuentas:
+            return cache.subcuentas[clave]
+        
         # 1. Buscar cuenta mayor
-        try:
-            cuenta_mayor = CuentaContable.objects.get(
-                empresa=empresa,
-                codigo=cuenta_mayor_codigo,
-                nivel=1  # Solo cuentas de nivel Mayor
-            )
-        except CuentaContable.DoesNotExist:
-            raise ValueError(
-                f"Cuenta mayor '{cuenta_mayor_codigo}' no existe para {empresa.nombre}. "
-                f"Ejecuta: python manage.py seed_empresas"
-            )
+        cuenta_mayor = cache.mayores.get((empresa.id, cuenta_mayor_codigo)) if cache is not None else None
+        if cuenta_mayor is None:
+            try:
+                cuenta_mayor = CuentaContable.objects.get(
+                    empresa=empresa,
+                    codigo=cuenta_mayor_codigo,
+                    nivel=1  # Solo cuentas de nivel Mayor
+                )
+            except CuentaContable.DoesNotExist:
+                raise ValueError(
+                    f"Cuenta mayor '{cuenta_mayor_codigo}' no existe para {empresa.nombre}. "
+                    f"Ejecuta: python manage.py seed_empresas"
+                )
+            if cache is not None:
+                cache.mayores[(empresa.id, cuenta_mayor_codigo)] = cuenta_mayor
         
         # 2. Verificar si ya existe subcuenta para este RFC
         subcuenta = CuentaContable.objects.filter(
             empresa=empresa,
             padre=cuenta_mayor,
             rfc_tercero=rfc
-        ).first()
+        ).order_by('id').first()
         
         if subcuenta:
             logger.info(f"✓ Subcuenta existente: {subcuenta.codigo} para RFC {rfc}")
+            if cache is not None:
+                cache.subcuentas[clave] = subcuenta
             return subcuenta
         
-        # 3. Generar código automático secuencial
-        # Ejemplo: 105-01-001, 105-01-002, etc.
-        ultimo_numero = CuentaContable.objects.filter(
-            empresa=empresa,
-            padre=cuenta_mayor
-        ).count() + 1
+        subcuenta = AccountResolver._crear_subcuenta(empresa, cuenta_mayor, rfc, nombre_tercero)
+        if cache is not None:
+            # Si la póliza que la creó se revierte, la subcuenta tampoco existe
+            transaction.on_commit(lambda: cache.subcuentas.__setitem__(clave, subcuenta))
+        return subcuenta
+    
+    @staticmethod
+    def siguiente_numero(cuenta_mayor):
+        """
+        Reserva el siguiente consecutivo de subcuenta para `cuenta_mayor`.
         
-        nuevo_codigo = f"{cuenta_mayor_codigo}-{str(ultimo_numero).zfill(3)}"
+        El UPDATE ... SET ultimo = ultimo + 1 bloquea la fila de la secuencia hasta
+        el fin de la transacción, así que dos workers nunca reciben el mismo número.
+        La secuencia se inicializa con el mayor sufijo existente (no con count(),
+        que se repite cuando hay subcuentas eliminadas).
+        """
+        actualizadas = SecuenciaSubcuenta.objects.filter(padre=cuenta_mayor).update(ultimo=F('ultimo') + 1)
+        if actualizadas:
+            return SecuenciaSubcuenta.objects.filter(padre=cuenta_mayor).values_list('ultimo', flat=True).get()
         
-        # 4. HEREDAR agrupador_sat del padre (CRÍTICO PARA SAT)
+        prefijo = f"{cuenta_mayor.codigo}-"
+        ultimo = 0
+        for codigo in CuentaContable.objects.filter(
+            empresa_id=cuenta_mayor.empresa_id, codigo__startswith=prefijo
+        ).values_list('codigo', flat=True):
+            sufijo = codigo[len(prefijo):]
+            if sufijo.isdigit():
+                ultimo = max(ultimo, int(sufijo))
+        try:
+            with transaction.atomic():
+                SecuenciaSubcuenta.objects.create(padre=cuenta_mayor, ultimo=ultimo + 1)
+            return ultimo + 1
+        except IntegrityError:
+            # Otro worker creó la secuencia al mismo tiempo
+            return AccountResolver.siguiente_numero(cuenta_mayor)
+    
+    @staticmethod
+    def _crear_subcuenta(empresa, cuenta_mayor, rfc, nombre_tercero):
+        # HEREDAR agrupador_sat del padre (CRÍTICO PARA SAT)
         agrupador_sat_heredado = cuenta_mayor.agrupador_sat
         
         if not agrupador_sat_heredado:
             logger.warning(
-                f"⚠️ Cuenta mayor {cuenta_mayor_codigo} no tiene agrupador_sat. "
+                f"⚠️ Cuenta mayor {cuenta_mayor.codigo} no tiene agrupador_sat. "
                 f"La balanza SAT puede ser inválida."
             )
         
-        # 5. Crear subcuenta
-        subcuenta = CuentaContable.objects.create(
-            empresa=empresa,
-            codigo=nuevo_codigo,
-            nombre=f"{cuenta_mayor.nombre} - {nombre_tercero[:50]}",
-            tipo=cuenta_mayor.tipo,
-            naturaleza=cuenta_mayor.naturaleza,
-            es_deudora=cuenta_mayor.es_deudora,
-            nivel=2,  # Subcuenta
-            padre=cuenta_mayor,
-            rfc_tercero=rfc,
-            agrupador_sat=agrupador_sat_heredado  # HERENCIA CRÍTICA
-        )
+        with transaction.atomic():
+            numero = AccountResolver.siguiente_numero(cuenta_mayor)
+            
+            # Con la secuencia bloqueada, otro worker pudo haber creado la del mismo RFC
+            existente = CuentaContable.objects.filter(
+                empresa=empresa, padre=cuenta_mayor, rfc_tercero=rfc
+            ).order_by('id').first()
+            if existente:
+                return existente
+            
+            for _ in range(MAX_INTENTOS_CODIGO):
+                # Ejemplo: 105-01-001, 105-01-002, etc.
+                nuevo_codigo = f"{cuenta_mayor.codigo}-{str(numero).zfill(3)}"
+                try:
+                    with transaction.atomic():
+                        subcuenta = CuentaContable.objects.create(
+                            empresa=empresa,
+                            codigo=nuevo_codigo,
+                            nombre=f"{cuenta_mayor.nombre} - {nombre_tercero[:50]}",
+                            tipo=cuenta_mayor.tipo,
+                            naturaleza=cuenta_mayor.naturaleza,
+                            es_deudora=cuenta_mayor.es_deudora,
+                            nivel=2,  # Subcuenta
+                            padre=cuenta_mayor,
+                            rfc_tercero=rfc,
+                            agrupador_sat=agrupador_sat_heredado  # HERENCIA CRÍTICA
+                        )
+                    break
+                except IntegrityError:
+                    # Código capturado a mano o creado fuera del resolver: tomar el siguiente
+                    numero = AccountResolver.siguiente_numero(cuenta_mayor)
+            else:
+                raise ValueError(
+                    f"No se pudo asignar código de subcuenta bajo {cuenta_mayor.codigo} para RFC {rfc}"
+                )
         
         logger.info(
             f"✅ Subcuenta creada: {nuevo_codigo} - {nombre_tercero[:30]} "
@@ -123,7 +268,7 @@ class AccountResolver:
         
         return AccountResolver.get_or_create_subcuenta(
             empresa=empresa,
-            cuenta_mayor_codigo='105-01',  # Clientes Nacionales
+            cuenta_mayor_codigo=MAYOR_CLIENTES,
             rfc=factura.receptor_rfc,
             nombre_tercero=factura.receptor_nombre
         )
@@ -145,7 +290,7 @@ class AccountResolver:
         
         return AccountResolver.get_or_create_subcuenta(
             empresa=empresa,
-            cuenta_mayor_codigo='201-01',  # Proveedores Nacionales
+            cuenta_mayor_codigo=MAYOR_PROVEEDORES,
             rfc=factura.emisor_rfc,
             nombre_tercero=factura.emisor_nombre
         )
@@ -1,17 +1,36 @@
 from django.db import transaction, models
-from core.models import Factura, Poliza, MovimientoPoliza, Empresa, PlantillaPoliza, CuentaContable
+from core.models import Factura, Poliza, MovimientoPoliza, Empresa, PlantillaPoliza, CuentaContable, ManifiestoXML
 from core.services.account_resolver import AccountResolver
+from core.services.catalogo_cuentas import CatalogoCuentas
 from core.services.sat_uso_cfdi_map import get_account_config
 from decimal import Decimal
 import logging
 import os
 import xml.etree.ElementTree as ET
 from django.conf import settings
+from django.utils import timezone
 import decimal  # Importa todo el módulo
 
 logger = logging.getLogger(__name__)
 
 class AccountingService:
+    @staticmethod
+    def _xml_candidatos(xml_dir, uuid_str):
+        """
+        Archivos XML de una factura: primero el manifiesto de ingesta (ruta
+        exacta, sin listar el directorio); si no está registrado, busca el
+        UUID en los nombres de archivo.
+        """
+        rutas = [
+            r for r in ManifiestoXML.objects.filter(
+                factura_uuid=uuid_str, ruta__startswith=os.path.abspath(xml_dir)
+            ).values_list('ruta', flat=True)
+            if os.path.exists(r)
+        ]
+        if rutas:
+            return rutas
+        return [name for name in os.listdir(xml_dir) if uuid_str in name]
+
     @staticmethod
     def _accumulate_impuestos_from_xml(factura):
         """
@@ -36,8 +55,8 @@ class AccountingService:
 
         # Buscar archivo que contenga el UUID en el nombre
         if os.path.isdir(xml_dir):
-            for name in os.listdir(xml_dir):
-                if uuid_str in name and name.lower().endswith('.xml'):
+            for name in AccountingService._xml_candidatos(xml_dir, uuid_str):
+                if name.lower().endswith('.xml'):
                     path = os.path.join(xml_dir, name)
                     try:
                         tree = ET.parse(path)
@@ -243,7 +262,7 @@ class AccountingService:
         )
 
     @staticmethod
-    def _resolver_cuenta_por_uso_cfdi(empresa, uso_cfdi, factura):
+    def _resolver_cuenta_por_uso_cfdi(empresa, uso_cfdi, factura, catalogo=None, conceptos=None):
         """
         Resuelve la cuenta contable basándose en el UsoCFDI del SAT.
         Para G03 (Gastos Generales), usa clasificación inteligente por concepto.
@@ -253,51 +272,47 @@ class AccountingService:
             empresa: Empresa
             uso_cfdi: Código UsoCFDI (G01, G03, I04, etc.)
             factura: Factura (para logging y clasificación)
+            catalogo: CatalogoCuentas de la empresa (opcional, se obtiene si falta)
+            conceptos: Conceptos de la factura ya cargados (opcional)
         
         Returns:
             CuentaContable: Cuenta resuelta o creada
         """
+        catalogo = catalogo or CatalogoCuentas.de_empresa(empresa)
+        
         # CLASIFICACIÓN INTELIGENTE para G03 (Gastos Generales)
         if uso_cfdi == 'G03':
-            from core.utils.clasificador_gastos import clasificar_gasto_por_concepto
+            from core.services.clasificador_gastos import ClasificadorGastos
             
-            # Obtener concepto del primer item del XML (si existe)
-            concepto = ""
-            try:
-                # Intentar obtener concepto de la descripción de la factura
-                # o del primer concepto del XML
-                concepto = getattr(factura, 'concepto', '') or ""
-            except:
-                concepto = ""
+            if conceptos is None:
+                conceptos = list(factura.conceptos.all())
             
-            # Clasificar por concepto
-            codigo_cuenta = clasificar_gasto_por_concepto(
-                concepto=concepto,
-                emisor_rfc=factura.emisor_rfc
-            )
+            # Clasificar cada concepto por RFC / ClaveProdServ / descripción (reglas de la empresa)
+            codigo_cuenta = ClasificadorGastos.para_empresa(empresa).clasificar_factura(factura, conceptos)
             
             logger.info(
-                f"🎯 Clasificación inteligente: '{concepto[:50]}' → {codigo_cuenta}"
+                f"🎯 Clasificación inteligente: {len(conceptos)} concepto(s) → {codigo_cuenta}"
             )
             
             # Buscar la cuenta clasificada
-            try:
-                cuenta = CuentaContable.objects.get(
-                    empresa=empresa,
-                    codigo=codigo_cuenta
-                )
+            cuenta = catalogo.por_codigo.get(codigo_cuenta)
+            if cuenta is not None:
                 return cuenta
-            except CuentaContable.DoesNotExist:
-                # Si no existe, usar el default G03
-                logger.warning(
-                    f"⚠️  Cuenta {codigo_cuenta} no existe, usando default G03"
-                )
+            # Si no existe, usar el default G03
+            logger.warning(
+                f"⚠️  Cuenta {codigo_cuenta} no existe, usando default G03"
+            )
         
-        # Obtener configuración del mapa SAT (para otros UsoCFDI)
+        return AccountingService._cuenta_base_uso_cfdi(empresa, uso_cfdi, factura, catalogo)
+
+    @staticmethod
+    def _cuenta_base_uso_cfdi(empresa, uso_cfdi, factura, catalogo):
+        """Cuenta base del mapa SAT para el UsoCFDI (la crea si no existe)."""
         config = get_account_config(uso_cfdi)
         
         # Buscar o crear la cuenta
-        cuenta, created = CuentaContable.objects.get_or_create(
+        cuenta, created = CatalogoCuentas.obtener_o_crear(
+            catalogo=catalogo,
             empresa=empresa,
             codigo=config['codigo_base'],
             defaults={
@@ -321,9 +336,52 @@ class AccountingService:
             )
         
         return cuenta
+
+    @staticmethod
+    def _distribuir_gasto(empresa, uso_cfdi, factura, catalogo, conceptos, total_subtotal):
+        """
+        Reparte el subtotal de un egreso entre cuentas de gasto.
+        
+        Para G03 cada concepto se clasifica por separado (combustible,
+        mantenimiento, casetas...) y los conceptos de la misma cuenta se suman
+        en un solo renglón. Los conceptos sin regla, o cuya cuenta no existe en
+        el catálogo, van a la cuenta base de G03. Los demás UsoCFDI, o una
+        factura sin conceptos, generan un solo renglón por el subtotal.
+        
+        Returns:
+            list: [(CuentaContable, importe)] de mayor a menor importe
+        """
+        if uso_cfdi != 'G03' or not conceptos:
+            cuenta = AccountingService._resolver_cuenta_por_uso_cfdi(
+                empresa, uso_cfdi, factura, catalogo=catalogo, conceptos=conceptos
+            )
+            return [(cuenta, total_subtotal)]
+
+        from core.services.clasificador_gastos import ClasificadorGastos
+
+        importes = ClasificadorGastos.para_empresa(empresa).distribuir(factura, conceptos)
+        lineas = {}
+        cuenta_base = None
+        for codigo, importe in importes.items():
+            cuenta = catalogo.por_codigo.get(codigo)
+            if cuenta is None:
+                if cuenta_base is None:
+                    cuenta_base = AccountingService._cuenta_base_uso_cfdi(empresa, uso_cfdi, factura, catalogo)
+                cuenta = cuenta_base
+            previa = lineas.get(cuenta.id)
+            lineas[cuenta.id] = (cuenta, (previa[1] if previa else Decimal('0.00')) + importe)
+
+        lineas = sorted(lineas.values(), key=lambda linea: linea[1], reverse=True)
+        # Renglones en cero solo si toda la factura está en cero
+        lineas = [linea for linea in lineas if linea[1]] or lineas[:1]
+        logger.info(
+            f"🎯 Distribución por concepto: {len(conceptos)} concepto(s) → "
+            + ", ".join(f"{cuenta.codigo}={importe}" for cuenta, importe in lineas)
+        )
+        return lineas
     
     @staticmethod
-    def contabilizar_factura(factura_uuid, usuario_id=None, plantilla_id=None):
+    def contabilizar_factura(factura_uuid, usuario_id=None, plantilla_id=None, conceptos=None):
         """
         Genera la Póliza Contable para una factura dada usando una Plantilla.
         
@@ -336,6 +394,7 @@ class AccountingService:
             factura_uuid: UUID de la factura a contabilizar
             usuario_id: ID del usuario que contabiliza (opcional)
             plantilla_id: ID de plantilla específica (opcional, si no se usa auto-selección)
+            conceptos: Conceptos de la factura precargados por el lote (opcional)
         
         Returns:
             Poliza: La póliza contable creada
@@ -343,12 +402,102 @@ class AccountingService:
         Raises:
             ValueError: Si no se puede contabilizar o falta configuración
         """
+        return AccountingService._generar_poliza(factura_uuid, usuario_id, plantilla_id, conceptos)[0]
+
+    @staticmethod
+    def recontabilizar_factura(factura_uuid, usuario_id=None, plantilla_id=None, conceptos=None):
+        """
+        Regenera la póliza de una factura aplicando solo las diferencias.
+
+        Calcula los movimientos que produciría contabilizar_factura y los compara
+        con los de la póliza existente: los renglones iguales no se tocan, los
+        que cambiaron de importe o descripción se actualizan y el resto se
+        inserta o elimina. La póliza conserva su id. Una factura cuya póliza ya
+        está al día no genera escrituras.
+
+        Si la factura no tiene póliza se crea igual que en contabilizar_factura.
+
+        Returns:
+            tuple: (Poliza, cambios) con cambios = {'insertados', 'actualizados', 'eliminados', 'cabecera'}
+        """
+        return AccountingService._generar_poliza(
+            factura_uuid, usuario_id, plantilla_id, conceptos, diferencial=True
+        )
+
+    @staticmethod
+    def _aplicar_diferencias(poliza, movs, fecha, descripcion, plantilla):
+        """Lleva la póliza existente a la cabecera y movimientos objetivo con el mínimo de escrituras."""
+        def importe(valor):
+            return Decimal(valor or 0).quantize(Decimal('0.01'))
+
+        cambios = {'insertados': 0, 'actualizados': 0, 'eliminados': 0, 'cabecera': False}
+
+        fecha_actual = poliza.fecha
+        if hasattr(fecha_actual, 'tzinfo') and timezone.is_aware(fecha_actual):
+            fecha_actual = timezone.localtime(fecha_actual)
+        fecha_actual = fecha_actual.date() if hasattr(fecha_actual, 'date') else fecha_actual
+        if (fecha_actual != fecha or poliza.descripcion != descripcion
+                or poliza.plantilla_usada_id != getattr(plantilla, 'id', None)):
+            poliza.fecha = fecha
+            poliza.descripcion = descripcion
+            poliza.plantilla_usada = plantilla
+            poliza.save(update_fields=['fecha', 'descripcion', 'plantilla_usada'])
+            cambios['cabecera'] = True
+
+        # Renglones idénticos (misma cuenta, importes y descripción) se conservan
+        existentes = {}
+        for mov in MovimientoPoliza.objects.filter(poliza=poliza).order_by('id'):
+            clave = (mov.cuenta_id, importe(mov.debe), importe(mov.haber), mov.descripcion)
+            existentes.setdefault(clave, []).append(mov)
+        faltantes = []
+        for mov in movs:
+            clave = (mov.cuenta_id, importe(mov.debe), importe(mov.haber), mov.descripcion)
+            if existentes.get(clave):
+                existentes[clave].pop(0)
+            else:
+                faltantes.append(mov)
+        sobrantes = [mov for lista in existentes.values() for mov in lista]
+
+        # Misma cuenta con otro importe/descripción: se actualiza en lugar de borrar e insertar
+        por_cuenta = {}
+        for mov in sobrantes:
+            por_cuenta.setdefault(mov.cuenta_id, []).append(mov)
+        actualizar = []
+        insertar = []
+        for mov in faltantes:
+            candidatos = por_cuenta.get(mov.cuenta_id)
+            if candidatos:
+                previo = candidatos.pop(0)
+                previo.debe, previo.haber, previo.descripcion = mov.debe, mov.haber, mov.descripcion
+                actualizar.append(previo)
+            else:
+                insertar.append(mov)
+        eliminar = [mov.id for lista in por_cuenta.values() for mov in lista]
+
+        if eliminar:
+            MovimientoPoliza.objects.filter(id__in=eliminar).delete()
+        if actualizar:
+            MovimientoPoliza.objects.bulk_update(actualizar, ['debe', 'haber', 'descripcion'])
+        if insertar:
+            MovimientoPoliza.objects.bulk_create(insertar)
+        cambios.update(insertados=len(insertar), actualizados=len(actualizar), eliminados=len(eliminar))
+        return cambios
+
+    @staticmethod
+    def _generar_poliza(factura_uuid, usuario_id=None, plantilla_id=None, conceptos=None, diferencial=False):
+        """
+        Construye los movimientos de la póliza de una factura. Con diferencial=True
+        reutiliza la póliza existente (ver recontabilizar_factura).
+
+        Returns:
+            tuple: (Poliza, cambios)
+        """
         try:
             factura = Factura.objects.select_related('empresa').get(uuid=factura_uuid)
         except Factura.DoesNotExist:
             raise ValueError("Factura no encontrada")
 
-        if factura.estado_contable == 'CONTABILIZADA':
+        if factura.estado_contable == 'CONTABILIZADA' and not diferencial:
             raise ValueError("Esta factura ya está contabilizada")
         
         if factura.estado_contable == 'EXCLUIDA':
@@ -385,17 +534,31 @@ class AccountingService:
                 "Configure una en el Panel de Administración o seleccione una manualmente."
             )
 
+        # Catálogo de cuentas en memoria: la tabla solo se toca para crear cuentas faltantes
+        catalogo = CatalogoCuentas.de_empresa(factura.empresa)
+
+        fecha_poliza = factura.fecha.date() if hasattr(factura.fecha, 'date') else factura.fecha
+        descripcion_poliza = f"{factura.get_tipo_comprobante_display()} - {factura.emisor_nombre[:50]}"
+
         with transaction.atomic():
-            # 2. Limpieza de Póliza Previa (si existe)
-            Poliza.objects.filter(factura=factura).delete()
-
-            # 3. Crear Cabecera de Póliza
-            poliza = Poliza.objects.create(
-                factura=factura,
-                fecha=factura.fecha.date() if hasattr(factura.fecha, 'date') else factura.fecha,
-                descripcion=f"{factura.get_tipo_comprobante_display()} - {factura.emisor_nombre[:50]}",
-                plantilla_usada=plantilla
-            )
+            # Modo diferencial: se conserva la póliza existente y al final solo se aplican cambios
+            existente = None
+            if diferencial:
+                existente = Poliza.objects.select_for_update().filter(factura=factura).first()
+
+            if existente is not None:
+                poliza = existente
+            else:
+                # 2. Limpieza de Póliza Previa (si existe)
+                Poliza.objects.filter(factura=factura).delete()
+
+                # 3. Crear Cabecera de Póliza
+                poliza = Poliza.objects.create(
+                    factura=factura,
+                    fecha=fecha_poliza,
+                    descripcion=descripcion_poliza,
+                    plantilla_usada=plantilla
+                )
 
             # 4. Generar Movimientos según NATURALEZA (I/E)
             # CRÍTICO: Usar naturaleza en lugar de tipo_comprobante
@@ -406,9 +569,10 @@ class AccountingService:
 
             # --- AUDITORÍA 360°: calcular y validar componentes clave del comprobante
             # Subtotal real: suma de importes en conceptos (fallback a factura.subtotal)
-            conceptos_qs = factura.conceptos.all()
-            if conceptos_qs.exists():
-                total_subtotal = sum((c.importe for c in conceptos_qs), Decimal('0.00'))
+            if conceptos is None:
+                conceptos = list(factura.conceptos.all())
+            if conceptos:
+                total_subtotal = sum((c.importe for c in conceptos), Decimal('0.00'))
             else:
                 total_subtotal = getattr(factura, 'subtotal', Decimal('0.00')) or Decimal('0.00')
 
@@ -446,7 +610,8 @@ class AccountingService:
                 # Resolver cuenta de INGRESO (Ventas o Devoluciones)
                 if es_nota_credito:
                     # Nota de Crédito: 402-01 Devoluciones sobre ventas
-                    cuenta_ingreso, created = CuentaContable.objects.get_or_create(
+                    cuenta_ingreso, created = CatalogoCuentas.obtener_o_crear(
+                        catalogo=catalogo,
                         empresa=factura.empresa,
                         codigo='402-01',
                         defaults={
@@ -462,7 +627,8 @@ class AccountingService:
                         logger.info(f"✅ Cuenta 402-01 Devoluciones creada para {factura.empresa.nombre}")
                 else:
                     # Venta normal: 401-01 Ventas y/o Servicios
-                    cuenta_ingreso, created = CuentaContable.objects.get_or_create(
+                    cuenta_ingreso, created = CatalogoCuentas.obtener_o_crear(
+                        catalogo=catalogo,
                         empresa=factura.empresa,
                         codigo='401-01',
                         defaults={
@@ -490,7 +656,8 @@ class AccountingService:
                 except Exception as e:
                     logger.error(f"❌ Error resolviendo cuenta cliente: {e}")
                     # Fallback a cuenta genérica
-                    cuenta_cliente, _ = CuentaContable.objects.get_or_create(
+                    cuenta_cliente, _ = CatalogoCuentas.obtener_o_crear(
+                        catalogo=catalogo,
                         empresa=factura.empresa,
                         codigo='105-01',
                         defaults={'nombre': 'Clientes', 'tipo': 'ACTIVO', 'nivel': 1}
@@ -508,7 +675,8 @@ class AccountingService:
                     ))
                     # IVA (si aplica)
                     if total_iva_trasladado > 0:
-                        cuenta_iva, _ = CuentaContable.objects.get_or_create(
+                        cuenta_iva, _ = CatalogoCuentas.obtener_o_crear(
+                            catalogo=catalogo,
                             empresa=factura.empresa,
                             codigo='119-01',
                             defaults={'nombre': 'IVA Acreditable', 'tipo': 'ACTIVO', 'nivel': 1}
@@ -549,7 +717,8 @@ class AccountingService:
                         cliente_debe_final = cargo_clientes_calc
 
                     if reten_total and reten_total != Decimal('0.00'):
-                        reten_cta, created = CuentaContable.objects.get_or_create(
+                        reten_cta, created = CatalogoCuentas.obtener_o_crear(
+                            catalogo=catalogo,
                             empresa=factura.empresa,
                             codigo='119-02',
                             defaults={
@@ -584,7 +753,8 @@ class AccountingService:
                     monto_descuento = (total_descuento or Decimal('0.00'))
                     if monto_descuento and monto_descuento != Decimal('0.00'):
                         # Crear/obtener cuenta 402-01 Descuentos sobre Ventas como auxiliar (nivel 3)
-                        desc_cta, created = CuentaContable.objects.get_or_create(
+                        desc_cta, created = CatalogoCuentas.obtener_o_crear(
+                            catalogo=catalogo,
                             empresa=factura.empresa,
                             codigo='402-01',
                             defaults={
@@ -618,7 +788,8 @@ class AccountingService:
                     # Abono a IVA Trasladado (ajustado si es necesario para empatar con Total XML)
                     iva_to_post = (total_iva_trasladado or Decimal('0.00')) + (iva_adjustment or Decimal('0.00'))
                     if iva_to_post and iva_to_post != Decimal('0.00'):
-                        cuenta_iva, _ = CuentaContable.objects.get_or_create(
+                        cuenta_iva, _ = CatalogoCuentas.obtener_o_crear(
+                            catalogo=catalogo,
                             empresa=factura.empresa,
                             codigo='216-01',
                             defaults={'nombre': 'IVA Trasladado', 'tipo': 'PASIVO', 'nivel': 1, 'agrupador_sat': '216.01'}
@@ -641,33 +812,38 @@ class AccountingService:
                 # - etc.
                 
                 try:
-                    cuenta_gasto = AccountingService._resolver_cuenta_por_uso_cfdi(
+                    lineas_gasto = AccountingService._distribuir_gasto(
                         empresa=factura.empresa,
                         uso_cfdi=factura.uso_cfdi or 'G03',  # Default G03 si no tiene
-                        factura=factura
+                        factura=factura,
+                        catalogo=catalogo,
+                        conceptos=conceptos,
+                        total_subtotal=total_subtotal
                     )
                     logger.info(
-                        f"✅ Cuenta por UsoCFDI '{factura.uso_cfdi or 'G03'}': "
-                        f"{cuenta_gasto.codigo} - {cuenta_gasto.nombre}"
+                        f"✅ Cuenta(s) por UsoCFDI '{factura.uso_cfdi or 'G03'}': "
+                        + ", ".join(f"{cuenta.codigo} - {cuenta.nombre}" for cuenta, _ in lineas_gasto)
                     )
                 except Exception as e:
                     logger.error(f"❌ Error resolviendo UsoCFDI, usando plantilla: {e}")
                     # Fallback a plantilla si falla
-                    cuenta_gasto = plantilla.cuenta_provision
+                    lineas_gasto = [(plantilla.cuenta_provision, total_subtotal)]
                 
-                # Cargo a Gasto/Costo/Inversión -> Subtotal
-                movs.append(MovimientoPoliza(
-                    poliza=poliza, 
-                    cuenta=cuenta_gasto,  # ← CUENTA DINÁMICA POR UsoCFDI
-                    debe=total_subtotal, 
-                    haber=0, 
-                    descripcion=f"{cuenta_gasto.nombre[:50]}"
-                ))
+                # Cargo a Gasto/Costo/Inversión -> Subtotal (un renglón por cuenta)
+                for cuenta_gasto, importe_gasto in lineas_gasto:
+                    movs.append(MovimientoPoliza(
+                        poliza=poliza, 
+                        cuenta=cuenta_gasto,  # ← CUENTA DINÁMICA POR UsoCFDI / CONCEPTO
+                        debe=importe_gasto, 
+                        haber=0, 
+                        descripcion=f"{cuenta_gasto.nombre[:50]}"
+                    ))
                 # Cargo a Impuesto (IVA Acreditable) -> Impuestos
                 if total_iva_trasladado > 0:
-                    if plantilla.cuenta_impuesto:
+                    if plantilla.cuenta_impuesto_id:
+                        cuenta_impuesto = catalogo.por_id.get(plantilla.cuenta_impuesto_id) or plantilla.cuenta_impuesto
                         movs.append(MovimientoPoliza(
-                            poliza=poliza, cuenta=plantilla.cuenta_impuesto, 
+                            poliza=poliza, cuenta=cuenta_impuesto, 
                             debe=total_iva_trasladado, haber=0, 
                             descripcion="IVA Acreditable"
                         ))
@@ -703,7 +879,8 @@ class AccountingService:
 
                 if retenciones != Decimal('0.00'):
                     # Buscar/crear cuenta de Retenciones por Pagar (preferencia 213-01)
-                    retenidos_cta, created = CuentaContable.objects.get_or_create(
+                    retenidos_cta, created = CatalogoCuentas.obtener_o_crear(
+                        catalogo=catalogo,
                         empresa=factura.empresa,
                         codigo='213-01',
                         defaults={
@@ -732,7 +909,8 @@ class AccountingService:
                 monto_descuento = (total_descuento or Decimal('0.00'))
                 if monto_descuento and monto_descuento != Decimal('0.00'):
                     # Crear/obtener cuenta 502-01 Descuentos sobre Compras como auxiliar (nivel 3)
-                    desc_cta, created = CuentaContable.objects.get_or_create(
+                    desc_cta, created = CatalogoCuentas.obtener_o_crear(
+                        catalogo=catalogo,
                         empresa=factura.empresa,
                         codigo='502-01',
                         defaults={
@@ -801,7 +979,8 @@ class AccountingService:
                             target = '402'
 
                     if target == '402':
-                        desc_cta, created = CuentaContable.objects.get_or_create(
+                        desc_cta, created = CatalogoCuentas.obtener_o_crear(
+                            catalogo=catalogo,
                             empresa=factura.empresa,
                             codigo='402-01',
                             defaults={
@@ -823,7 +1002,8 @@ class AccountingService:
                             descripcion='Descuento (XML) - registrado automáticamente'
                         ))
                     else:
-                        desc_cta, created = CuentaContable.objects.get_or_create(
+                        desc_cta, created = CatalogoCuentas.obtener_o_crear(
+                            catalogo=catalogo,
                             empresa=factura.empresa,
                             codigo='502-01',
                             defaults={
@@ -880,7 +1060,8 @@ class AccountingService:
                     )
                     
                     # Crear cuenta de ajuste si no existe
-                    cuenta_ajuste, _ = CuentaContable.objects.get_or_create(
+                    cuenta_ajuste, _ = CatalogoCuentas.obtener_o_crear(
+                        catalogo=catalogo,
                         empresa=factura.empresa,
                         codigo='702-99',
                         defaults={
@@ -915,10 +1096,17 @@ class AccountingService:
                 raise ValueError(f"Desbalance en póliza generada para factura {factura.uuid}. Revise la plantilla utilizada.")
 
             # Guardar Movimientos
-            MovimientoPoliza.objects.bulk_create(movs)
+            if existente is not None:
+                cambios = AccountingService._aplicar_diferencias(
+                    poliza, movs, fecha_poliza, descripcion_poliza, plantilla
+                )
+            else:
+                MovimientoPoliza.objects.bulk_create(movs)
+                cambios = {'insertados': len(movs), 'actualizados': 0, 'eliminados': 0, 'cabecera': True}
             
             # 6. Actualizar Estado
-            factura.estado_contable = 'CONTABILIZADA'
-            factura.save()
+            if factura.estado_contable != 'CONTABILIZADA':
+                factura.estado_contable = 'CONTABILIZADA'
+                factura.save()
             
-            return poliza
+            return poliza, cambios
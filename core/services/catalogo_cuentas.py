@@ -0,0 +1,107 @@
+"""
+Catálogo de Cuentas en Memoria (por empresa)
+
+Copia del catálogo de una empresa (codigo → cuenta, id → cuenta) que se carga
+una vez por proceso y se reutiliza en la contabilización y en la edición de
+pólizas. Cada copia guarda la versión con la que se cargó (VersionCatalogo);
+cualquier alta, cambio o baja en CuentaContable incrementa la versión
+(core/signals.py) y la siguiente consulta recarga el catálogo.
+
+Las subcuentas por RFC de clientes/proveedores no forman parte de la copia:
+son miles, se crean durante la contabilización y las resuelve AccountResolver.
+Su alta no invalida el catálogo.
+
+Operaciones masivas que no disparan signals (bulk_create, update, SQL directo)
+deben llamar a CatalogoCuentas.invalidar(empresa_id).
+"""
+
+from django.db.models import F, Q
+from core.models import CuentaContable, VersionCatalogo
+import logging
+
+logger = logging.getLogger(__name__)
+
+# empresa_id -> CatalogoCuentas cargado en este proceso
+_catalogos = {}
+
+
+class CatalogoCuentas:
+    """
+    Uso:
+        catalogo = CatalogoCuentas.de_empresa(empresa)
+        cuenta = catalogo.por_codigo.get('216-01')
+        cuenta, created = CatalogoCuentas.obtener_o_crear(empresa, '216-01', defaults={...})
+    """
+
+    def __init__(self, empresa_id, version):
+        self.empresa_id = empresa_id
+        self.version = version
+        self.por_codigo = {}
+        self.por_id = {}
+
+    @staticmethod
+    def version_actual(empresa_id):
+        version = VersionCatalogo.objects.filter(empresa_id=empresa_id).values_list('version', flat=True).first()
+        if version is None:
+            # La fila se crea con la primera carga; antes no hay copias que invalidar
+            version = VersionCatalogo.objects.get_or_create(empresa_id=empresa_id)[0].version
+        return version
+
+    @staticmethod
+    def invalidar(empresa_id):
+        """Incrementa la versión del catálogo de la empresa (visible para todos los procesos)."""
+        VersionCatalogo.objects.filter(empresa_id=empresa_id).update(version=F('version') + 1)
+
+    @staticmethod
+    def de_empresa(empresa):
+        """Catálogo vigente de la empresa: una consulta de versión y, si cambió, la recarga."""
+        empresa_id = getattr(empresa, 'id', empresa)
+        version = CatalogoCuentas.version_actual(empresa_id)
+        catalogo = _catalogos.get(empresa_id)
+        if catalogo is None or catalogo.version != version:
+            catalogo = CatalogoCuentas._cargar(empresa_id, version)
+            _catalogos[empresa_id] = catalogo
+        return catalogo
+
+    @staticmethod
+    def _cargar(empresa_id, version):
+        catalogo = CatalogoCuentas(empresa_id, version)
+        cuentas = CuentaContable.objects.filter(empresa_id=empresa_id).filter(
+            Q(rfc_tercero__isnull=True) | Q(rfc_tercero='')
+        )
+        for cuenta in cuentas:
+            catalogo.por_codigo[cuenta.codigo] = cuenta
+            catalogo.por_id[cuenta.id] = cuenta
+        logger.debug(f"📒 Catálogo empresa {empresa_id} v{version}: {len(catalogo.por_id)} cuentas")
+        return catalogo
+
+    @staticmethod
+    def obtener_o_crear(empresa, codigo, defaults=None, catalogo=None):
+        """
+        Equivalente a CuentaContable.objects.get_or_create(empresa, codigo, defaults)
+        que solo consulta la tabla cuando la cuenta no está en el catálogo.
+
+        Returns:
+            tuple: (cuenta, created)
+        """
+        catalogo = catalogo or CatalogoCuentas.de_empresa(empresa)
+        cuenta = catalogo.por_codigo.get(codigo)
+        if cuenta is not None:
+            return cuenta, False
+        # La alta incrementa la versión (signal) y el catálogo se recarga en la siguiente consulta
+        return CuentaContable.objects.get_or_create(empresa=empresa, codigo=codigo, defaults=defaults or {})
+
+    @staticmethod
+    def cuentas_por_id(empresa, ids, catalogo=None):
+        """
+        {id: cuenta} para los ids dados, restringido a la empresa. Los ids fuera del
+        catálogo (subcuentas por RFC) se buscan en una sola consulta.
+        """
+        catalogo = catalogo or CatalogoCuentas.de_empresa(empresa)
+        ids = {int(i) for i in ids}
+        encontradas = {i: catalogo.por_id[i] for i in ids if i in catalogo.por_id}
+        faltantes = ids - set(encontradas)
+        if faltantes:
+            for cuenta in CuentaContable.objects.filter(empresa_id=catalogo.empresa_id, id__in=faltantes):
+                encontradas[cuenta.id] = cuenta
+        return encontradas
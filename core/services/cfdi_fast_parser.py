@@ -0,0 +1,268 @@
+"""
+Extractor Rápido de CFDI
+
+Lee en streaming (lxml.iterparse, sin construir el árbol completo) solo los
+datos que se persisten de un CFDI 3.3/4.0:
+
+- Atributos del Comprobante (Fecha, tipo, importes, moneda)
+- Emisor y Receptor (RFC, nombre, UsoCFDI)
+- Conceptos con la suma de sus traslados/retenciones
+- Totales de Impuestos del Comprobante
+- UUID del Timbre Fiscal Digital
+
+Los documentos inusuales (CFDI 3.2, namespaces desconocidos, sin timbre)
+se procesan con satcfdi como respaldo y se normalizan a la misma estructura.
+
+Estructura retornada por `extraer_cfdi`:
+    {
+        'version', 'uuid', 'fecha' (datetime), 'tipo_comprobante' ('I','E',...),
+        'subtotal', 'descuento', 'total' (Decimal), 'moneda',
+        'emisor': {'rfc', 'nombre'},
+        'receptor': {'rfc', 'nombre', 'uso_cfdi'},
+        'total_impuestos_trasladados', 'total_impuestos_retenidos' (Decimal),
+        'conceptos': [{'clave_prod_serv', 'cantidad', 'descripcion',
+                       'valor_unitario', 'importe', 'descuento',
+                       'traslados', 'retenciones'}],
+        'parser': 'rapido' | 'satcfdi',
+    }
+"""
+
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from io import BytesIO
+from lxml import etree
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+NS_CFDI = {
+    'http://www.sat.gob.mx/cfd/3': '3.3',
+    'http://www.sat.gob.mx/cfd/4': '4.0',
+}
+NS_TFD = 'http://www.sat.gob.mx/TimbreFiscalDigital'
+
+
+class CfdiNoSoportado(Exception):
+    """El extractor rápido no reconoce el documento; usar satcfdi."""
+
+
+def _dec(valor):
+    if valor in (None, ''):
+        return Decimal(0)
+    try:
+        return Decimal(str(valor))
+    except InvalidOperation:
+        raise ValueError(f"Importe inválido: {valor}")
+
+
+def _codigo(valor):
+    """Normaliza un catálogo SAT ('I - Ingreso', Code('G03', ...)) a su clave."""
+    if valor is None:
+        return None
+    valor = getattr(valor, 'code', valor)
+    return str(valor).split(' - ')[0].strip()
+
+
+def normalizar_tipo_comprobante(valor):
+    if not valor:
+        return None
+    valor = _codigo(valor).upper()
+    for tipo in ('I', 'E', 'T', 'N', 'P'):
+        if valor.startswith(tipo):
+            return tipo
+    return valor
+
+
+def leer_bytes(fuente):
+    """Acepta ruta, bytes o archivo (incluye UploadedFile de Django)."""
+    if isinstance(fuente, bytes):
+        return fuente
+    if isinstance(fuente, str):
+        with open(fuente, 'rb') as fh:
+            return fh.read()
+    if hasattr(fuente, 'seek'):
+        fuente.seek(0)
+    contenido = fuente.read()
+    if hasattr(fuente, 'seek'):
+        fuente.seek(0)
+    return contenido
+
+
+def _extraer_rapido(contenido):
+    datos = None
+    conceptos = []
+    concepto = None
+    pila = []
+
+    parser = etree.iterparse(
+        BytesIO(contenido),
+        events=('start', 'end'),
+        resolve_entities=False,
+        no_network=True,
+        remove_comments=True,
+    )
+    for evento, elem in parser:
+        if evento == 'end':
+            pila.pop()
+            elem.clear()
+            continue
+
+        ns, _, nombre = elem.tag[1:].partition('}') if elem.tag.startswith('{') else ('', '', elem.tag)
+        pila.append(nombre)
+        attrs = elem.attrib
+
+        if len(pila) == 1:
+            if nombre != 'Comprobante' or ns not in NS_CFDI:
+                raise CfdiNoSoportado(f"Raíz no soportada: {elem.tag}")
+            version = attrs.get('Version')
+            if version != NS_CFDI[ns]:
+                raise CfdiNoSoportado(f"Versión no soportada: {version}")
+            if not attrs.get('Fecha'):
+                raise CfdiNoSoportado("Comprobante sin Fecha")
+            datos = {
+                'version': version,
+                'uuid': None,
+                'fecha': datetime.fromisoformat(attrs['Fecha']),
+                'tipo_comprobante': normalizar_tipo_comprobante(attrs.get('TipoDeComprobante')),
+                'subtotal': _dec(attrs.get('SubTotal')),
+                'descuento': _dec(attrs.get('Descuento')),
+                'total': _dec(attrs.get('Total')),
+                'moneda': attrs.get('Moneda'),
+                'emisor': {},
+                'receptor': {},
+                'total_impuestos_trasladados': Decimal(0),
+                'total_impuestos_retenidos': Decimal(0),
+                'conceptos': conceptos,
+                'parser': 'rapido',
+            }
+            continue
+
+        seccion = pila[1]
+        if seccion == 'Addenda':
+            continue
+
+        if len(pila) == 2:
+            if nombre == 'Emisor':
+                datos['emisor'] = {'rfc': attrs.get('Rfc'), 'nombre': attrs.get('Nombre')}
+            elif nombre == 'Receptor':
+                datos['receptor'] = {
+                    'rfc': attrs.get('Rfc'),
+                    'nombre': attrs.get('Nombre'),
+                    'uso_cfdi': attrs.get('UsoCFDI'),
+                }
+            elif nombre == 'Impuestos':
+                datos['total_impuestos_trasladados'] = _dec(attrs.get('TotalImpuestosTrasladados'))
+                datos['total_impuestos_retenidos'] = _dec(attrs.get('TotalImpuestosRetenidos'))
+
+        elif seccion == 'Conceptos':
+            if len(pila) == 3 and nombre == 'Concepto':
+                concepto = {
+                    'clave_prod_serv': attrs.get('ClaveProdServ'),
+                    'cantidad': _dec(attrs.get('Cantidad')),
+                    'descripcion': attrs.get('Descripcion'),
+                    'valor_unitario': _dec(attrs.get('ValorUnitario')),
+                    'importe': _dec(attrs.get('Importe')),
+                    'descuento': _dec(attrs.get('Descuento')),
+                    'traslados': Decimal(0),
+                    'retenciones': Decimal(0),
+                }
+                conceptos.append(concepto)
+            # Concepto/Impuestos/Traslados/Traslado (no Parte ni ACuentaTerceros)
+            elif len(pila) == 6 and pila[3] == 'Impuestos' and concepto is not None:
+                if nombre == 'Traslado':
+                    concepto['traslados'] += _dec(attrs.get('Importe'))
+                elif nombre == 'Retencion':
+                    concepto['retenciones'] += _dec(attrs.get('Importe'))
+
+        elif seccion == 'Complemento':
+            if nombre == 'TimbreFiscalDigital' and ns == NS_TFD:
+                datos['uuid'] = attrs.get('UUID')
+
+    if datos is None:
+        raise CfdiNoSoportado("Documento vacío")
+    if not datos['uuid']:
+        raise CfdiNoSoportado("Sin Timbre Fiscal Digital")
+    return datos
+
+
+def _extraer_satcfdi(contenido):
+    """Respaldo: satcfdi construye el objeto completo y se normaliza."""
+    from satcfdi.cfdi import CFDI
+
+    cfdi = CFDI.from_string(contenido)
+
+    def _valores(nodo):
+        # satcfdi agrupa traslados en dict por impuesto; a veces es lista
+        if not nodo:
+            return []
+        return list(nodo.values()) if isinstance(nodo, dict) else list(nodo)
+
+    emisor = cfdi.get('Emisor') or {}
+    receptor = cfdi.get('Receptor') or {}
+    impuestos = cfdi.get('Impuestos') or {}
+    timbre = (cfdi.get('Complemento') or {}).get('TimbreFiscalDigital') or {}
+    if isinstance(timbre, list):
+        timbre = timbre[0] if timbre else {}
+
+    conceptos = []
+    for c in cfdi.get('Conceptos') or []:
+        c_imp = c.get('Impuestos') or {}
+        conceptos.append({
+            'clave_prod_serv': _codigo(c.get('ClaveProdServ')),
+            'cantidad': _dec(c.get('Cantidad')),
+            'descripcion': c.get('Descripcion'),
+            'valor_unitario': _dec(c.get('ValorUnitario')),
+            'importe': _dec(c.get('Importe')),
+            'descuento': _dec(c.get('Descuento')),
+            'traslados': sum((_dec(t.get('Importe')) for t in _valores(c_imp.get('Traslados'))), Decimal(0)),
+            'retenciones': sum((_dec(r.get('Importe')) for r in _valores(c_imp.get('Retenciones'))), Decimal(0)),
+        })
+
+    return {
+        'version': cfdi.get('Version'),
+        'uuid': timbre.get('UUID'),
+        'fecha': cfdi.get('Fecha'),
+        'tipo_comprobante': normalizar_tipo_comprobante(cfdi.get('TipoDeComprobante')),
+        'subtotal': _dec(cfdi.get('SubTotal')),
+        'descuento': _dec(cfdi.get('Descuento')),
+        'total': _dec(cfdi.get('Total')),
+        'moneda': _codigo(cfdi.get('Moneda')),
+        'emisor': {'rfc': emisor.get('Rfc'), 'nombre': emisor.get('Nombre')},
+        'receptor': {
+            'rfc': receptor.get('Rfc'),
+            'nombre': receptor.get('Nombre'),
+            'uso_cfdi': _codigo(receptor.get('UsoCFDI')),
+        },
+        'total_impuestos_trasladados': _dec(impuestos.get('TotalImpuestosTrasladados')),
+        'total_impuestos_retenidos': _dec(impuestos.get('TotalImpuestosRetenidos')),
+        'conceptos': conceptos,
+        'parser': 'satcfdi',
+    }
+
+
+def extraer_cfdi(fuente):
+    """
+    Extrae los datos persistibles de un CFDI.
+
+    Args:
+        fuente: ruta, bytes o archivo abierto
+
+    Returns:
+        dict: ver docstring del módulo
+
+    Raises:
+        ValueError: si el documento no es un CFDI legible
+    """
+    contenido = leer_bytes(fuente)
+    try:
+        return _extraer_rapido(contenido)
+    except CfdiNoSoportado as e:
+        logger.info(f"ℹ️ Extractor rápido no aplica ({e}); usando satcfdi")
+    except (etree.XMLSyntaxError, ValueError) as e:
+        logger.info(f"ℹ️ Extractor rápido falló ({e}); usando satcfdi")
+
+    try:
+        return _extraer_satcfdi(contenido)
+    except Exception as e:
+        raise ValueError(f"XML inválido o no es CFDI legible: {str(e)}")
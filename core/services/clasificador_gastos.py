@@ -0,0 +1,244 @@
+"""
+Clasificador de Gastos por Reglas
+
+Clasifica conceptos de gasto en una cuenta usando reglas por empresa
+(ReglaClasificacion) más las reglas base de palabras clave del sistema.
+
+Orden de evaluación (gana la primera que aplica):
+1. Reglas de la empresa: RFC del emisor, prefijo de ClaveProdServ, palabra clave
+2. Reglas generales (empresa vacía), mismo orden
+3. Reglas base (PALABRAS_BASE)
+
+Las palabras clave de cada nivel se compilan en una sola expresión regular;
+una búsqueda por descripción basta para encontrar la regla de mayor prioridad.
+Los resultados se memorizan por (RFC, ClaveProdServ, descripción normalizada),
+así que un lote con conceptos repetidos solo evalúa cada combinación una vez.
+
+El clasificador compilado de cada empresa se reutiliza mientras sus reglas no
+cambien (se compara la fecha de última modificación y el número de reglas).
+"""
+
+from django.db.models import Count, Max, Q
+from core.models import ReglaClasificacion
+import logging
+import re
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+CUENTA_DEFAULT = '601-99'  # Otros gastos
+
+# Reglas base (antes codificadas en core/utils/clasificador_gastos.py), en orden de prioridad
+PALABRAS_BASE = (
+    ('601-05', ('GASOLINA', 'DIESEL', 'COMBUSTIBLE', 'PEMEX', 'GAS', 'LUBRICANTE', 'ACEITE')),  # Combustibles
+    ('601-03', ('RENTA', 'ARRENDAMIENTO', 'ALQUILER', 'LEASE')),  # Arrendamiento
+    ('601-08', ('LUZ', 'CFE', 'AGUA', 'TELMEX', 'TELEFONO', 'INTERNET', 'ELECTRICIDAD')),  # Servicios públicos
+    ('601-02', ('HONORARIOS', 'SERVICIOS PROFESIONALES', 'CONSULTORIA', 'ASESORIA',
+                'CONTADOR', 'ABOGADO', 'NOTARIO')),  # Honorarios
+    ('601-01', ('NOMINA', 'SUELDO', 'SALARIO', 'PAGO EMPLEADO', 'REMUNERACION')),  # Sueldos
+    ('601-04', ('MANTENIMIENTO', 'REPARACION', 'REFACCION', 'TALLER', 'SERVICIO MECANICO')),  # Mantenimiento
+    ('601-06', ('SEGURO', 'POLIZA', 'FIANZA', 'ASEGURADORA')),  # Seguros
+    ('601-07', ('PAPELERIA', 'OFFICE', 'UTILES', 'MATERIAL OFICINA', 'TONER', 'PAPEL')),  # Papelería
+    ('601-09', ('PUBLICIDAD', 'MARKETING', 'PROMOCION', 'ANUNCIO', 'FACEBOOK', 'GOOGLE ADS')),  # Publicidad
+    ('601-10', ('VIATICO', 'HOTEL', 'HOSPEDAJE', 'PASAJE', 'AVION', 'AUTOBUS', 'TAXI', 'UBER')),  # Viáticos
+    ('601-11', ('FLETE', 'ACARREO', 'TRANSPORTE', 'ENVIO', 'PAQUETERIA', 'DHL', 'FEDEX', 'ESTAFETA')),  # Fletes
+    ('601-12', ('MENSAJERIA', 'CORREO', 'COURIER')),  # Mensajería
+    ('602-01', ('INTERES', 'FINANCIAMIENTO')),  # Intereses bancarios
+    ('602-02', ('COMISION BANCARIA', 'CARGO BANCO', 'ANUALIDAD TARJETA')),  # Comisiones bancarias
+)
+
+# Longitudes de prefijo de ClaveProdServ (segmento, familia, clase, producto)
+_LONGITUDES_CLAVE = (8, 6, 4, 2)
+
+# Tope de combinaciones memorizadas por clasificador
+MAX_MEMO = 100_000
+
+# empresa_id (o None) -> ClasificadorGastos compilado en este proceso
+_clasificadores = {}
+
+
+def normalizar(texto):
+    """Mayúsculas, sin acentos y con espacios simples."""
+    if not texto:
+        return ''
+    texto = texto.upper()
+    if not texto.isascii():
+        texto = unicodedata.normalize('NFKD', texto)
+        texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(texto.split())
+
+
+def _patron_trie(palabras):
+    """
+    Alternancia con prefijos comunes factorizados ('GAS', 'GASOLINA' ->
+    'GAS(?:OLINA)?'). En cada posición el motor solo prueba las ramas cuyo
+    primer carácter coincide y devuelve la palabra más larga.
+    """
+    raiz = {}
+    for palabra in palabras:
+        nodo = raiz
+        for caracter in palabra:
+            nodo = nodo.setdefault(caracter, {})
+        nodo[''] = None
+
+    def construir(nodo):
+        ramas = [re.escape(c) + construir(hijo) for c, hijo in sorted(nodo.items()) if c]
+        if not ramas:
+            return ''
+        cuerpo = ramas[0] if len(ramas) == 1 else f"(?:{'|'.join(ramas)})"
+        return f"(?:{cuerpo})?" if '' in nodo else cuerpo
+
+    return construir(raiz)
+
+
+class _Nivel:
+    """Reglas de un nivel (empresa, general o base) compiladas."""
+
+    def __init__(self, por_rfc, por_clave, palabras):
+        self.por_rfc = por_rfc
+        self.por_clave = por_clave
+        self.cuentas = []
+        # palabra -> índice de la regla de mayor prioridad que coincide cuando
+        # esa palabra es la más larga en una posición (incluye sus prefijos)
+        self.mejor = {}
+        indices = {}
+        for cuenta, patron in palabras:
+            palabra = normalizar(patron)
+            if palabra and palabra not in indices:
+                indices[palabra] = len(self.cuentas)
+                self.cuentas.append(cuenta)
+        for palabra in indices:
+            self.mejor[palabra] = min(
+                indice for prefijo, indice in indices.items() if palabra.startswith(prefijo)
+            )
+        # El lookahead evalúa cada posición sin consumir texto, así que
+        # también se encuentran palabras que se traslapan
+        self.regex = re.compile(f"(?=({_patron_trie(indices)}))") if indices else None
+
+    def clasificar(self, rfc, clave, descripcion):
+        if rfc and rfc in self.por_rfc:
+            return self.por_rfc[rfc]
+        if clave:
+            for n in _LONGITUDES_CLAVE:
+                cuenta = self.por_clave.get(clave[:n])
+                if cuenta:
+                    return cuenta
+        if self.regex is not None and descripcion:
+            mejor = None
+            for palabra in self.regex.findall(descripcion):
+                indice = self.mejor[palabra]
+                if mejor is None or indice < mejor:
+                    mejor = indice
+                    if mejor == 0:
+                        break
+            if mejor is not None:
+                return self.cuentas[mejor]
+        return None
+
+
+class ClasificadorGastos:
+    """
+    Uso:
+        clasificador = ClasificadorGastos.para_empresa(empresa)
+        cuenta = clasificador.clasificar(descripcion, emisor_rfc, clave_prod_serv)
+        cuentas = clasificador.clasificar_lote([(rfc, clave, descripcion), ...])
+    """
+
+    def __init__(self, reglas, firma=None):
+        self.firma = firma
+        self.memo = {}
+        empresa_reglas = [r for r in reglas if r.empresa_id is not None]
+        generales = [r for r in reglas if r.empresa_id is None]
+        self.niveles = [
+            self._compilar(empresa_reglas),
+            self._compilar(generales),
+            _Nivel({}, {}, [(cuenta, palabra) for cuenta, palabras in PALABRAS_BASE for palabra in palabras]),
+        ]
+
+    @staticmethod
+    def _compilar(reglas):
+        por_rfc = {}
+        por_clave = {}
+        palabras = []
+        for regla in sorted(reglas, key=lambda r: (r.prioridad, r.id)):
+            patron = regla.patron.strip()
+            if not patron:
+                continue
+            if regla.tipo == 'RFC':
+                por_rfc.setdefault(patron.upper(), regla.cuenta_codigo)
+            elif regla.tipo == 'CLAVE':
+                por_clave.setdefault(patron, regla.cuenta_codigo)
+            else:
+                palabras.append((regla.cuenta_codigo, patron))
+        return _Nivel(por_rfc, por_clave, palabras)
+
+    @staticmethod
+    def _reglas(empresa_id):
+        return ReglaClasificacion.objects.filter(activa=True).filter(
+            Q(empresa_id=empresa_id) | Q(empresa__isnull=True)
+        )
+
+    @staticmethod
+    def para_empresa(empresa):
+        """Clasificador compilado de la empresa (None = solo reglas generales y base)."""
+        empresa_id = getattr(empresa, 'id', empresa)
+        firma = tuple(ClasificadorGastos._reglas(empresa_id).aggregate(
+            n=Count('id'), ultima=Max('actualizado_en')
+        ).values())
+        clasificador = _clasificadores.get(empresa_id)
+        if clasificador is None or clasificador.firma != firma:
+            clasificador = ClasificadorGastos(list(ClasificadorGastos._reglas(empresa_id)), firma)
+            _clasificadores[empresa_id] = clasificador
+        return clasificador
+
+    def clasificar(self, descripcion, emisor_rfc='', clave_prod_serv=''):
+        """Código de cuenta para un concepto (CUENTA_DEFAULT si ninguna regla aplica)."""
+        clave = (emisor_rfc or '').upper(), (clave_prod_serv or '').strip(), normalizar(descripcion)
+        cuenta = self.memo.get(clave)
+        if cuenta is None:
+            cuenta = CUENTA_DEFAULT
+            for nivel in self.niveles:
+                encontrada = nivel.clasificar(*clave)
+                if encontrada:
+                    cuenta = encontrada
+                    break
+            if len(self.memo) >= MAX_MEMO:
+                self.memo.clear()
+            self.memo[clave] = cuenta
+        return cuenta
+
+    def clasificar_lote(self, conceptos):
+        """
+        Clasifica varios conceptos de una pasada.
+
+        Args:
+            conceptos: iterable de (emisor_rfc, clave_prod_serv, descripcion)
+
+        Returns:
+            list: códigos de cuenta en el mismo orden
+        """
+        return [self.clasificar(descripcion, rfc, clave) for rfc, clave, descripcion in conceptos]
+
+    def distribuir(self, factura, conceptos):
+        """
+        Importe por cuenta de gasto de una factura: cada concepto se clasifica y
+        los que caen en la misma cuenta se suman.
+
+        Returns:
+            dict: {codigo_cuenta: importe} (CUENTA_DEFAULT para los no clasificados)
+        """
+        importes = {}
+        for concepto in conceptos:
+            cuenta = self.clasificar(concepto.descripcion, factura.emisor_rfc, concepto.clave_prod_serv)
+            importes[cuenta] = importes.get(cuenta, 0) + (concepto.importe or 0)
+        return importes
+
+    def clasificar_factura(self, factura, conceptos):
+        """
+        Cuenta de gasto de una factura: la de mayor importe entre sus conceptos
+        clasificados (CUENTA_DEFAULT si ninguno coincide con una regla).
+        """
+        especificas = {c: v for c, v in self.distribuir(factura, conceptos).items() if c != CUENTA_DEFAULT}
+        if not especificas:
+            return CUENTA_DEFAULT
+        return max(especificas, key=especificas.get)
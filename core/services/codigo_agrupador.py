@@ -0,0 +1,104 @@
+"""
+Código Agrupador SAT (Anexo 24)
+
+Carga el catálogo de códigos agrupadores en SatCodigo con un solo upsert
+masivo (bulk_create con update_conflicts) y mantiene una copia en memoria
+{codigo: nombre} para validar agrupador_sat/codigo_sat y armar el catálogo XML.
+
+El catálogo incluido está en core/data/codigo_agrupador_sat.csv
+(columnas nivel, codigo, nombre): los 1080 códigos del tipo c_CodAgrup del
+esquema CatalogosParaEsqContE 1.3 del SAT, con las descripciones del catálogo
+que distribuye satcfdi. También se acepta un archivo propio:
+- CSV con columnas codigo y nombre (nivel opcional)
+- XML con elementos que tengan atributos CodAgrup/codigo y Desc/nombre
+
+La copia en memoria se carga en la primera consulta de cada proceso y se
+recarga al ejecutar una carga; otros procesos la toman al reiniciarse.
+"""
+
+from pathlib import Path
+from core.models import SatCodigo
+import csv
+import logging
+import xml.etree.ElementTree as ET
+
+logger = logging.getLogger(__name__)
+
+ARCHIVO_DEFAULT = Path(__file__).resolve().parent.parent / 'data' / 'codigo_agrupador_sat.csv'
+BATCH_SIZE = 500
+
+# codigo -> nombre, cargado desde SatCodigo en este proceso
+_mapa = None
+
+
+def leer_archivo(ruta):
+    """
+    Lee un catálogo CSV o XML.
+
+    Returns:
+        list: [(codigo, nombre)] sin duplicados (gana la última aparición)
+    """
+    ruta = Path(ruta)
+    codigos = {}
+    if ruta.suffix.lower() == '.xml':
+        for elemento in ET.parse(ruta).iter():
+            codigo = elemento.get('CodAgrup') or elemento.get('codigo')
+            nombre = elemento.get('Desc') or elemento.get('nombre')
+            if codigo and nombre:
+                codigos[codigo.strip()] = nombre.strip()
+    else:
+        with open(ruta, newline='', encoding='utf-8-sig') as f:
+            for fila in csv.DictReader(f):
+                codigo = (fila.get('codigo') or '').strip()
+                nombre = (fila.get('nombre') or '').strip()
+                if codigo and nombre:
+                    codigos[codigo] = nombre
+    return list(codigos.items())
+
+
+class CodigoAgrupador:
+    """
+    Uso:
+        CodigoAgrupador.cargar()                      # catálogo incluido
+        CodigoAgrupador.es_valido('102.01')
+        nombre = CodigoAgrupador.mapa().get('102.01')
+    """
+
+    @staticmethod
+    def cargar(ruta=None):
+        """
+        Inserta o actualiza todos los códigos del archivo en un solo upsert.
+
+        Returns:
+            dict: {'leidos', 'creados', 'actualizados'}
+        """
+        filas = leer_archivo(ruta or ARCHIVO_DEFAULT)
+        existentes = set(SatCodigo.objects.values_list('codigo', flat=True))
+        SatCodigo.objects.bulk_create(
+            [SatCodigo(codigo=codigo, nombre=nombre) for codigo, nombre in filas],
+            update_conflicts=True,
+            unique_fields=['codigo'],
+            update_fields=['nombre'],
+            batch_size=BATCH_SIZE,
+        )
+        creados = sum(1 for codigo, _ in filas if codigo not in existentes)
+        CodigoAgrupador.recargar()
+        logger.info(f"📚 Código agrupador SAT: {len(filas)} leídos, {creados} nuevos")
+        return {'leidos': len(filas), 'creados': creados, 'actualizados': len(filas) - creados}
+
+    @staticmethod
+    def mapa():
+        """{codigo: nombre} del catálogo (una consulta por proceso)."""
+        global _mapa
+        if _mapa is None:
+            _mapa = dict(SatCodigo.objects.values_list('codigo', 'nombre'))
+        return _mapa
+
+    @staticmethod
+    def recargar():
+        global _mapa
+        _mapa = None
+
+    @staticmethod
+    def es_valido(codigo):
+        return bool(codigo) and codigo.strip() in CodigoAgrupador.mapa()
@@ -156,33 +156,39 @@ class ContabilidadEngine:
         """
         from decimal import Decimal
         cuentas = CuentaContable.objects.filter(empresa=empresa).order_by('codigo')
+        cero = Decimal('0')
+
+        # Dos consultas agrupadas por cuenta; el filtro por ejercicio limita
+        # las particiones que lee PostgreSQL
+        base = MovimientoPoliza.objects.filter(cuenta__empresa=empresa)
+        antes = {
+            r['cuenta_id']: r for r in base.filter(
+                ejercicio__lte=fecha_inicio.year, poliza__fecha__date__lt=fecha_inicio
+            ).values('cuenta_id').annotate(debe=Sum('debe'), haber=Sum('haber'))
+        }
+        periodo = {
+            r['cuenta_id']: r for r in base.del_periodo(fecha_inicio, fecha_fin)
+            .values('cuenta_id').annotate(debe=Sum('debe'), haber=Sum('haber'))
+        }
+        vacio = {'debe': cero, 'haber': cero}
         rows = []
 
         for c in cuentas:
             # Saldos antes del periodo (acumulado hasta día previo)
-            antes_qs = MovimientoPoliza.objects.filter(
-                cuenta=c,
-                poliza__fecha__date__lt=fecha_inicio
-            )
-            antes_debe = antes_qs.aggregate(total=Sum('debe'))['total'] or Decimal('0')
-            antes_haber = antes_qs.aggregate(total=Sum('haber'))['total'] or Decimal('0')
+            antes_debe = antes.get(c.id, vacio)['debe'] or cero
+            antes_haber = antes.get(c.id, vacio)['haber'] or cero
 
             # Movimientos en periodo
-            periodo_qs = MovimientoPoliza.objects.filter(
-                cuenta=c,
-                poliza__fecha__date__gte=fecha_inicio,
-                poliza__fecha__date__lte=fecha_fin
-            )
-            mov_debe = periodo_qs.aggregate(total=Sum('debe'))['total'] or Decimal('0')
-            mov_haber = periodo_qs.aggregate(total=Sum('haber'))['total'] or Decimal('0')
+            mov_debe = periodo.get(c.id, vacio)['debe'] or cero
+            mov_haber = periodo.get(c.id, vacio)['haber'] or cero
 
             # Naturaleza: 'A' acreedora => saldo = haber - debe
             if getattr(c, 'naturaleza', 'D') == 'A':
-                saldo_ini = (antes_haber or Decimal('0')) - (antes_debe or Decimal('0'))
-                saldo_fin = saldo_ini + ((mov_haber or Decimal('0')) - (mov_debe or Decimal('0')))
+                saldo_ini = antes_haber - antes_debe
+                saldo_fin = saldo_ini + (mov_haber - mov_debe)
             else:
-                saldo_ini = (antes_debe or Decimal('0')) - (antes_haber or Decimal('0'))
-                saldo_fin = saldo_ini + ((mov_debe or Decimal('0')) - (mov_haber or Decimal('0')))
+                saldo_ini = antes_debe - antes_haber
+                saldo_fin = saldo_ini + (mov_debe - mov_haber)
 
             rows.append({
                 'codigo': c.codigo,
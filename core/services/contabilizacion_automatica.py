@@ -0,0 +1,194 @@
+"""
+Contabilización Automática después de la Ingesta
+
+Las facturas de ingreso/egreso creadas por una carga de XML se agrupan en
+tareas 'contabilizar_lote' mientras la carga avanza, de modo que el worker
+puede ir generando pólizas sin esperar a que termine la ingesta ni a que
+alguien pase por la Bandeja.
+
+Configuración por empresa (modelo Empresa):
+- contabilizacion_automatica: activa o desactiva la etapa.
+- contabilizar_solo_con_default: solo encola naturalezas con plantilla default.
+- lote_contabilizacion: facturas por tarea.
+
+Cada tarea guarda su avance en el payload (procesados/resumen), igual que
+'validar_sat', para reanudarse tras un reintento.
+"""
+
+from core.models import Factura, Concepto, PlantillaPoliza, BackgroundTask
+from core.services.account_resolver import AccountResolver
+from core.services.accounting_service import AccountingService
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Máximo de errores detallados que se guardan por tarea
+MAX_DETALLE_ERRORES = 50
+
+
+def resumen_vacio():
+    return {
+        'contabilizadas': 0,
+        'omitidas': 0,
+        'errores': 0,
+    }
+
+
+class ContabilizacionAutomatica:
+    """
+    Uso:
+        cola = ContabilizacionAutomatica(empresa, usuario_id, origen_id=task.id)
+        cola.agregar(factura.uuid)   # por cada factura creada
+        cola.cerrar()                # encola el remanente
+    """
+
+    NATURALEZAS = ('I', 'E')
+    LOTE_DEFAULT = 100
+    # Cada cuántas facturas se guarda el checkpoint de una tarea
+    CHECKPOINT = 25
+
+    def __init__(self, empresa, usuario_id=None, origen_id=None):
+        self.empresa = empresa
+        self.usuario_id = usuario_id
+        self.origen_id = origen_id
+        self.tamano_lote = empresa.lote_contabilizacion or self.LOTE_DEFAULT
+        self.activa = bool(empresa.contabilizacion_automatica) and bool(self.naturalezas_habilitadas(empresa))
+        self.pendientes = []
+        self.tareas = []
+
+    @staticmethod
+    def plantillas_por_naturaleza(empresa_id, solo_default=True):
+        """{naturaleza: plantilla_id} para I/E (la default primero si hay varias)."""
+        qs = PlantillaPoliza.objects.filter(
+            empresa_id=empresa_id, tipo_factura__in=ContabilizacionAutomatica.NATURALEZAS
+        )
+        if solo_default:
+            qs = qs.filter(es_default=True)
+        plantillas = {}
+        for tipo, pk in qs.order_by('-es_default', 'id').values_list('tipo_factura', 'id'):
+            plantillas.setdefault(tipo, pk)
+        return plantillas
+
+    @staticmethod
+    def naturalezas_habilitadas(empresa):
+        return set(ContabilizacionAutomatica.plantillas_por_naturaleza(
+            empresa.id, solo_default=empresa.contabilizar_solo_con_default
+        ))
+
+    def agregar(self, factura_uuid):
+        """Registra una factura recién creada; encola un lote al completarse."""
+        if not self.activa:
+            return
+        self.pendientes.append(str(factura_uuid))
+        if len(self.pendientes) >= self.tamano_lote:
+            self._encolar()
+
+    def cerrar(self):
+        """Encola las facturas restantes. Retorna los ids de las tareas creadas."""
+        if self.pendientes:
+            self._encolar()
+        return self.tareas
+
+    def _encolar(self):
+        from core.tasks import enqueue_contabilizar_lote
+
+        uuids, self.pendientes = self.pendientes, []
+        # Solo I/E con plantilla; P/N/T y naturaleza C quedan para revisión manual
+        elegibles = list(
+            Factura.objects.filter(
+                empresa=self.empresa,
+                uuid__in=uuids,
+                estado_contable='PENDIENTE',
+                naturaleza__in=self.naturalezas_habilitadas(self.empresa),
+            ).order_by('fecha', 'id').values_list('uuid', flat=True)
+        )
+        if not elegibles:
+            return
+        task_id = enqueue_contabilizar_lote(self.empresa.id, elegibles, self.usuario_id, self.origen_id)
+        self.tareas.append(task_id)
+        logger.info(f"🧾 Contabilización automática: {len(elegibles)} factura(s) en tarea {task_id}")
+
+    @staticmethod
+    def procesar_tarea(task):
+        """
+        Ejecuta una BackgroundTask 'contabilizar_lote' desde su checkpoint.
+
+        Payload:
+            empresa_id, uuids, usuario_id, origen_id,
+            procesados (checkpoint), resumen (acumulado), errores_detalle
+        """
+        from core.models import Empresa
+
+        payload = task.payload or {}
+        uuids = payload.get('uuids', [])
+        resumen = payload.get('resumen') or resumen_vacio()
+        detalle = payload.get('errores_detalle') or []
+        procesados = payload.get('procesados', 0)
+
+        empresa = Empresa.objects.get(pk=payload['empresa_id'])
+        plantillas = ContabilizacionAutomatica.plantillas_por_naturaleza(
+            empresa.id, solo_default=empresa.contabilizar_solo_con_default
+        )
+        facturas = list(
+            Factura.objects.filter(empresa=empresa, uuid__in=uuids[procesados:]).only(
+                'uuid', 'naturaleza', 'estado_contable', 'emisor_rfc', 'receptor_rfc'
+            )
+        )
+        estados = {str(f.uuid): (f.naturaleza, f.estado_contable) for f in facturas}
+
+        # Conceptos del lote en una sola consulta (distribución del gasto por concepto)
+        conceptos = {}
+        for concepto in Concepto.objects.filter(factura__in=[f.id for f in facturas]).order_by('id'):
+            conceptos.setdefault(concepto.factura_id, []).append(concepto)
+        ids = {str(f.uuid): f.id for f in facturas}
+
+        # Subcuentas de clientes/proveedores del lote en una sola consulta
+        with AccountResolver.lote(empresa, facturas):
+            while procesados < len(uuids):
+                factura_uuid = uuids[procesados]
+                naturaleza, estado = estados.get(factura_uuid, (None, None))
+                plantilla_id = plantillas.get(naturaleza)
+
+                # Contabilizada en otro lado, eliminada, excluida o sin plantilla
+                if estado != 'PENDIENTE' or not plantilla_id:
+                    resumen['omitidas'] += 1
+                else:
+                    try:
+                        AccountingService.contabilizar_factura(
+                            factura_uuid, usuario_id=payload.get('usuario_id'), plantilla_id=plantilla_id,
+                            conceptos=conceptos.get(ids[factura_uuid], []),
+                        )
+                        resumen['contabilizadas'] += 1
+                    except Exception as e:
+                        resumen['errores'] += 1
+                        if len(detalle) < MAX_DETALLE_ERRORES:
+                            detalle.append({'uuid': factura_uuid, 'error': str(e)[:300]})
+                        logger.error(f"❌ Contabilización automática {factura_uuid}: {e}")
+                procesados += 1
+
+                if procesados % ContabilizacionAutomatica.CHECKPOINT == 0 or procesados == len(uuids):
+                    payload['procesados'] = procesados
+                    payload['resumen'] = resumen
+                    payload['errores_detalle'] = detalle
+                    task.payload = payload
+                    task.save(update_fields=['payload'])
+
+        return resumen
+
+    @staticmethod
+    def resumen_tareas(task_ids):
+        """Resultado acumulado de un conjunto de tareas 'contabilizar_lote'."""
+        total = {**resumen_vacio(), 'facturas': 0, 'pendientes': 0, 'tareas': len(task_ids or [])}
+        if not task_ids:
+            return total
+        for status, payload in BackgroundTask.objects.filter(
+            pk__in=task_ids, task_type='contabilizar_lote'
+        ).values_list('status', 'payload'):
+            payload = payload or {}
+            n = len(payload.get('uuids', []))
+            total['facturas'] += n
+            if status in ('PENDING', 'IN_PROGRESS'):
+                total['pendientes'] += n - payload.get('procesados', 0)
+            for clave, valor in (payload.get('resumen') or {}).items():
+                total[clave] = total.get(clave, 0) + valor
+        return total
@@ -0,0 +1,75 @@
+"""
+Detección de XML Duplicados (sin parsear)
+
+Antes de parsear un XML se revisa, en este orden:
+
+1. Huella: sha256 del contenido contra el índice HuellaXML (un lookup por
+   índice único). Cubre la re-carga del mismo archivo.
+2. UUID del Timbre: se extrae con una expresión regular directamente del
+   nodo TimbreFiscalDigital (no de CfdiRelacionado) y se busca la Factura.
+   Cubre el mismo CFDI con distinto contenido (espacios, addenda, etc.);
+   en ese caso la huella se registra para que la siguiente vez baste el paso 1.
+"""
+
+from core.models import Factura, HuellaXML
+import hashlib
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+
+TFD_UUID_RE = re.compile(
+    rb'<(?:[\w.-]+:)?TimbreFiscalDigital\b[^>]*?\sUUID\s*=\s*["\']([0-9A-Fa-f-]{36})["\']',
+    re.DOTALL,
+)
+
+
+def huella(contenido):
+    return hashlib.sha256(contenido).hexdigest()
+
+
+def sniff_uuid(contenido):
+    """UUID del Timbre Fiscal Digital sin parsear el XML (None si no aparece)."""
+    match = TFD_UUID_RE.search(contenido)
+    return match.group(1).decode('ascii') if match else None
+
+
+def buscar_duplicado(contenido, empresa=None, sha256=None):
+    """
+    Determina si el XML ya está registrado.
+
+    Args:
+        contenido: bytes del XML
+        empresa: Empresa a la que se carga; None acepta cualquier empresa
+        sha256: huella ya calculada (opcional)
+
+    Returns:
+        dict {'motivo': 'huella'|'uuid', 'uuid', 'empresa_id'} o None
+    """
+    sha256 = sha256 or huella(contenido)
+
+    registro = HuellaXML.objects.filter(sha256=sha256).values_list(
+        'factura__uuid', 'factura__empresa_id'
+    ).first()
+    if registro and (empresa is None or registro[1] == empresa.id):
+        return {'motivo': 'huella', 'uuid': str(registro[0]), 'empresa_id': registro[1]}
+
+    uuid_str = sniff_uuid(contenido)
+    if not uuid_str:
+        return None
+    qs = Factura.objects.filter(uuid=uuid_str)
+    if empresa is not None:
+        qs = qs.filter(empresa=empresa)
+    factura = qs.values_list('id', 'empresa_id').first()
+    if not factura:
+        return None
+
+    HuellaXML.objects.bulk_create(
+        [HuellaXML(sha256=sha256, factura_id=factura[0])], ignore_conflicts=True
+    )
+    return {'motivo': 'uuid', 'uuid': uuid_str, 'empresa_id': factura[1]}
+
+
+def registrar_huella(sha256, factura):
+    HuellaXML.objects.bulk_create([HuellaXML(sha256=sha256, factura=factura)], ignore_conflicts=True)
@@ -0,0 +1,151 @@
+"""
+Eliminación Masiva de Pólizas y Facturas
+
+Borra por conjuntos de ids con sentencias DELETE por bloques en lugar del
+collector de Django, que carga en memoria cada MovimientoPoliza, Concepto y
+póliza relacionada antes de borrar. Los movimientos se eliminan con una
+subconsulta sobre las pólizas, así que no se leen ids de movimientos.
+
+Como el SQL directo no ejecuta el CASCADE de Django, aquí se borran
+explícitamente todas las tablas que dependen de Factura/Poliza:
+MovimientoPoliza, Poliza, Concepto y HuellaXML. Ningún modelo de estas
+tablas tiene signals de borrado.
+
+Uso:
+    EliminacionMasiva.descontabilizar(factura_ids)                      # → PENDIENTE
+    EliminacionMasiva.descontabilizar(factura_ids, estado='EXCLUIDA')   # cancelación SAT
+    EliminacionMasiva.eliminar_polizas(poliza_ids)
+    EliminacionMasiva.eliminar_facturas(factura_ids, usuario=request.user, motivo='Duplicado')
+"""
+
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from core.models import AuditoriaEliminacion, Concepto, Factura, HuellaXML, MovimientoPoliza, Poliza
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Ids por sentencia DELETE/UPDATE (dentro del límite de parámetros de SQLite)
+CHUNK_SIZE = 500
+
+
+def _fecha_local(valor):
+    if valor is None:
+        return None
+    return (timezone.localtime(valor) if timezone.is_aware(valor) else valor).date()
+
+
+def _bloques(ids):
+    ids = sorted({int(i) for i in ids})
+    for inicio in range(0, len(ids), CHUNK_SIZE):
+        yield ids[inicio:inicio + CHUNK_SIZE]
+
+
+def _tabla(modelo):
+    return connection.ops.quote_name(modelo._meta.db_table)
+
+
+def _columna(modelo, campo):
+    return connection.ops.quote_name(modelo._meta.get_field(campo).column)
+
+
+def _borrar(cursor, modelo, campo, bloque):
+    marcas = ', '.join(['%s'] * len(bloque))
+    cursor.execute(
+        f"DELETE FROM {_tabla(modelo)} WHERE {_columna(modelo, campo)} IN ({marcas})", bloque
+    )
+    return cursor.rowcount
+
+
+def _borrar_movimientos_de_polizas(cursor, campo_poliza, bloque):
+    """DELETE de movimientos cuyas pólizas cumplen Poliza.<campo_poliza> IN bloque."""
+    marcas = ', '.join(['%s'] * len(bloque))
+    cursor.execute(
+        f"DELETE FROM {_tabla(MovimientoPoliza)} WHERE {_columna(MovimientoPoliza, 'poliza')} IN ("
+        f"SELECT {_columna(Poliza, 'id')} FROM {_tabla(Poliza)} "
+        f"WHERE {_columna(Poliza, campo_poliza)} IN ({marcas}))",
+        bloque,
+    )
+    return cursor.rowcount
+
+
+class EliminacionMasiva:
+    """Borrado por conjuntos de ids en bloques de CHUNK_SIZE, en una transacción."""
+
+    @staticmethod
+    def eliminar_polizas(poliza_ids):
+        """
+        Elimina pólizas y sus movimientos. No cambia el estado de las facturas.
+
+        Returns:
+            dict: {'polizas', 'movimientos'}
+        """
+        resultado = {'polizas': 0, 'movimientos': 0}
+        with transaction.atomic(), connection.cursor() as cursor:
+            for bloque in _bloques(poliza_ids):
+                resultado['movimientos'] += _borrar(cursor, MovimientoPoliza, 'poliza', bloque)
+                resultado['polizas'] += _borrar(cursor, Poliza, 'id', bloque)
+        return resultado
+
+    @staticmethod
+    def descontabilizar(factura_ids, estado='PENDIENTE'):
+        """
+        Elimina las pólizas (y movimientos) de las facturas y deja las facturas
+        en el estado indicado: PENDIENTE para regenerar, EXCLUIDA si se cancelaron.
+
+        Returns:
+            dict: {'facturas', 'polizas', 'movimientos'}
+        """
+        resultado = {'facturas': 0, 'polizas': 0, 'movimientos': 0}
+        with transaction.atomic(), connection.cursor() as cursor:
+            for bloque in _bloques(factura_ids):
+                resultado['movimientos'] += _borrar_movimientos_de_polizas(cursor, 'factura', bloque)
+                resultado['polizas'] += _borrar(cursor, Poliza, 'factura', bloque)
+                resultado['facturas'] += Factura.objects.filter(id__in=bloque).update(estado_contable=estado)
+        logger.info(
+            f"🗑️ Descontabilización masiva ({estado}): {resultado['facturas']} facturas, "
+            f"{resultado['polizas']} pólizas, {resultado['movimientos']} movimientos"
+        )
+        return resultado
+
+    @staticmethod
+    def eliminar_facturas(factura_ids, usuario=None, motivo=''):
+        """
+        Elimina facturas con sus conceptos, huellas, pólizas y movimientos, y
+        registra una AuditoriaEliminacion por factura (un bulk_create por bloque).
+        Los archivos XML en disco no se tocan.
+
+        Returns:
+            dict: {'facturas', 'polizas', 'movimientos', 'conceptos'}
+        """
+        resultado = {'facturas': 0, 'polizas': 0, 'movimientos': 0, 'conceptos': 0}
+        with transaction.atomic(), connection.cursor() as cursor:
+            for bloque in _bloques(factura_ids):
+                facturas = Factura.objects.filter(id__in=bloque).annotate(
+                    tiene_poliza=Exists(Poliza.objects.filter(factura=OuterRef('pk')))
+                ).values('uuid', 'emisor_nombre', 'receptor_nombre', 'total', 'fecha', 'tiene_poliza')
+                AuditoriaEliminacion.objects.bulk_create([
+                    AuditoriaEliminacion(
+                        uuid_factura=f['uuid'],
+                        emisor_nombre=f['emisor_nombre'],
+                        receptor_nombre=f['receptor_nombre'],
+                        total=f['total'],
+                        fecha_factura=_fecha_local(f['fecha']),
+                        usuario=usuario,
+                        motivo=motivo,
+                        tenia_poliza=f['tiene_poliza'],
+                    )
+                    for f in facturas
+                ])
+
+                resultado['movimientos'] += _borrar_movimientos_de_polizas(cursor, 'factura', bloque)
+                resultado['polizas'] += _borrar(cursor, Poliza, 'factura', bloque)
+                resultado['conceptos'] += _borrar(cursor, Concepto, 'factura', bloque)
+                _borrar(cursor, HuellaXML, 'factura', bloque)
+                resultado['facturas'] += _borrar(cursor, Factura, 'id', bloque)
+        logger.info(
+            f"🗑️ Eliminación masiva: {resultado['facturas']} facturas, {resultado['polizas']} pólizas, "
+            f"{resultado['movimientos']} movimientos, {resultado['conceptos']} conceptos"
+        )
+        return resultado
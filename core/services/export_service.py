@@ -6,6 +6,10 @@ from openpyxl import Workbook
 from django.conf import settings
 from django.template.loader import render_to_string
 from django.utils import timezone as dj_timezone
+from core.utils.consultas import iterar
+import logging
+
+logger = logging.getLogger(__name__)
 
 # optional imports for PDF and XML validation
 try:
@@ -194,15 +198,44 @@ class ExportService:
 
     @staticmethod
     def generate_catalogo_xml(empresa, year, month):
+        """
+        Catálogo de cuentas de la empresa (una consulta sobre CuentaContable).
+        CodAgrup es agrupador_sat (o codigo_sat) validado contra el código
+        agrupador en memoria; las cuentas sin código válido se omiten.
+        """
+        from core.models import CuentaContable
+        from core.services.codigo_agrupador import CodigoAgrupador
+
         root = ET.Element('Catalogo')
         root.set('Version', '1.3')
-        from core.models import SatCodigo
-        cods = SatCodigo.objects.all()
-        ctas = ET.SubElement(root, 'Ctas')
-        for s in cods:
-            c = ET.SubElement(ctas, 'Cta')
-            c.set('CodAgrup', s.codigo)
-            c.set('Desc', s.nombre)
+        root.set('RFC', ExportService._empresa_prefix(empresa))
+        root.set('Mes', f"{month:02d}")
+        root.set('Anio', f"{year:04d}")
+
+        agrupadores = CodigoAgrupador.mapa()
+        cuentas = CuentaContable.objects.filter(empresa=empresa).order_by('codigo').values_list(
+            'codigo', 'nombre', 'nivel', 'naturaleza', 'agrupador_sat', 'codigo_sat', 'padre__codigo'
+        )
+        omitidas = []
+        for codigo, nombre, nivel, naturaleza, agrupador_sat, codigo_sat, padre in iterar(cuentas):
+            cod_agrup = (agrupador_sat or codigo_sat or '').strip()
+            if cod_agrup not in agrupadores:
+                omitidas.append(codigo)
+                continue
+            c = ET.SubElement(root, 'Ctas')
+            c.set('CodAgrup', cod_agrup)
+            c.set('NumCta', codigo)
+            c.set('Desc', nombre)
+            if padre:
+                c.set('SubCtaDe', padre)
+            c.set('Nivel', str(nivel or 1))
+            c.set('Natur', naturaleza or 'D')
+        if omitidas:
+            logger.warning(
+                f"Catálogo XML {ExportService._empresa_prefix(empresa)}: {len(omitidas)} cuentas sin código "
+                f"agrupador válido omitidas (ej. {', '.join(omitidas[:5])})"
+            )
+
         bio = io.BytesIO()
         ET.ElementTree(root).write(bio, encoding='utf-8', xml_declaration=True)
         bio.seek(0)
@@ -211,25 +244,38 @@ class ExportService:
 
     @staticmethod
     def generate_polizas_xml(empresa, year, month):
+        """
+        Pólizas del mes con sus transacciones. Pólizas y movimientos se leen en
+        dos recorridos ordenados por póliza (cursores del servidor en PostgreSQL)
+        en lugar de una consulta de movimientos por póliza.
+        """
         root = ET.Element('Polizas')
         root.set('Version', '1.3')
-        from core.models import Poliza
-        qs = Poliza.objects.filter(factura__empresa=empresa, fecha__year=year, fecha__month=month).select_related('factura')
-        for p in qs:
+        from core.models import MovimientoPoliza, Poliza
+        polizas = Poliza.objects.filter(
+            factura__empresa=empresa, fecha__year=year, fecha__month=month
+        ).order_by('id').values_list('id', 'fecha', 'factura__uuid', 'factura__emisor_rfc', 'factura__receptor_rfc')
+        movimientos = iter(iterar(MovimientoPoliza.objects.filter(
+            poliza__in=polizas.values('id')
+        ).order_by('poliza_id', 'id').values_list('poliza_id', 'cuenta__codigo', 'debe', 'haber')))
+        mov = next(movimientos, None)
+        for poliza_id, fecha, uuid, emisor_rfc, receptor_rfc in iterar(polizas):
             pol_el = ET.SubElement(root, 'Poliza')
-            pol_el.set('Num', str(p.id))
-            pol_el.set('Fecha', p.fecha.isoformat())
+            pol_el.set('Num', str(poliza_id))
+            pol_el.set('Fecha', fecha.isoformat())
             # Transacciones (movimientos)
-            for m in p.movimientopoliza_set.all():
+            while mov is not None and mov[0] == poliza_id:
+                _, cuenta_codigo, debe, haber = mov
                 tr = ET.SubElement(pol_el, 'Transaccion')
-                tr.set('Cuenta', m.cuenta.codigo)
-                tr.set('Debe', str(m.debe))
-                tr.set('Haber', str(m.haber))
+                tr.set('Cuenta', cuenta_codigo)
+                tr.set('Debe', str(debe))
+                tr.set('Haber', str(haber))
                 # CompNal injection: use factura if available
-                if hasattr(p, 'factura') and p.factura:
+                if uuid:
                     comp = ET.SubElement(tr, 'CompNal')
-                    comp.set('UUID_CFDI', str(p.factura.uuid))
-                    comp.set('RFC', p.factura.emisor_rfc or p.factura.receptor_rfc or '')
+                    comp.set('UUID_CFDI', str(uuid))
+                    comp.set('RFC', emisor_rfc or receptor_rfc or '')
+                mov = next(movimientos, None)
         bio = io.BytesIO()
         ET.ElementTree(root).write(bio, encoding='utf-8', xml_declaration=True)
         bio.seek(0)
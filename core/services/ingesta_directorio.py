@@ -0,0 +1,223 @@
+"""
+Ingesta de XML desde Directorio
+
+Recorre un directorio (por defecto xmls/) y procesa solo los archivos nuevos
+o modificados, usando el manifiesto ManifiestoXML (ruta, tamaño, mtime,
+sha256) para descartar el resto sin leerlos.
+
+- Un archivo con tamaño y mtime iguales al manifiesto no se abre.
+- Si cambió el mtime pero no el contenido (mismo sha256) solo se actualiza
+  el manifiesto.
+- Los archivos se procesan por lotes; cada lote es una transacción que
+  incluye facturas, tareas de contabilización y filas del manifiesto, de
+  modo que tras una caída el lote incompleto simplemente se vuelve a procesar.
+- La empresa se determina por RFC (emisor primero, luego receptor).
+- Las facturas creadas se encolan por lote para contabilización automática
+  (ver ContabilizacionAutomatica) dentro de la misma transacción.
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from core.models import Empresa, ManifiestoXML
+from core.services.cfdi_fast_parser import extraer_cfdi
+from core.services.contabilizacion_automatica import ContabilizacionAutomatica
+from core.services.dedup_xml import buscar_duplicado
+from core.services.xml_processor import procesar_xml_cfdi
+import hashlib
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def directorio_xmls():
+    return os.path.join(getattr(settings, 'BASE_DIR', None) or os.getcwd(), 'xmls')
+
+
+class IngestaDirectorio:
+    """
+    Uso:
+        stats = IngestaDirectorio('/ruta/xmls', batch_size=200).ejecutar()
+    """
+
+    BATCH_SIZE = 200
+    ESTADOS_REINTENTABLES = ('ERROR', 'SIN_EMPRESA')
+
+    def __init__(self, directorio=None, batch_size=None, empresa_id=None,
+                 reintentar=False, usuario_id=None):
+        self.directorio = os.path.abspath(directorio or directorio_xmls())
+        self.batch_size = batch_size or self.BATCH_SIZE
+        self.empresa_forzada = Empresa.objects.get(pk=empresa_id) if empresa_id else None
+        self.reintentar = reintentar
+        self.usuario_id = usuario_id
+        self.empresas_por_rfc = {}
+        self.colas = {}
+
+    def _nuevas_stats(self):
+        return {
+            'escaneados': 0,
+            'sin_cambio': 0,
+            'candidatos': 0,
+            'ilegibles': 0,
+            'solo_manifiesto': 0,
+            'procesados': 0,
+            'duplicados': 0,
+            'sin_empresa': 0,
+            'errores': 0,
+            'tareas_contabilizacion': 0,
+        }
+
+    def escanear(self):
+        """Lista (ruta, tamaño, mtime) de los XML del directorio."""
+        archivos = []
+        for raiz, _, nombres in os.walk(self.directorio):
+            for nombre in nombres:
+                if not nombre.lower().endswith('.xml'):
+                    continue
+                ruta = os.path.join(raiz, nombre)
+                try:
+                    st = os.stat(ruta)
+                except OSError:
+                    continue
+                archivos.append((ruta, st.st_size, st.st_mtime))
+        archivos.sort()
+        return archivos
+
+    def ejecutar(self):
+        """Una pasada completa sobre el directorio. Retorna estadísticas."""
+        stats = self._nuevas_stats()
+        if not os.path.isdir(self.directorio):
+            logger.warning(f"⚠️ Directorio de XML no existe: {self.directorio}")
+            return stats
+
+        self.empresas_por_rfc = {e.rfc.upper(): e for e in Empresa.objects.all()}
+        # Configuración de contabilización automática vigente en esta pasada
+        self.colas = {}
+        manifiesto = {
+            m['ruta']: m for m in ManifiestoXML.objects.filter(
+                ruta__startswith=self.directorio
+            ).values('id', 'ruta', 'tamano', 'mtime', 'sha256', 'estado')
+        }
+
+        candidatos = []
+        for ruta, tamano, mtime in self.escanear():
+            stats['escaneados'] += 1
+            previo = manifiesto.get(ruta)
+            if previo and previo['tamano'] == tamano and previo['mtime'] == mtime:
+                if not (self.reintentar and previo['estado'] in self.ESTADOS_REINTENTABLES):
+                    stats['sin_cambio'] += 1
+                    continue
+            candidatos.append((ruta, tamano, mtime, previo))
+
+        stats['candidatos'] = len(candidatos)
+        for inicio in range(0, len(candidatos), self.batch_size):
+            self._procesar_lote(candidatos[inicio:inicio + self.batch_size], stats)
+            logger.info(
+                f"📂 Ingesta {self.directorio}: "
+                f"{min(inicio + self.batch_size, len(candidatos))}/{len(candidatos)}"
+            )
+        return stats
+
+    def _resolver_empresa(self, datos):
+        if self.empresa_forzada:
+            return self.empresa_forzada
+        for rfc in (datos['emisor'].get('rfc'), datos['receptor'].get('rfc')):
+            empresa = self.empresas_por_rfc.get((rfc or '').upper())
+            if empresa:
+                return empresa
+        return None
+
+    def _procesar_archivo(self, ruta, contenido, sha256, stats):
+        """Retorna (estado, empresa, factura_uuid, mensaje)."""
+        # Mismo contenido o mismo UUID ya registrado: no se parsea
+        duplicado = buscar_duplicado(contenido, self.empresa_forzada, sha256=sha256)
+        if duplicado:
+            stats['duplicados'] += 1
+            empresa = Empresa.objects.filter(pk=duplicado['empresa_id']).first()
+            return 'DUPLICADO', empresa, duplicado['uuid'], f"Ya registrado ({duplicado['motivo']})"
+
+        try:
+            datos = extraer_cfdi(contenido)
+        except ValueError as e:
+            stats['errores'] += 1
+            return 'ERROR', None, None, str(e)[:1000]
+
+        empresa = self._resolver_empresa(datos)
+        if not empresa:
+            stats['sin_empresa'] += 1
+            return 'SIN_EMPRESA', None, datos.get('uuid'), (
+                f"Ningún RFC registrado ({datos['emisor'].get('rfc')} / {datos['receptor'].get('rfc')})"
+            )
+
+        try:
+            with transaction.atomic():
+                factura, created = procesar_xml_cfdi(None, os.path.basename(ruta), empresa, datos=datos, sha256=sha256)
+        except Exception as e:
+            stats['errores'] += 1
+            logger.error(f"Error procesando {ruta}: {e}")
+            return 'ERROR', empresa, datos.get('uuid'), str(e)[:1000]
+
+        if created:
+            stats['procesados'] += 1
+            return 'PROCESADO', empresa, factura.uuid, None
+        stats['duplicados'] += 1
+        return 'DUPLICADO', empresa, datos.get('uuid'), 'El XML ya estaba registrado'
+
+    def _cola_contabilizacion(self, empresa):
+        if empresa.id not in self.colas:
+            self.colas[empresa.id] = ContabilizacionAutomatica(empresa, self.usuario_id)
+        return self.colas[empresa.id]
+
+    def _procesar_lote(self, lote, stats):
+        nuevos = []
+        actualizados = []
+        tocados = []
+        ahora = timezone.now()
+        with transaction.atomic():
+            for ruta, tamano, mtime, previo in lote:
+                try:
+                    with open(ruta, 'rb') as fh:
+                        contenido = fh.read()
+                except OSError as e:
+                    # El archivo desapareció o no es legible: se intenta en la siguiente corrida
+                    stats['ilegibles'] += 1
+                    logger.warning(f"⚠️ No se pudo leer {ruta}: {e}")
+                    continue
+                sha256 = hashlib.sha256(contenido).hexdigest()
+
+                # Mismo contenido (solo cambió mtime): no se vuelve a procesar
+                if previo and previo['sha256'] == sha256 and not (
+                    self.reintentar and previo['estado'] in self.ESTADOS_REINTENTABLES
+                ):
+                    stats['solo_manifiesto'] += 1
+                    tocados.append(ManifiestoXML(id=previo['id'], tamano=tamano, mtime=mtime))
+                    continue
+
+                estado, empresa, factura_uuid, mensaje = self._procesar_archivo(ruta, contenido, sha256, stats)
+                if estado == 'PROCESADO':
+                    self._cola_contabilizacion(empresa).agregar(factura_uuid)
+                registro = ManifiestoXML(
+                    ruta=ruta, tamano=tamano, mtime=mtime, sha256=sha256, estado=estado,
+                    empresa=empresa, factura_uuid=factura_uuid, mensaje=mensaje, procesado_en=ahora,
+                )
+                if previo:
+                    registro.id = previo['id']
+                    actualizados.append(registro)
+                else:
+                    nuevos.append(registro)
+
+            if nuevos:
+                ManifiestoXML.objects.bulk_create(nuevos)
+            if actualizados:
+                ManifiestoXML.objects.bulk_update(
+                    actualizados,
+                    ['tamano', 'mtime', 'sha256', 'estado', 'empresa', 'factura_uuid', 'mensaje', 'procesado_en'],
+                )
+            if tocados:
+                ManifiestoXML.objects.bulk_update(tocados, ['tamano', 'mtime'])
+
+            # El remanente de cada empresa se encola junto con el lote
+            for cola in self.colas.values():
+                stats['tareas_contabilizacion'] += len(cola.cerrar())
+                cola.tareas = []
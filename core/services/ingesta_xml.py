@@ -0,0 +1,233 @@
+"""
+Ingesta Asíncrona de XML
+
+La petición de carga solo guarda los archivos en disco (spool) y registra
+una tarea 'ingestar_xml' con una fila ArchivoIngesta por archivo; el worker
+procesa los XML después y registra el resultado de cada uno.
+
+El estado por archivo funciona como checkpoint: si el worker se detiene,
+al reintentar la tarea solo se procesan los archivos aún PENDIENTES. Las
+facturas que se crearon antes de la caída sin llegar al checkpoint se
+detectan como duplicadas en el reintento y se encolan para contabilizar.
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from core.models import BackgroundTask, ArchivoIngesta, Empresa
+from core.services.cfdi_fast_parser import extraer_cfdi, leer_bytes
+from core.services.contabilizacion_automatica import ContabilizacionAutomatica
+from core.services.dedup_xml import buscar_duplicado, huella
+from core.services.xml_processor import procesar_xml_cfdi
+import logging
+import os
+import re
+import shutil
+import uuid
+
+logger = logging.getLogger(__name__)
+
+MENSAJES_DUPLICADO = {
+    'huella': 'Contenido idéntico ya cargado',
+    'uuid': 'UUID ya registrado',
+}
+
+
+def _spool_dir():
+    return getattr(settings, 'INGESTA_SPOOL_DIR', os.path.join(settings.BASE_DIR, 'tmp', 'ingesta'))
+
+
+def _nombre_seguro(nombre):
+    nombre = os.path.basename(nombre or 'archivo.xml')
+    return re.sub(r'[^A-Za-z0-9._-]', '_', nombre)[:150]
+
+
+class IngestaXML:
+    """Registro y procesamiento de trabajos de carga de XML."""
+
+    # Cada cuántos archivos se guardan resultados y resumen
+    LOTE_GUARDADO = 50
+
+    @staticmethod
+    def crear_trabajo(empresa, archivos, usuario_id=None):
+        """
+        Guarda los archivos subidos en el spool y registra la tarea.
+
+        Args:
+            empresa: Empresa destino
+            archivos: lista de UploadedFile
+            usuario_id: usuario que sube (para la contabilización)
+
+        Returns:
+            BackgroundTask creada
+        """
+        directorio = os.path.join(_spool_dir(), uuid.uuid4().hex)
+        os.makedirs(directorio, exist_ok=True)
+
+        registros = []
+        for idx, archivo in enumerate(archivos):
+            ruta = os.path.join(directorio, f"{idx:05d}_{_nombre_seguro(archivo.name)}")
+            with open(ruta, 'wb') as destino:
+                for chunk in archivo.chunks():
+                    destino.write(chunk)
+            registros.append(ArchivoIngesta(nombre=archivo.name[:255], ruta=ruta, tamano=archivo.size or 0))
+
+        with transaction.atomic():
+            task = BackgroundTask.objects.create(
+                task_type='ingestar_xml',
+                payload={
+                    'empresa_id': empresa.id,
+                    'usuario_id': usuario_id,
+                    'directorio': directorio,
+                    'total': len(registros),
+                },
+                status='PENDING'
+            )
+            for registro in registros:
+                registro.tarea = task
+            ArchivoIngesta.objects.bulk_create(registros, batch_size=500)
+
+        logger.info(f"📥 Ingesta {task.id}: {len(registros)} archivo(s) en spool para {empresa.nombre}")
+        return task
+
+    @staticmethod
+    def _procesar_archivo(registro, empresa):
+        try:
+            contenido = leer_bytes(registro.ruta)
+            sha256 = huella(contenido)
+            duplicado = buscar_duplicado(contenido, empresa, sha256=sha256)
+            if duplicado:
+                registro.estado = 'DUPLICADA'
+                registro.factura_uuid = duplicado['uuid']
+                registro.mensaje = MENSAJES_DUPLICADO[duplicado['motivo']]
+            else:
+                datos = extraer_cfdi(contenido)
+                with transaction.atomic():
+                    factura, created = procesar_xml_cfdi(
+                        None, registro.nombre, empresa, datos=datos, sha256=sha256
+                    )
+                    if created:
+                        registro.estado = 'CREADA'
+                        registro.factura_uuid = factura.uuid
+                    else:
+                        registro.estado = 'DUPLICADA'
+                        registro.factura_uuid = factura.uuid
+                        registro.mensaje = 'El XML ya estaba registrado'
+        except Exception as e:
+            registro.estado = 'ERROR'
+            registro.mensaje = str(e)[:1000]
+            logger.error(f"Error procesando {registro.nombre}: {e}")
+        registro.procesado_en = timezone.now()
+
+    @staticmethod
+    def _guardar_avance(task, lote, cola):
+        """Checkpoint: resultados por archivo y estado de la cola de contabilización."""
+        with transaction.atomic():
+            if lote:
+                ArchivoIngesta.objects.bulk_update(lote, ['estado', 'factura_uuid', 'mensaje', 'procesado_en'])
+            task.payload['contabilizacion_pendiente'] = cola.pendientes
+            task.payload['tareas_contabilizacion'] = cola.tareas
+            task.save(update_fields=['payload'])
+
+        # Los archivos se quitan del spool hasta que su resultado quedó guardado
+        # (un reintento debe poder releerlos); los errores se conservan para revisión
+        for registro in lote:
+            if registro.estado != 'ERROR':
+                try:
+                    os.remove(registro.ruta)
+                except OSError:
+                    pass
+
+    @staticmethod
+    def _uuids_encolados(cola):
+        """UUIDs ya encolados por la tarea: pendientes de la cola y lotes creados."""
+        encolados = {str(u).lower() for u in cola.pendientes}
+        for payload in BackgroundTask.objects.filter(pk__in=cola.tareas).values_list('payload', flat=True):
+            encolados.update(str(u).lower() for u in (payload or {}).get('uuids', []))
+        return encolados
+
+    @staticmethod
+    def procesar_tarea(task):
+        """Procesa los archivos PENDIENTES de una tarea 'ingestar_xml'."""
+        payload = task.payload or {}
+        empresa = Empresa.objects.get(pk=payload['empresa_id'])
+        usuario_id = payload.get('usuario_id')
+
+        # Las facturas creadas se encolan para contabilizar mientras avanza la carga
+        cola = ContabilizacionAutomatica(empresa, usuario_id, origen_id=task.id)
+        cola.pendientes = payload.get('contabilizacion_pendiente') or []
+        cola.tareas = payload.get('tareas_contabilizacion') or []
+
+        # En un reintento, un archivo PENDIENTE cuya factura se creó antes de la
+        # caída (sin llegar al checkpoint) aparece como DUPLICADA: se encola
+        # igual si aún no está en la cola ni en las tareas ya creadas
+        reanudada = bool(payload.get('iniciada'))
+        if reanudada:
+            encolados = IngestaXML._uuids_encolados(cola)
+        else:
+            payload['iniciada'] = True
+            task.payload = payload
+            task.save(update_fields=['payload'])
+
+        pendientes = list(task.archivos_ingesta.filter(estado='PENDIENTE').order_by('id'))
+        lote = []
+        for registro in pendientes:
+            IngestaXML._procesar_archivo(registro, empresa)
+            if registro.estado == 'CREADA':
+                cola.agregar(registro.factura_uuid)
+            elif reanudada and registro.estado == 'DUPLICADA' and registro.factura_uuid:
+                factura_uuid = str(registro.factura_uuid).lower()
+                if factura_uuid not in encolados:
+                    encolados.add(factura_uuid)
+                    cola.agregar(factura_uuid)
+            lote.append(registro)
+            if len(lote) >= IngestaXML.LOTE_GUARDADO:
+                IngestaXML._guardar_avance(task, lote, cola)
+                lote = []
+        cola.cerrar()
+        IngestaXML._guardar_avance(task, lote, cola)
+
+        resumen = IngestaXML.resumen(task)
+        payload['resumen'] = resumen
+        task.payload = payload
+        task.save(update_fields=['payload'])
+
+        # Quitar el directorio si ya no quedan archivos con error
+        directorio = payload.get('directorio')
+        if directorio and os.path.isdir(directorio) and not os.listdir(directorio):
+            shutil.rmtree(directorio, ignore_errors=True)
+
+        return resumen
+
+    @staticmethod
+    def resumen(task):
+        """Conteo de archivos por estado (una sola consulta)."""
+        conteo = {estado: 0 for estado, _ in ArchivoIngesta.ESTADO_CHOICES}
+        for fila in task.archivos_ingesta.values('estado').annotate(n=Count('id')):
+            conteo[fila['estado']] = fila['n']
+        return {
+            'creadas': conteo['CREADA'],
+            'duplicadas': conteo['DUPLICADA'],
+            'errores': conteo['ERROR'],
+            'pendientes': conteo['PENDIENTE'],
+        }
+
+    @staticmethod
+    def progreso(task):
+        """Representación JSON del progreso de una tarea 'ingestar_xml'."""
+        resumen = IngestaXML.resumen(task)
+        total = (task.payload or {}).get('total') or sum(resumen.values())
+        procesados = total - resumen['pendientes']
+        return {
+            'task_id': task.id,
+            'status': task.status,
+            'total': total,
+            'procesados': procesados,
+            'porcentaje': int(procesados * 100 / total) if total else 100,
+            'resumen': resumen,
+            'contabilizacion': ContabilizacionAutomatica.resumen_tareas(
+                (task.payload or {}).get('tareas_contabilizacion')
+            ),
+            'terminada': task.status in ('COMPLETED', 'FAILED'),
+        }
@@ -0,0 +1,89 @@
+"""
+Inicialización de Empresa en Segundo Plano
+
+Los signals de Empresa/UsuarioEmpresa solo encolan una tarea
+'inicializar_empresa'; el worker ejecuta los pasos:
+
+1. inicializar: catálogo de cuentas y plantillas (EmpresaInitializer, idempotente)
+2. rebuild: reconstrucción contable del año de la empresa (ReconstruccionContable)
+3. validar_xml: scripts/validate_xml_accounts.py
+
+Cada paso terminado se registra en payload['completados'] con su resultado en
+payload['resultados'], así que un reintento continúa con el siguiente paso.
+La clave de deduplicación 'inicializar_empresa:<id>' evita encolar dos tareas
+activas para la misma empresa.
+"""
+
+from django.conf import settings
+from core.models import BackgroundTask, Empresa
+from core.services.seeder import inicializar_empresa
+import logging
+import os
+import subprocess
+import sys
+
+logger = logging.getLogger(__name__)
+
+PASOS = ('inicializar', 'rebuild', 'validar_xml')
+# Límite de ejecución del script de validación (segundos)
+TIMEOUT_VALIDACION = 600
+
+
+def dedup_key(empresa_id):
+    return f'inicializar_empresa:{empresa_id}'
+
+
+class InicializacionEmpresa:
+
+    @staticmethod
+    def procesar_tarea(task):
+        """Ejecuta los pasos pendientes de una tarea 'inicializar_empresa'."""
+        payload = task.payload or {}
+        empresa = Empresa.objects.get(pk=payload['empresa_id'])
+        completados = payload.setdefault('completados', [])
+        resultados = payload.setdefault('resultados', {})
+
+        for paso in payload.get('pasos', ['inicializar']):
+            if paso in completados:
+                continue
+            logger.info(f"🔔 Inicialización {empresa.nombre}: paso '{paso}'")
+            resultados[paso] = getattr(InicializacionEmpresa, f'_paso_{paso}')(empresa, payload)
+            completados.append(paso)
+            task.payload = payload
+            task.save(update_fields=['payload'])
+        return resultados
+
+    @staticmethod
+    def _paso_inicializar(empresa, payload):
+        inicializar_empresa(empresa)
+        return 'ok'
+
+    @staticmethod
+    def _paso_rebuild(empresa, payload):
+        from core.services.reconstruccion_contable import ReconstruccionContable
+
+        reconstruccion = ReconstruccionContable(payload['anio'], empresa_ids=[empresa.id])
+        particiones = reconstruccion.registrar(reconstruccion.planificar())
+        total = {'particiones': len(particiones), 'procesadas': 0, 'errores': 0, 'fallidas': 0}
+        for resultado in reconstruccion.ejecutar(particiones):
+            total['procesadas'] += resultado['procesadas']
+            total['errores'] += resultado['errores']
+            total['fallidas'] += resultado['estado'] == 'ERROR'
+        return total
+
+    @staticmethod
+    def _paso_validar_xml(empresa, payload):
+        script_path = os.path.join(getattr(settings, 'BASE_DIR', os.getcwd()), 'scripts', 'validate_xml_accounts.py')
+        if not os.path.isfile(script_path):
+            return 'sin script'
+        proceso = subprocess.run(
+            [sys.executable, script_path], check=False, capture_output=True, timeout=TIMEOUT_VALIDACION
+        )
+        return f'código {proceso.returncode}'
+
+    @staticmethod
+    def ultima_tarea(empresa_id):
+        """Tarea de inicialización más reciente de la empresa (o None)."""
+        return BackgroundTask.objects.filter(
+            task_type='inicializar_empresa', dedup_key=dedup_key(empresa_id)
+        ).order_by('-created_at').first()
@@ -0,0 +1,227 @@
+"""
+Reconstrucción Contable Particionada
+
+Reconstruye las pólizas de un año dividiendo el trabajo por (empresa, mes).
+Cada partición es una transacción independiente que limpia sus pólizas,
+recontabiliza sus facturas y marca su checkpoint (ParticionReconstruccion)
+como COMPLETADA; si el proceso se interrumpe, las particiones ya completadas
+conservan su resultado y una nueva corrida solo retoma las pendientes. Cuando
+la corrida anterior terminó (todas sus particiones COMPLETADAS), una nueva
+corrida vuelve a procesar todo el plan.
+
+Modos:
+- diferencial (default): recontabilizar_factura, solo escribe lo que cambió;
+  se eliminan únicamente las pólizas de facturas que ya no se contabilizan.
+- completo: elimina todas las pólizas de la partición y las recrea.
+
+Las particiones pueden repartirse entre procesos (workers > 1, ver
+core.utils.procesos). En SQLite se procesan en serie.
+"""
+
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import ExtractMonth
+from django.utils import timezone
+from core.models import Concepto, Factura, ParticionReconstruccion, Poliza
+from core.services.account_resolver import AccountResolver
+from core.services.accounting_service import AccountingService
+from core.services.eliminacion_masiva import EliminacionMasiva
+from core.utils.consultas import rango_mes
+from core.utils.procesos import repartir
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+NATURALEZAS = ('I', 'E')
+# Errores detallados que se guardan por partición
+MAX_MENSAJES = 5
+
+
+def facturas_particion(empresa_id, anio, mes):
+    """Facturas a contabilizar de una partición: I/E no canceladas."""
+    desde, hasta = rango_mes(anio, mes)
+    return Factura.objects.filter(
+        empresa_id=empresa_id, fecha__gte=desde, fecha__lt=hasta, naturaleza__in=NATURALEZAS
+    ).exclude(estado_sat='Cancelado')
+
+
+def _sin_cambios(cambios):
+    return not (cambios['insertados'] or cambios['actualizados'] or cambios['eliminados'] or cambios['cabecera'])
+
+
+class ReconstruccionContable:
+    """
+    Uso:
+        rec = ReconstruccionContable(2025, empresa_ids=[1, 2])
+        particiones = rec.registrar(rec.planificar(), reiniciar=False)
+        for resultado in rec.ejecutar(particiones, workers=4):
+            ...
+    """
+
+    def __init__(self, anio, empresa_ids=None, completo=False):
+        self.anio = anio
+        self.empresa_ids = list(empresa_ids or [])
+        self.completo = completo
+
+    def planificar(self):
+        """
+        Particiones del año con facturas o pólizas. Sin escrituras.
+
+        Returns:
+            dict: {(empresa_id, mes): facturas a contabilizar}
+        """
+        facturas = Factura.objects.filter(fecha__year=self.anio)
+        polizas = Poliza.objects.filter(fecha__year=self.anio, factura__isnull=False)
+        if self.empresa_ids:
+            facturas = facturas.filter(empresa_id__in=self.empresa_ids)
+            polizas = polizas.filter(factura__empresa_id__in=self.empresa_ids)
+
+        plan = {}
+        # Meses con pólizas que quizá haya que limpiar, aunque no tengan facturas a contabilizar
+        for empresa_id, mes in polizas.annotate(mes=ExtractMonth('fecha')).values_list(
+            'factura__empresa_id', 'mes'
+        ).distinct():
+            plan[(empresa_id, mes)] = 0
+        for fila in facturas.filter(naturaleza__in=NATURALEZAS).exclude(estado_sat='Cancelado').annotate(
+            mes=ExtractMonth('fecha')
+        ).values('empresa_id', 'mes').annotate(n=Count('id')).order_by():
+            plan[(fila['empresa_id'], fila['mes'])] = fila['n']
+        return dict(sorted(plan.items(), key=lambda item: (item[0][1], item[0][0])))
+
+    def registrar(self, plan, reiniciar=False):
+        """
+        Crea o actualiza los checkpoints del plan.
+
+        Si la corrida anterior quedó incompleta, las particiones COMPLETADAS se
+        conservan (la corrida se reanuda) salvo con reiniciar=True; las que
+        quedaron EN_PROCESO o en ERROR vuelven a PENDIENTE. Si todas estaban
+        COMPLETADAS, la corrida anterior terminó y se reinician todas.
+
+        Returns:
+            list: ParticionReconstruccion pendientes, en orden de ejecución
+        """
+        existentes = {
+            (p.empresa_id, p.mes): p for p in ParticionReconstruccion.objects.filter(
+                anio=self.anio, empresa_id__in={empresa_id for empresa_id, _ in plan}
+            )
+        }
+        # Sin particiones inconclusas no hay nada que reanudar: es una corrida nueva
+        if existentes and all(p.estado == 'COMPLETADA' for p in existentes.values()):
+            reiniciar = True
+
+        pendientes = []
+        for (empresa_id, mes), n in plan.items():
+            particion = existentes.get((empresa_id, mes))
+            if particion is None:
+                particion = ParticionReconstruccion.objects.create(
+                    empresa_id=empresa_id, anio=self.anio, mes=mes, facturas=n
+                )
+            elif particion.estado != 'COMPLETADA' or reiniciar:
+                particion.estado = 'PENDIENTE'
+                particion.facturas = n
+                particion.procesadas = particion.sin_cambios = particion.errores = 0
+                particion.polizas_eliminadas = 0
+                particion.mensaje = None
+                particion.iniciada_en = particion.terminada_en = None
+                particion.save()
+            else:
+                continue
+            pendientes.append(particion)
+        return pendientes
+
+    @staticmethod
+    def procesar_particion(particion_id, completo=False):
+        """
+        Reconstruye una partición en una sola transacción junto con su checkpoint.
+
+        Returns:
+            dict: resultado de la partición (estado, facturas, procesadas, sin_cambios, errores, segundos)
+        """
+        particion = ParticionReconstruccion.objects.select_related('empresa').get(pk=particion_id)
+        ParticionReconstruccion.objects.filter(pk=particion_id).update(
+            estado='EN_PROCESO', iniciada_en=timezone.now()
+        )
+        inicio = time.perf_counter()
+        mensajes = []
+        try:
+            with transaction.atomic():
+                qs = facturas_particion(particion.empresa_id, particion.anio, particion.mes)
+                facturas = list(qs.select_related('empresa').order_by('fecha', 'id'))
+
+                # Limpieza de la partición
+                desde, hasta = rango_mes(particion.anio, particion.mes)
+                polizas = Poliza.objects.filter(
+                    factura__empresa_id=particion.empresa_id, fecha__gte=desde, fecha__lt=hasta,
+                )
+                if not completo:
+                    polizas = polizas.exclude(factura__in=qs.values('id'))
+                eliminadas = EliminacionMasiva.eliminar_polizas(polizas.values_list('id', flat=True))['polizas']
+
+                # CRÍTICO: Resetear estado_contable a PENDIENTE
+                # (en modo diferencial las contabilizadas se conservan y se recontabilizan)
+                reset = qs.order_by()
+                if not completo:
+                    reset = reset.exclude(estado_contable='CONTABILIZADA')
+                reset.update(estado_contable='PENDIENTE')
+
+                conceptos = {}
+                for concepto in Concepto.objects.filter(factura__in=qs.values('id')).order_by('id'):
+                    conceptos.setdefault(concepto.factura_id, []).append(concepto)
+
+                procesadas = sin_cambios = errores = 0
+                with AccountResolver.lote(particion.empresa, facturas):
+                    for factura in facturas:
+                        try:
+                            if completo:
+                                AccountingService.contabilizar_factura(
+                                    factura.uuid, conceptos=conceptos.get(factura.id, [])
+                                )
+                            else:
+                                _, cambios = AccountingService.recontabilizar_factura(
+                                    factura.uuid, conceptos=conceptos.get(factura.id, [])
+                                )
+                                sin_cambios += _sin_cambios(cambios)
+                            procesadas += 1
+                        except Exception as e:
+                            errores += 1
+                            if len(mensajes) < MAX_MENSAJES:
+                                mensajes.append(f"{factura.uuid}: {str(e)[:200]}")
+                            logger.error(f"Error en {factura.uuid}: {e}", exc_info=True)
+
+                resultado = {
+                    'estado': 'COMPLETADA',
+                    'facturas': len(facturas),
+                    'procesadas': procesadas,
+                    'sin_cambios': sin_cambios,
+                    'errores': errores,
+                    'polizas_eliminadas': eliminadas,
+                }
+                ParticionReconstruccion.objects.filter(pk=particion_id).update(
+                    mensaje='\n'.join(mensajes) or None, terminada_en=timezone.now(), **resultado
+                )
+        except Exception as e:
+            # La transacción de la partición se revirtió: queda para la siguiente corrida
+            logger.error(f"❌ Partición {particion} falló: {e}", exc_info=True)
+            resultado = {
+                'estado': 'ERROR', 'facturas': particion.facturas, 'procesadas': 0,
+                'sin_cambios': 0, 'errores': 0, 'polizas_eliminadas': 0,
+            }
+            ParticionReconstruccion.objects.filter(pk=particion_id).update(
+                estado='ERROR', mensaje=str(e)[:1000], terminada_en=timezone.now()
+            )
+
+        resultado.update(
+            particion_id=particion_id, empresa_id=particion.empresa_id, anio=particion.anio,
+            mes=particion.mes, segundos=time.perf_counter() - inicio, mensajes=mensajes,
+        )
+        return resultado
+
+    def ejecutar(self, particiones, workers=1):
+        """
+        Procesa las particiones y produce el resultado de cada una al terminar.
+        Con workers > 1 se reparten entre procesos (ver core.utils.procesos).
+        """
+        argumentos = [(p.id, self.completo) for p in particiones]
+        for _, obtener in repartir(ReconstruccionContable.procesar_particion, argumentos, workers):
+            yield obtener()
@@ -0,0 +1,186 @@
+"""
+Validación SAT por Lotes
+
+Procesa UUIDs en bloques (chunks): una sola consulta a BD por bloque,
+consulta al SAT solo de las facturas que lo requieren (SatRevalidationPolicy)
+y aplica los efectos de cancelación en bloque (borrado de pólizas y
+estado EXCLUIDA) dentro de una transacción por bloque.
+
+La tarea de fondo 'validar_sat' guarda un checkpoint en su payload después
+de cada bloque, de modo que un reintento continúa donde se quedó.
+"""
+
+from django.db import transaction
+from django.utils import timezone
+from core.models import Factura
+from core.services.eliminacion_masiva import EliminacionMasiva
+from core.services.sat_status import SatStatusValidator
+from core.services.sat_revalidacion import SatRevalidationPolicy
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class SatNoDisponibleError(Exception):
+    """El circuito del cliente SAT está abierto: conviene reintentar más tarde."""
+
+
+def resumen_vacio():
+    return {
+        'vigentes': 0,
+        'canceladas': 0,
+        'no_encontradas': 0,
+        'errores': 0,
+        'omitidas': 0,
+    }
+
+
+CONTADOR_POR_ESTADO = {
+    'Vigente': 'vigentes',
+    'Cancelado': 'canceladas',
+    'No Encontrado': 'no_encontradas',
+    'Error': 'errores',
+}
+
+
+class ValidacionSatLote:
+    """Validación SAT de conjuntos de facturas por bloques."""
+
+    CHUNK_SIZE = 50
+
+    @staticmethod
+    def aplicar_cancelaciones(factura_ids):
+        """
+        Efectos de cancelación en bloque: elimina pólizas y movimientos de
+        las facturas y las marca como EXCLUIDA.
+        """
+        factura_ids = list(factura_ids)
+        if not factura_ids:
+            return 0
+        return EliminacionMasiva.descontabilizar(factura_ids, estado='EXCLUIDA')['facturas']
+
+    @staticmethod
+    def validar_chunk(empresa_id, uuids, forzar=False, policy=None):
+        """
+        Valida un bloque de UUIDs de una empresa.
+
+        Returns:
+            dict: contadores del bloque (ver resumen_vacio)
+
+        Raises:
+            SatNoDisponibleError: si el circuito SAT se abrió durante el bloque
+                (los resultados obtenidos hasta ese punto sí se guardan).
+        """
+        policy = policy or SatRevalidationPolicy()
+        resumen = resumen_vacio()
+
+        validos = {}
+        for uuid_str in uuids:
+            try:
+                validos[str(uuid.UUID(str(uuid_str)))] = uuid_str
+            except ValueError:
+                resumen['errores'] += 1
+                logger.error(f"❌ UUID inválido: {uuid_str}")
+
+        facturas = list(Factura.objects.filter(empresa_id=empresa_id, uuid__in=list(validos)))
+        encontradas = {str(f.uuid) for f in facturas}
+        for uuid_norm, uuid_str in validos.items():
+            if uuid_norm not in encontradas:
+                resumen['errores'] += 1
+                logger.error(f"❌ Factura {uuid_str} no encontrada en BD")
+
+        if forzar:
+            a_validar, omitidas = facturas, []
+        else:
+            a_validar, omitidas = policy.separar(facturas)
+        resumen['omitidas'] += len(omitidas)
+
+        actualizadas = []
+        canceladas_ids = []
+        circuito_abierto = False
+        for factura in a_validar:
+            resultado = SatStatusValidator.validar_factura_model(factura)
+            estado_sat = resultado['estado']
+
+            # Falla del servicio: no sobrescribir el estado conocido
+            if resultado.get('transitorio'):
+                resumen['errores'] += 1
+                logger.error(f"❌ SAT no disponible para {factura.uuid}: {resultado.get('mensaje')}")
+                if SatStatusValidator.circuito.estado == SatStatusValidator.circuito.ABIERTO:
+                    circuito_abierto = True
+                    break
+                continue
+
+            resumen[CONTADOR_POR_ESTADO.get(estado_sat, 'errores')] += 1
+            factura.estado_sat = estado_sat
+            factura.ultima_validacion = timezone.now()
+            actualizadas.append(factura)
+            if estado_sat == 'Cancelado':
+                canceladas_ids.append(factura.id)
+                logger.warning(f"❌ Factura {factura.uuid}: CANCELADA - Eliminando pólizas")
+
+        with transaction.atomic():
+            if actualizadas:
+                Factura.objects.bulk_update(actualizadas, ['estado_sat', 'ultima_validacion'])
+            ValidacionSatLote.aplicar_cancelaciones(canceladas_ids)
+
+        if circuito_abierto:
+            raise SatNoDisponibleError('Servicio SAT no disponible temporalmente (circuito abierto)')
+
+        return resumen
+
+    @staticmethod
+    def procesar_tarea(task):
+        """
+        Ejecuta una BackgroundTask 'validar_sat' desde su checkpoint.
+
+        Payload:
+            empresa_id, uuids, forzar, chunk_size,
+            procesados (checkpoint), resumen (acumulado)
+        """
+        payload = task.payload or {}
+        uuids = payload.get('uuids', [])
+        chunk_size = payload.get('chunk_size') or ValidacionSatLote.CHUNK_SIZE
+        resumen = payload.get('resumen') or resumen_vacio()
+        procesados = payload.get('procesados', 0)
+        policy = SatRevalidationPolicy()
+
+        while procesados < len(uuids):
+            chunk = uuids[procesados:procesados + chunk_size]
+            try:
+                parcial = ValidacionSatLote.validar_chunk(
+                    payload['empresa_id'], chunk, forzar=payload.get('forzar', False), policy=policy
+                )
+            except SatNoDisponibleError:
+                # Guardar lo avanzado; el bloque completo se repetirá al reintentar
+                task.save(update_fields=['payload'])
+                raise
+
+            for clave, valor in parcial.items():
+                resumen[clave] = resumen.get(clave, 0) + valor
+            procesados += len(chunk)
+
+            payload['procesados'] = procesados
+            payload['resumen'] = resumen
+            task.payload = payload
+            task.save(update_fields=['payload'])
+
+        return resumen
+
+    @staticmethod
+    def progreso(task):
+        """Representación JSON del progreso de una tarea 'validar_sat'."""
+        payload = task.payload or {}
+        total = len(payload.get('uuids', []))
+        procesados = payload.get('procesados', 0)
+        return {
+            'task_id': task.id,
+            'status': task.status,
+            'total': total,
+            'procesados': procesados,
+            'porcentaje': int(procesados * 100 / total) if total else 100,
+            'resumen': payload.get('resumen') or resumen_vacio(),
+            'terminada': task.status in ('COMPLETED', 'FAILED'),
+            'error': (task.error or '').strip().splitlines()[-1] if task.status == 'FAILED' and task.error else None,
+        }
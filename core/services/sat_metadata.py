@@ -0,0 +1,179 @@
+"""
+Importador de Metadata SAT (Descarga Masiva)
+
+Los archivos de metadata de la descarga masiva listan el estatus de cada
+CFDI emitido o recibido por el contribuyente, incluyendo cancelaciones:
+
+    Uuid~RfcEmisor~NombreEmisor~RfcReceptor~NombreReceptor~RfcPac~
+    FechaEmision~FechaCertificacionSat~Monto~EfectoComprobante~Estatus~FechaCancelacion
+
+Estatus: 1 = Vigente, 0 = Cancelado.
+
+El archivo se lee en streaming (también dentro de un .zip tal como lo
+entrega el SAT) y se procesa por bloques: una consulta por bloque para
+cruzar UUIDs contra Factura y un UPDATE agrupado por estado. Las facturas
+que pasan a 'Cancelado' se encolan en una tarea 'aplicar_cancelaciones'
+para eliminar sus pólizas sin bloquear la importación.
+"""
+
+from django.db import transaction
+from django.utils import timezone
+from core.models import Factura
+import io
+import logging
+import uuid
+import zipfile
+
+logger = logging.getLogger(__name__)
+
+
+SEPARADOR = '~'
+
+# Posiciones por defecto si el archivo no trae encabezado
+COLUMNAS_DEFAULT = {'uuid': 0, 'estatus': 10}
+
+ESTATUS_SAT = {
+    '1': 'Vigente',
+    '0': 'Cancelado',
+}
+
+
+def _abrir_lineas(ruta):
+    """Itera las líneas de un TXT de metadata o de los TXT dentro de un .zip."""
+    if zipfile.is_zipfile(ruta):
+        with zipfile.ZipFile(ruta) as zf:
+            for nombre in zf.namelist():
+                if not nombre.lower().endswith('.txt'):
+                    continue
+                with zf.open(nombre) as fh:
+                    texto = io.TextIOWrapper(fh, encoding='utf-8-sig', errors='replace')
+                    yield from texto
+    else:
+        with open(ruta, 'r', encoding='utf-8-sig', errors='replace') as fh:
+            yield from fh
+
+
+def leer_metadata(ruta):
+    """
+    Genera tuplas (uuid, estado_sat) de un archivo de metadata.
+    Las líneas con formato inválido se reportan como (None, linea).
+    """
+    columnas = dict(COLUMNAS_DEFAULT)
+    for linea in _abrir_lineas(ruta):
+        linea = linea.strip()
+        if not linea:
+            continue
+        campos = linea.split(SEPARADOR)
+
+        # Encabezado (puede repetirse al concatenar varios TXT del zip)
+        if campos[0].strip().lower() == 'uuid':
+            nombres = [c.strip().lower() for c in campos]
+            columnas = {
+                'uuid': 0,
+                'estatus': nombres.index('estatus') if 'estatus' in nombres else COLUMNAS_DEFAULT['estatus'],
+            }
+            continue
+
+        try:
+            uuid_norm = str(uuid.UUID(campos[columnas['uuid']].strip()))
+            estado = ESTATUS_SAT[campos[columnas['estatus']].strip()]
+        except (IndexError, KeyError, ValueError):
+            yield None, linea
+            continue
+        yield uuid_norm, estado
+
+
+class ImportadorMetadataSat:
+    """
+    Actualiza estado_sat en bloque a partir de metadata de descarga masiva.
+
+    Uso:
+        stats = ImportadorMetadataSat(empresa_id=1).importar('/ruta/metadata.zip')
+    """
+
+    BATCH_SIZE = 5000
+
+    def __init__(self, empresa_id=None, batch_size=None, fecha_corte=None,
+                 descontabilizar=True, dry_run=False):
+        self.empresa_id = empresa_id
+        self.batch_size = batch_size or self.BATCH_SIZE
+        # Fecha en que el SAT generó la metadata: se usa como ultima_validacion
+        self.fecha_corte = fecha_corte or timezone.now()
+        self.descontabilizar = descontabilizar
+        self.dry_run = dry_run
+        self.stats = {
+            'lineas': 0,
+            'invalidas': 0,
+            'coincidencias': 0,
+            'no_en_bd': 0,
+            'nuevas_canceladas': 0,
+            'actualizadas_vigente': 0,
+            'sin_cambio': 0,
+            'tareas_cancelacion': [],
+        }
+
+    def importar(self, ruta):
+        bloque = {}
+        for uuid_norm, estado in leer_metadata(ruta):
+            self.stats['lineas'] += 1
+            if uuid_norm is None:
+                self.stats['invalidas'] += 1
+                continue
+            # Si el UUID aparece dos veces, la cancelación prevalece
+            if bloque.get(uuid_norm) != 'Cancelado':
+                bloque[uuid_norm] = estado
+            if len(bloque) >= self.batch_size:
+                self._procesar_bloque(bloque)
+                bloque = {}
+        if bloque:
+            self._procesar_bloque(bloque)
+        return self.stats
+
+    def _procesar_bloque(self, bloque):
+        qs = Factura.objects.filter(uuid__in=list(bloque))
+        if self.empresa_id:
+            qs = qs.filter(empresa_id=self.empresa_id)
+        existentes = list(qs.values_list('id', 'uuid', 'estado_sat'))
+
+        self.stats['coincidencias'] += len(existentes)
+        self.stats['no_en_bd'] += len(bloque) - len(existentes)
+
+        ids_cancelar = []
+        ids_vigente = []
+        for factura_id, factura_uuid, estado_actual in existentes:
+            estado_nuevo = bloque[str(factura_uuid)]
+            if estado_actual == 'Cancelado':
+                # Terminal: la metadata puede ser anterior a la última consulta
+                self.stats['sin_cambio'] += 1
+            elif estado_nuevo == 'Cancelado':
+                ids_cancelar.append(factura_id)
+            else:
+                ids_vigente.append(factura_id)
+                if estado_actual == 'Vigente':
+                    self.stats['sin_cambio'] += 1
+                else:
+                    self.stats['actualizadas_vigente'] += 1
+
+        self.stats['nuevas_canceladas'] += len(ids_cancelar)
+        if self.dry_run:
+            return
+
+        with transaction.atomic():
+            if ids_vigente:
+                # También refresca ultima_validacion de las ya vigentes
+                Factura.objects.filter(id__in=ids_vigente).update(
+                    estado_sat='Vigente', ultima_validacion=self.fecha_corte
+                )
+            if ids_cancelar:
+                Factura.objects.filter(id__in=ids_cancelar).update(
+                    estado_sat='Cancelado', ultima_validacion=self.fecha_corte
+                )
+                if self.descontabilizar:
+                    from core.tasks import enqueue_aplicar_cancelaciones
+                    task_id = enqueue_aplicar_cancelaciones(ids_cancelar)
+                    self.stats['tareas_cancelacion'].append(task_id)
+
+        logger.debug(
+            f"📄 Bloque metadata: {len(existentes)} coincidencias, "
+            f"{len(ids_cancelar)} nuevas canceladas"
+        )
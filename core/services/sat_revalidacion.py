@@ -0,0 +1,149 @@
+"""
+Política de Revalidación SAT
+
+Decide qué facturas necesitan volver a consultarse en el servicio del SAT
+usando `estado_sat` y `ultima_validacion`, para no repetir consultas de
+resultados frescos o terminales.
+
+REGLAS:
+- 'Cancelado' es terminal: nunca se vuelve a consultar.
+- 'Sin Validar' (o sin fecha de validación) siempre se consulta.
+- 'Vigente' caduca según la antigüedad de la factura: las recientes son
+  las que tienen más probabilidad de cancelarse, por eso caducan antes.
+- 'Error' / 'No Encontrado' se reintentan tras una ventana corta
+  (el SAT tarda hasta 72h en reflejar CFDI recién timbrados).
+
+Los tiempos se pueden ajustar en settings.SAT_REVALIDACION.
+"""
+
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Q, Case, When, Value, IntegerField
+from django.utils import timezone
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+ESTADOS_TERMINALES = ('Cancelado',)
+
+# Vigencia por defecto (horas) de cada resultado
+DEFAULTS = {
+    # (antigüedad máxima de la factura en días, horas de vigencia del resultado 'Vigente')
+    'VIGENTE_TIERS': [
+        (30, 24),        # Facturas del último mes: revalidar diario
+        (365, 24 * 7),   # Del último año: semanal
+        (None, 24 * 30), # Más antiguas: mensual
+    ],
+    'ERROR_HORAS': 1,
+    'NO_ENCONTRADO_HORAS': 6,
+}
+
+
+def _config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'SAT_REVALIDACION', {}) or {})
+    return config
+
+
+class SatRevalidationPolicy:
+    """
+    Motor de decisión para revalidar facturas contra el SAT.
+
+    Uso:
+        policy = SatRevalidationPolicy()
+        if policy.necesita_revalidacion(factura):
+            ...
+        qs = policy.pendientes(Factura.objects.filter(empresa=empresa))
+    """
+
+    def __init__(self, now=None):
+        self.now = now or timezone.now()
+        self.config = _config()
+
+    def vigencia_resultado(self, factura):
+        """
+        Retorna el timedelta durante el cual el último resultado sigue fresco.
+        None significa que el resultado nunca caduca (terminal).
+        """
+        estado = factura.estado_sat
+        if estado in ESTADOS_TERMINALES:
+            return None
+        if estado == 'Error':
+            return timedelta(hours=self.config['ERROR_HORAS'])
+        if estado == 'No Encontrado':
+            return timedelta(hours=self.config['NO_ENCONTRADO_HORAS'])
+        if estado == 'Vigente':
+            antiguedad = self.now - factura.fecha
+            for max_dias, horas in self.config['VIGENTE_TIERS']:
+                if max_dias is None or antiguedad <= timedelta(days=max_dias):
+                    return timedelta(hours=horas)
+        # 'Sin Validar' o estado desconocido: caduca de inmediato
+        return timedelta(0)
+
+    def necesita_revalidacion(self, factura):
+        """True si la factura debe enviarse al SAT."""
+        if factura.estado_sat in ESTADOS_TERMINALES:
+            return False
+        if factura.estado_sat == 'Sin Validar' or not factura.ultima_validacion:
+            return True
+        vigencia = self.vigencia_resultado(factura)
+        return self.now - factura.ultima_validacion >= vigencia
+
+    def filtro_pendientes(self):
+        """
+        Q equivalente a `necesita_revalidacion` para filtrar en base de datos.
+        """
+        now = self.now
+        q = Q(estado_sat='Sin Validar') | Q(ultima_validacion__isnull=True)
+
+        q |= Q(
+            estado_sat='Error',
+            ultima_validacion__lte=now - timedelta(hours=self.config['ERROR_HORAS'])
+        )
+        q |= Q(
+            estado_sat='No Encontrado',
+            ultima_validacion__lte=now - timedelta(hours=self.config['NO_ENCONTRADO_HORAS'])
+        )
+
+        fecha_limite_anterior = None
+        for max_dias, horas in self.config['VIGENTE_TIERS']:
+            tier = Q(estado_sat='Vigente', ultima_validacion__lte=now - timedelta(hours=horas))
+            if max_dias is not None:
+                tier &= Q(fecha__gte=now - timedelta(days=max_dias))
+            if fecha_limite_anterior is not None:
+                tier &= Q(fecha__lt=fecha_limite_anterior)
+            q |= tier
+            if max_dias is None:
+                break
+            fecha_limite_anterior = now - timedelta(days=max_dias)
+
+        return q & ~Q(estado_sat__in=ESTADOS_TERMINALES)
+
+    def pendientes(self, queryset):
+        """
+        Filtra un queryset de Factura a las que necesitan revalidación,
+        priorizando: nunca validadas primero, luego las más recientes.
+        """
+        return queryset.filter(self.filtro_pendientes()).annotate(
+            prioridad_sat=Case(
+                When(estado_sat='Sin Validar', then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        ).order_by('prioridad_sat', '-fecha')
+
+    def separar(self, facturas):
+        """
+        Divide una lista de facturas en (a_validar, omitidas) ordenando
+        las que se validarán por prioridad (recientes primero).
+        """
+        a_validar = []
+        omitidas = []
+        for factura in facturas:
+            if self.necesita_revalidacion(factura):
+                a_validar.append(factura)
+            else:
+                omitidas.append(factura)
+        a_validar.sort(key=lambda f: (f.estado_sat != 'Sin Validar', -f.fecha.timestamp()))
+        return a_validar, omitidas
@@ -14,18 +14,158 @@ Referencia: Documentación SAT - Consulta de CFDI
 
 import requests
 import xml.etree.ElementTree as ET
+from collections import deque
 from decimal import Decimal
+from django.conf import settings
 import logging
+import random
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
 
+class SatTransientError(Exception):
+    """Falla transitoria (timeout, conexión, HTTP 5xx/429) que amerita reintento."""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker simple (CERRADO → ABIERTO → SEMI_ABIERTO).
+    
+    - CERRADO: las consultas pasan; N fallos consecutivos lo abren.
+    - ABIERTO: las consultas fallan de inmediato durante `tiempo_apertura` segundos.
+    - SEMI_ABIERTO: deja pasar una consulta de prueba; si tiene éxito se cierra,
+      si falla vuelve a abrirse.
+    """
+    CERRADO = 'CERRADO'
+    ABIERTO = 'ABIERTO'
+    SEMI_ABIERTO = 'SEMI_ABIERTO'
+
+    def __init__(self, umbral_fallos=5, tiempo_apertura=60.0, reloj=time.monotonic):
+        self.umbral_fallos = umbral_fallos
+        self.tiempo_apertura = tiempo_apertura
+        self._reloj = reloj
+        self._lock = threading.Lock()
+        self.estado = self.CERRADO
+        self.fallos_consecutivos = 0
+        self._abierto_desde = None
+        self._prueba_en_curso = False
+
+    def permitir(self):
+        with self._lock:
+            if self.estado == self.ABIERTO:
+                if self._reloj() - self._abierto_desde < self.tiempo_apertura:
+                    return False
+                self.estado = self.SEMI_ABIERTO
+                self._prueba_en_curso = False
+            if self.estado == self.SEMI_ABIERTO:
+                if self._prueba_en_curso:
+                    return False
+                self._prueba_en_curso = True
+            return True
+
+    def registrar_exito(self):
+        with self._lock:
+            self.estado = self.CERRADO
+            self.fallos_consecutivos = 0
+            self._prueba_en_curso = False
+
+    def registrar_fallo(self):
+        with self._lock:
+            self.fallos_consecutivos += 1
+            if self.estado == self.SEMI_ABIERTO or self.fallos_consecutivos >= self.umbral_fallos:
+                if self.estado != self.ABIERTO:
+                    logger.error(
+                        f"🔌 Circuito SAT ABIERTO tras {self.fallos_consecutivos} fallos consecutivos "
+                        f"(reintento en {self.tiempo_apertura:.0f}s)"
+                    )
+                self.estado = self.ABIERTO
+                self._abierto_desde = self._reloj()
+                self._prueba_en_curso = False
+
+
+class SatClientMetrics:
+    """Métricas en proceso de las consultas al SAT (latencia y tasa de error)."""
+
+    def __init__(self, ventana=500):
+        self._lock = threading.Lock()
+        self._latencias = deque(maxlen=ventana)
+        self.intentos = 0
+        self.exitos = 0
+        self.fallos = 0
+        self.reintentos = 0
+        self.rechazadas_circuito = 0
+
+    def registrar_intento(self, latencia, exito):
+        with self._lock:
+            self.intentos += 1
+            self._latencias.append(latencia)
+            if exito:
+                self.exitos += 1
+            else:
+                self.fallos += 1
+
+    def registrar_reintento(self):
+        with self._lock:
+            self.reintentos += 1
+
+    def registrar_rechazo(self):
+        with self._lock:
+            self.rechazadas_circuito += 1
+
+    def snapshot(self):
+        with self._lock:
+            latencias = sorted(self._latencias)
+
+            def percentil(p):
+                if not latencias:
+                    return 0.0
+                idx = min(len(latencias) - 1, int(round(p * (len(latencias) - 1))))
+                return latencias[idx]
+
+            return {
+                'intentos': self.intentos,
+                'exitos': self.exitos,
+                'fallos': self.fallos,
+                'reintentos': self.reintentos,
+                'rechazadas_circuito': self.rechazadas_circuito,
+                'tasa_error': (self.fallos / self.intentos) if self.intentos else 0.0,
+                'latencia_p50': percentil(0.50),
+                'latencia_p95': percentil(0.95),
+                'latencia_max': latencias[-1] if latencias else 0.0,
+            }
+
+
+def _resultado(estado, mensaje, estado_cancelacion='', transitorio=False):
+    return {
+        'estado': estado,
+        'es_cancelable': estado == 'Vigente',
+        'estado_cancelacion': estado_cancelacion,
+        'mensaje': mensaje,
+        'transitorio': transitorio,
+    }
+
+
 class SatStatusValidator:
     """
     Cliente SOAP para consultar el estatus de facturas en el SAT
+    
+    Resiliencia:
+    - Timeout por intento (conexión, lectura)
+    - Reintentos con backoff exponencial y jitter para fallas transitorias
+    - Circuit breaker compartido por proceso: falla rápido mientras el SAT no responde
+    - Métricas de latencia y tasa de error (SatStatusValidator.metricas())
+    
+    Configurable en settings: SAT_CONSULTA_ENDPOINT, SAT_CLIENTE.
+    Los resultados con 'transitorio': True no reflejan el estatus real del CFDI
+    y no deben persistirse sobre un estado conocido.
     """
     
-    ENDPOINT = 'https://consultaqr.facturaelectronica.sat.gob.mx/ConsultaCFDIService.svc'
+    ENDPOINT = getattr(
+        settings, 'SAT_CONSULTA_ENDPOINT',
+        'https://consultaqr.facturaelectronica.sat.gob.mx/ConsultaCFDIService.svc'
+    )
     
     # Namespace del SAT
     NAMESPACES = {
@@ -33,6 +173,146 @@ class SatStatusValidator:
         'tem': 'http://tempuri.org/',
     }
     
+    CONFIG = {
+        'TIMEOUT_CONEXION': 5,
+        'TIMEOUT_LECTURA': 10,
+        'MAX_INTENTOS': 3,
+        'BACKOFF_BASE': 0.5,
+        'BACKOFF_MAX': 8.0,
+        'CIRCUITO_UMBRAL_FALLOS': 5,
+        'CIRCUITO_TIEMPO_APERTURA': 60,
+    }
+    CONFIG.update(getattr(settings, 'SAT_CLIENTE', {}) or {})
+    
+    circuito = CircuitBreaker(
+        umbral_fallos=CONFIG['CIRCUITO_UMBRAL_FALLOS'],
+        tiempo_apertura=CONFIG['CIRCUITO_TIEMPO_APERTURA'],
+    )
+    _metricas = SatClientMetrics()
+    _sleep = staticmethod(time.sleep)
+    
+    @staticmethod
+    def metricas():
+        """Snapshot de métricas del cliente + estado del circuito."""
+        data = SatStatusValidator._metricas.snapshot()
+        data['circuito'] = SatStatusValidator.circuito.estado
+        return data
+    
+    @staticmethod
+    def _backoff(intento):
+        """Full jitter: espera aleatoria entre 0 y base * 2^intento (con tope)."""
+        config = SatStatusValidator.CONFIG
+        tope = min(config['BACKOFF_MAX'], config['BACKOFF_BASE'] * (2 ** intento))
+        return random.uniform(0, tope)
+    
+    @staticmethod
+    def _consultar(uuid, rfc_emisor, rfc_receptor, total):
+        """
+        Un solo intento de consulta SOAP.
+        
+        Returns:
+            bytes: Cuerpo de la respuesta HTTP 200
+        
+        Raises:
+            SatTransientError: Timeout, error de conexión, cualquier otra falla de
+                requests (respuesta cortada, redirecciones) o HTTP 5xx/429
+            ValueError: Respuesta HTTP no reintentable (4xx)
+        """
+        # Construir el sobre SOAP
+        soap_envelope = f"""<?xml version="1.0" encoding="utf-8"?>
+<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/" 
+               xmlns:tem="http://tempuri.org/">
+    <soap:Header/>
+    <soap:Body>
+        <tem:Consulta>
+            <tem:expresionImpresa><![CDATA[?re={rfc_emisor}&rr={rfc_receptor}&tt={Decimal(total):.6f}&id={uuid}]]></tem:expresionImpresa>
+        </tem:Consulta>
+    </soap:Body>
+</soap:Envelope>"""
+        
+        # Headers SOAP
+        headers = {
+            'Content-Type': 'text/xml; charset=utf-8',
+            'SOAPAction': 'http://tempuri.org/IConsultaCFDIService/Consulta'
+        }
+        
+        config = SatStatusValidator.CONFIG
+        try:
+            response = requests.post(
+                SatStatusValidator.ENDPOINT,
+                data=soap_envelope.encode('utf-8'),
+                headers=headers,
+                timeout=(config['TIMEOUT_CONEXION'], config['TIMEOUT_LECTURA'])
+            )
+        except requests.Timeout:
+            raise SatTransientError('Timeout en conexión con SAT')
+        except requests.ConnectionError as e:
+            raise SatTransientError(f'Error de conexión con SAT: {e}')
+        except requests.RequestException as e:
+            # Respuesta cortada o ilegible (ChunkedEncodingError, ContentDecodingError, TooManyRedirects...)
+            raise SatTransientError(f'Error de comunicación con SAT: {e}')
+        
+        if response.status_code >= 500 or response.status_code == 429:
+            raise SatTransientError(f'Error HTTP {response.status_code}')
+        
+        # Verificar respuesta HTTP
+        if response.status_code != 200:
+            logger.error(f"Error HTTP {response.status_code}: {response.text}")
+            raise ValueError(f'Error HTTP {response.status_code}')
+        
+        return response.content
+    
+    @staticmethod
+    def _interpretar_respuesta(contenido, uuid):
+        """Convierte la respuesta SOAP del SAT en el dict de resultado."""
+        # Parsear respuesta XML
+        root = ET.fromstring(contenido)
+        
+        # Buscar el resultado
+        resultado = root.find('.//a:ConsultaResult', {
+            'a': 'http://tempuri.org/'
+        })
+        
+        if resultado is None:
+            # Intentar con namespace diferente
+            resultado = root.find('.//{http://tempuri.org/}ConsultaResult')
+        
+        if resultado is None:
+            logger.warning(f"No se encontró resultado en respuesta SAT para {uuid}")
+            return _resultado('No Encontrado', 'No se encontró el CFDI en el SAT')
+        
+        # Extraer campos
+        codigo_estatus = resultado.find('.//a:CodigoEstatus', {
+            'a': 'http://tempuri.org/'
+        })
+        
+        if codigo_estatus is None:
+            codigo_estatus = resultado.find('.//{http://tempuri.org/}CodigoEstatus')
+        
+        estado_texto = codigo_estatus.text if codigo_estatus is not None else 'Desconocido'
+        
+        # Mapear código a estado
+        estado_map = {
+            'S - Comprobante obtenido satisfactoriamente': 'Vigente',
+            'N - 601: La fecha de emisión no está dentro de la vigencia del CSD del Emisor': 'Vigente',
+            'N - 602: El CSD del Emisor ha sido revocado': 'Cancelado',
+            'N - 603: El certificado del Emisor no es de tipo CSD': 'Error',
+            'N - 604: El certificado del PAC no es de tipo CSD': 'Error',
+            'N - 605: No se pudo obtener el certificado del Emisor': 'Error',
+        }
+        
+        # Determinar estado
+        if 'Cancelado' in estado_texto or 'cancelado' in estado_texto.lower():
+            estado = 'Cancelado'
+        elif 'Vigente' in estado_texto or 'satisfactoriamente' in estado_texto:
+            estado = 'Vigente'
+        else:
+            estado = estado_map.get(estado_texto, 'No Encontrado')
+        
+        logger.info(f"UUID {uuid}: Estado SAT = {estado}")
+        
+        return _resultado(estado, estado_texto, estado_cancelacion=estado_texto)
+    
     @staticmethod
     def validar_cfdi(uuid, rfc_emisor, rfc_receptor, total):
         """
@@ -49,123 +329,62 @@ class SatStatusValidator:
                 'estado': 'Vigente' | 'Cancelado' | 'No Encontrado' | 'Error',
                 'es_cancelable': bool,
                 'estado_cancelacion': str,
-                'mensaje': str
+                'mensaje': str,
+                'transitorio': bool  # True si fue una falla del servicio, no del CFDI
             }
         """
-        try:
-            # Construir el sobre SOAP
-            soap_envelope = f"""<?xml version="1.0" encoding="utf-8"?>
-<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/" 
-               xmlns:tem="http://tempuri.org/">
-    <soap:Header/>
-    <soap:Body>
-        <tem:Consulta>
-            <tem:expresionImpresa><![CDATA[?re={rfc_emisor}&rr={rfc_receptor}&tt={total:.6f}&id={uuid}]]></tem:expresionImpresa>
-        </tem:Consulta>
-    </soap:Body>
-</soap:Envelope>"""
+        circuito = SatStatusValidator.circuito
+        metricas = SatStatusValidator._metricas
+        max_intentos = max(1, SatStatusValidator.CONFIG['MAX_INTENTOS'])
+        ultimo_error = ''
+        
+        for intento in range(max_intentos):
+            if not circuito.permitir():
+                metricas.registrar_rechazo()
+                logger.warning(f"Circuito SAT abierto, se omite consulta de {uuid}")
+                return _resultado(
+                    'Error', 'Servicio SAT no disponible temporalmente (circuito abierto)',
+                    transitorio=True
+                )
             
-            # Headers SOAP
-            headers = {
-                'Content-Type': 'text/xml; charset=utf-8',
-                'SOAPAction': 'http://tempuri.org/IConsultaCFDIService/Consulta'
-            }
+            if intento > 0:
+                metricas.registrar_reintento()
             
             # Hacer la petición
-            logger.info(f"Consultando SAT para UUID: {uuid}")
-            
-            response = requests.post(
-                SatStatusValidator.ENDPOINT,
-                data=soap_envelope.encode('utf-8'),
-                headers=headers,
-                timeout=30
-            )
-            
-            # Verificar respuesta HTTP
-            if response.status_code != 200:
-                logger.error(f"Error HTTP {response.status_code}: {response.text}")
-                return {
-                    'estado': 'Error',
-                    'es_cancelable': False,
-                    'estado_cancelacion': '',
-                    'mensaje': f'Error HTTP {response.status_code}'
-                }
-            
-            # Parsear respuesta XML
-            root = ET.fromstring(response.content)
-            
-            # Buscar el resultado
-            resultado = root.find('.//a:ConsultaResult', {
-                'a': 'http://tempuri.org/'
-            })
-            
-            if resultado is None:
-                # Intentar con namespace diferente
-                resultado = root.find('.//{http://tempuri.org/}ConsultaResult')
-            
-            if resultado is None:
-                logger.warning(f"No se encontró resultado en respuesta SAT para {uuid}")
-                return {
-                    'estado': 'No Encontrado',
-                    'es_cancelable': False,
-                    'estado_cancelacion': '',
-                    'mensaje': 'No se encontró el CFDI en el SAT'
-                }
-            
-            # Extraer campos
-            codigo_estatus = resultado.find('.//a:CodigoEstatus', {
-                'a': 'http://tempuri.org/'
-            })
-            
-            if codigo_estatus is None:
-                codigo_estatus = resultado.find('.//{http://tempuri.org/}CodigoEstatus')
+            logger.info(f"Consultando SAT para UUID: {uuid} (intento {intento + 1}/{max_intentos})")
+            inicio = time.monotonic()
+            try:
+                contenido = SatStatusValidator._consultar(uuid, rfc_emisor, rfc_receptor, total)
+            except SatTransientError as e:
+                metricas.registrar_intento(time.monotonic() - inicio, exito=False)
+                circuito.registrar_fallo()
+                ultimo_error = str(e)
+                logger.warning(f"Falla transitoria consultando SAT para {uuid}: {e}")
+                if intento + 1 < max_intentos:
+                    SatStatusValidator._sleep(SatStatusValidator._backoff(intento))
+                continue
+            except ValueError as e:
+                # El servicio respondió: no es una falla de disponibilidad
+                metricas.registrar_intento(time.monotonic() - inicio, exito=True)
+                circuito.registrar_exito()
+                return _resultado('Error', str(e))
+            except Exception as e:
+                # Falla inesperada: se reporta como 'Error' sin detener al que llama
+                metricas.registrar_intento(time.monotonic() - inicio, exito=False)
+                logger.error(f"Error consultando SAT para {uuid}: {e}", exc_info=True)
+                return _resultado('Error', f'Error: {str(e)}')
             
-            estado_texto = codigo_estatus.text if codigo_estatus is not None else 'Desconocido'
+            metricas.registrar_intento(time.monotonic() - inicio, exito=True)
+            circuito.registrar_exito()
             
-            # Mapear código a estado
-            estado_map = {
-                'S - Comprobante obtenido satisfactoriamente': 'Vigente',
-                'N - 601: La fecha de emisión no está dentro de la vigencia del CSD del Emisor': 'Vigente',
-                'N - 602: El CSD del Emisor ha sido revocado': 'Cancelado',
-                'N - 603: El certificado del Emisor no es de tipo CSD': 'Error',
-                'N - 604: El certificado del PAC no es de tipo CSD': 'Error',
-                'N - 605: No se pudo obtener el certificado del Emisor': 'Error',
-            }
-            
-            # Determinar estado
-            if 'Cancelado' in estado_texto or 'cancelado' in estado_texto.lower():
-                estado = 'Cancelado'
-            elif 'Vigente' in estado_texto or 'satisfactoriamente' in estado_texto:
-                estado = 'Vigente'
-            else:
-                estado = estado_map.get(estado_texto, 'No Encontrado')
-            
-            logger.info(f"UUID {uuid}: Estado SAT = {estado}")
-            
-            return {
-                'estado': estado,
-                'es_cancelable': estado == 'Vigente',
-                'estado_cancelacion': estado_texto,
-                'mensaje': estado_texto
-            }
+            try:
+                return SatStatusValidator._interpretar_respuesta(contenido, uuid)
+            except Exception as e:
+                logger.error(f"Error consultando SAT para {uuid}: {e}", exc_info=True)
+                return _resultado('Error', f'Error: {str(e)}')
         
-        except requests.Timeout:
-            logger.error(f"Timeout consultando SAT para {uuid}")
-            return {
-                'estado': 'Error',
-                'es_cancelable': False,
-                'estado_cancelacion': '',
-                'mensaje': 'Timeout en conexión con SAT'
-            }
-        
-        except Exception as e:
-            logger.error(f"Error consultando SAT para {uuid}: {e}", exc_info=True)
-            return {
-                'estado': 'Error',
-                'es_cancelable': False,
-                'estado_cancelacion': '',
-                'mensaje': f'Error: {str(e)}'
-            }
+        logger.error(f"SAT no respondió para {uuid} tras {max_intentos} intentos: {ultimo_error}")
+        return _resultado('Error', ultimo_error or 'Error de conexión con SAT', transitorio=True)
     
     @staticmethod
     def validar_factura_model(factura):
@@ -4,13 +4,23 @@ Crea automáticamente el catálogo de cuentas contables y plantillas de pólizas
 para una nueva empresa.
 
 IDEMPOTENTE: Puede ejecutarse múltiples veces sin duplicar datos.
+
+La siembra es por conjuntos (SeederMasivo): por empresa se consultan una vez
+las cuentas y plantillas existentes, las faltantes se insertan con bulk_create
+(los padres se resuelven en memoria, nivel por nivel) y, si hubo altas, se
+invalida el catálogo en memoria (bulk_create no dispara signals).
 """
 
+from django.db import IntegrityError, transaction
 from core.models import Empresa, CuentaContable, PlantillaPoliza
+from core.utils.procesos import repartir
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Filas por INSERT de bulk_create
+BATCH_SIZE = 500
+
 
 class EmpresaInitializer:
     """
@@ -53,7 +63,86 @@ class EmpresaInitializer:
         {'codigo': '6104', 'nombre': 'Arrendamientos', 'tipo': 'GASTO', 'naturaleza': 'D'},
         {'codigo': '6105', 'nombre': 'Servicios Profesionales', 'tipo': 'GASTO', 'naturaleza': 'D'},
     ]
-    
+
+    PLANTILLAS_BASE = [
+        # INGRESO (I) - Factura Emitida
+        {
+            'nombre': 'Ingreso - Factura Emitida',
+            'tipo_factura': 'I',
+            'cuenta_flujo_codigo': '1102',      # Clientes (Cargo)
+            'cuenta_provision_codigo': '4101',   # Ventas (Abono)
+            'cuenta_impuesto_codigo': '2201',    # IVA Trasladado (Abono)
+            'es_default': True,
+            'descripcion': 'Registro de venta a crédito con IVA trasladado'
+        },
+        
+        # EGRESO (E) - Gasto/Compra
+        {
+            'nombre': 'Egreso - Gasto General',
+            'tipo_factura': 'E',
+            'cuenta_flujo_codigo': '2101',       # Proveedores (Abono)
+            'cuenta_provision_codigo': '6101',   # Gastos de Operación (Cargo)
+            'cuenta_impuesto_codigo': '1201',    # IVA Acreditable (Cargo)
+            'es_default': True,
+            'descripcion': 'Registro de gasto a crédito con IVA acreditable'
+        },
+        
+        # EGRESO - Honorarios
+        {
+            'nombre': 'Egreso - Honorarios',
+            'tipo_factura': 'E',
+            'cuenta_flujo_codigo': '2102',       # Acreedores Diversos (Abono)
+            'cuenta_provision_codigo': '6103',   # Honorarios (Cargo)
+            'cuenta_impuesto_codigo': '1201',    # IVA Acreditable (Cargo)
+            'es_default': False,
+            'descripcion': 'Registro de honorarios profesionales'
+        },
+        
+        # EGRESO - Arrendamiento
+        {
+            'nombre': 'Egreso - Arrendamiento',
+            'tipo_factura': 'E',
+            'cuenta_flujo_codigo': '2101',       # Proveedores (Abono)
+            'cuenta_provision_codigo': '6104',   # Arrendamientos (Cargo)
+            'cuenta_impuesto_codigo': '1201',    # IVA Acreditable (Cargo)
+            'es_default': False,
+            'descripcion': 'Registro de renta de inmuebles'
+        },
+        
+        # PAGO (P) - Recepción de Pago
+        {
+            'nombre': 'Pago - Cobro a Cliente',
+            'tipo_factura': 'P',
+            'cuenta_flujo_codigo': '1101',       # Bancos (Cargo)
+            'cuenta_provision_codigo': '1102',   # Clientes (Abono)
+            'cuenta_impuesto_codigo': None,      # Sin IVA en pagos
+            'es_default': True,
+            'descripcion': 'Registro de cobro a cliente (REP)'
+        },
+        
+        # NÓMINA (N)
+        {
+            'nombre': 'Nómina - Pago de Sueldos',
+            'tipo_factura': 'N',
+            'cuenta_flujo_codigo': '1101',       # Bancos (Abono)
+            'cuenta_provision_codigo': '6102',   # Sueldos y Salarios (Cargo)
+            'cuenta_impuesto_codigo': '2203',    # ISR Retenido (Abono)
+            'es_default': True,
+            'descripcion': 'Registro de pago de nómina con retenciones'
+        },
+        
+        # TRASLADO (T) - Opcional
+        {
+            'nombre': 'Traslado - Movimiento Interno',
+            'tipo_factura': 'T',
+            'cuenta_flujo_codigo': '1103',       # Deudores Diversos (Cargo)
+            'cuenta_provision_codigo': '2102',   # Acreedores Diversos (Abono)
+            'cuenta_impuesto_codigo': None,      # Sin IVA
+            'es_default': True,
+            'descripcion': 'Registro de traslado entre almacenes/sucursales'
+        },
+    ]
+
     def __init__(self, empresa: Empresa):
         self.empresa = empresa
         self.cuentas_creadas = {}
@@ -64,156 +153,158 @@ class EmpresaInitializer:
         IDEMPOTENTE: No duplica si ya existe.
         """
         logger.info(f"🚀 Inicializando empresa: {self.empresa.nombre}")
-        
-        # 1. Crear Catálogo de Cuentas
-        self._crear_catalogo_cuentas()
-        
-        # 2. Crear Plantillas de Pólizas
-        self._crear_plantillas_polizas()
-        
-        logger.info(f"✅ Empresa {self.empresa.nombre} inicializada correctamente")
-    
-    def _crear_catalogo_cuentas(self):
-        """Crea el catálogo de cuentas contables base"""
-        logger.info("📊 Creando catálogo de cuentas...")
-        
-        for cuenta_data in self.CUENTAS_BASE:
-            cuenta, created = CuentaContable.objects.get_or_create(
-                empresa=self.empresa,
-                codigo=cuenta_data['codigo'],
-                defaults={
-                    'nombre': cuenta_data['nombre'],
-                    'tipo': cuenta_data['tipo'],
-                    'naturaleza': cuenta_data['naturaleza'],
-                    'es_deudora': (cuenta_data['naturaleza'] == 'D')
-                }
-            )
-            
-            # Guardar referencia para uso en plantillas
-            self.cuentas_creadas[cuenta_data['codigo']] = cuenta
-            
-            if created:
-                logger.info(f"   ✅ Creada: {cuenta.codigo} - {cuenta.nombre}")
-            else:
-                logger.debug(f"   ⏭️  Ya existe: {cuenta.codigo} - {cuenta.nombre}")
-        
-        logger.info(f"📊 Catálogo completo: {len(self.cuentas_creadas)} cuentas")
-    
-    def _crear_plantillas_polizas(self):
-        """Crea las plantillas de pólizas para todos los tipos de CFDI"""
-        logger.info("📋 Creando plantillas de pólizas...")
-        
-        plantillas = [
-            # INGRESO (I) - Factura Emitida
-            {
-                'nombre': 'Ingreso - Factura Emitida',
-                'tipo_factura': 'I',
-                'cuenta_flujo_codigo': '1102',      # Clientes (Cargo)
-                'cuenta_provision_codigo': '4101',   # Ventas (Abono)
-                'cuenta_impuesto_codigo': '2201',    # IVA Trasladado (Abono)
-                'es_default': True,
-                'descripcion': 'Registro de venta a crédito con IVA trasladado'
-            },
-            
-            # EGRESO (E) - Gasto/Compra
-            {
-                'nombre': 'Egreso - Gasto General',
-                'tipo_factura': 'E',
-                'cuenta_flujo_codigo': '2101',       # Proveedores (Abono)
-                'cuenta_provision_codigo': '6101',   # Gastos de Operación (Cargo)
-                'cuenta_impuesto_codigo': '1201',    # IVA Acreditable (Cargo)
-                'es_default': True,
-                'descripcion': 'Registro de gasto a crédito con IVA acreditable'
-            },
-            
-            # EGRESO - Honorarios
-            {
-                'nombre': 'Egreso - Honorarios',
-                'tipo_factura': 'E',
-                'cuenta_flujo_codigo': '2102',       # Acreedores Diversos (Abono)
-                'cuenta_provision_codigo': '6103',   # Honorarios (Cargo)
-                'cuenta_impuesto_codigo': '1201',    # IVA Acreditable (Cargo)
-                'es_default': False,
-                'descripcion': 'Registro de honorarios profesionales'
-            },
-            
-            # EGRESO - Arrendamiento
-            {
-                'nombre': 'Egreso - Arrendamiento',
-                'tipo_factura': 'E',
-                'cuenta_flujo_codigo': '2101',       # Proveedores (Abono)
-                'cuenta_provision_codigo': '6104',   # Arrendamientos (Cargo)
-                'cuenta_impuesto_codigo': '1201',    # IVA Acreditable (Cargo)
-                'es_default': False,
-                'descripcion': 'Registro de renta de inmuebles'
-            },
-            
-            # PAGO (P) - Recepción de Pago
-            {
-                'nombre': 'Pago - Cobro a Cliente',
-                'tipo_factura': 'P',
-                'cuenta_flujo_codigo': '1101',       # Bancos (Cargo)
-                'cuenta_provision_codigo': '1102',   # Clientes (Abono)
-                'cuenta_impuesto_codigo': None,      # Sin IVA en pagos
-                'es_default': True,
-                'descripcion': 'Registro de cobro a cliente (REP)'
-            },
-            
-            # NÓMINA (N)
-            {
-                'nombre': 'Nómina - Pago de Sueldos',
-                'tipo_factura': 'N',
-                'cuenta_flujo_codigo': '1101',       # Bancos (Abono)
-                'cuenta_provision_codigo': '6102',   # Sueldos y Salarios (Cargo)
-                'cuenta_impuesto_codigo': '2203',    # ISR Retenido (Abono)
-                'es_default': True,
-                'descripcion': 'Registro de pago de nómina con retenciones'
-            },
-            
-            # TRASLADO (T) - Opcional
-            {
-                'nombre': 'Traslado - Movimiento Interno',
-                'tipo_factura': 'T',
-                'cuenta_flujo_codigo': '1103',       # Deudores Diversos (Cargo)
-                'cuenta_provision_codigo': '2102',   # Acreedores Diversos (Abono)
-                'cuenta_impuesto_codigo': None,      # Sin IVA
-                'es_default': True,
-                'descripcion': 'Registro de traslado entre almacenes/sucursales'
-            },
-        ]
-        
-        for plantilla_data in plantillas:
-            # Obtener cuentas
-            cuenta_flujo = self.cuentas_creadas.get(plantilla_data['cuenta_flujo_codigo'])
-            cuenta_provision = self.cuentas_creadas.get(plantilla_data['cuenta_provision_codigo'])
-            cuenta_impuesto = None
-            if plantilla_data['cuenta_impuesto_codigo']:
-                cuenta_impuesto = self.cuentas_creadas.get(plantilla_data['cuenta_impuesto_codigo'])
-            
+        resultado = SeederMasivo(self.CUENTAS_BASE, self.PLANTILLAS_BASE).sembrar_empresa(self.empresa.id)
+        self.cuentas_creadas = resultado['cuentas_por_codigo']
+        logger.info(
+            f"✅ Empresa {self.empresa.nombre} inicializada correctamente "
+            f"({resultado['cuentas']} cuentas y {resultado['plantillas']} plantillas nuevas)"
+        )
+        return resultado
+
+
+def _por_nivel(cuentas):
+    """
+    Agrupa las definiciones por profundidad según su 'padre' (código opcional),
+    para que cada cuenta se inserte después de su padre.
+    """
+    por_codigo = {c['codigo']: c for c in cuentas}
+
+    def profundidad(cuenta, visitados=()):
+        padre = cuenta.get('padre')
+        if not padre or padre not in por_codigo or padre in visitados:
+            return 0
+        return 1 + profundidad(por_codigo[padre], visitados + (cuenta['codigo'],))
+
+    niveles = {}
+    for cuenta in cuentas:
+        niveles.setdefault(profundidad(cuenta), []).append(cuenta)
+    return [niveles[n] for n in sorted(niveles)]
+
+
+class SeederMasivo:
+    """
+    Uso:
+        seeder = SeederMasivo()                       # catálogo y plantillas base
+        for resultado in seeder.ejecutar(empresa_ids, workers=4):
+            ...
+
+    Las definiciones de cuenta son dicts con codigo, nombre y opcionalmente
+    tipo, naturaleza (o es_deudora), nivel, agrupador_sat y padre (código).
+    """
+
+    def __init__(self, cuentas=None, plantillas=None):
+        cuentas = list(EmpresaInitializer.CUENTAS_BASE if cuentas is None else cuentas)
+        self.niveles = _por_nivel(cuentas)
+        # Códigos a comparar: los del catálogo y los padres que ya deban existir
+        self.codigos = sorted({c['codigo'] for c in cuentas} | {c['padre'] for c in cuentas if c.get('padre')})
+        self.plantillas = EmpresaInitializer.PLANTILLAS_BASE if plantillas is None else plantillas
+
+    @staticmethod
+    def _cuenta(empresa_id, definicion, padre_id, profundidad):
+        naturaleza = definicion.get('naturaleza') or ('D' if definicion.get('es_deudora', True) else 'A')
+        return CuentaContable(
+            empresa_id=empresa_id,
+            codigo=definicion['codigo'],
+            nombre=definicion['nombre'],
+            tipo=definicion.get('tipo', 'ACTIVO'),
+            naturaleza=naturaleza,
+            es_deudora=(naturaleza == 'D'),
+            agrupador_sat=definicion.get('agrupador_sat'),
+            nivel=definicion.get('nivel', min(profundidad + 1, 3)),
+            padre_id=padre_id,
+        )
+
+    def _crear_cuentas(self, empresa_id):
+        """Inserta las cuentas faltantes. Retorna ({codigo: cuenta}, creadas)."""
+        cuentas = {
+            c.codigo: c for c in CuentaContable.objects.filter(empresa_id=empresa_id, codigo__in=self.codigos)
+        }
+        creadas = 0
+        for profundidad, nivel in enumerate(self.niveles):
+            nuevas = [
+                self._cuenta(empresa_id, d, getattr(cuentas.get(d.get('padre')), 'id', None), profundidad)
+                for d in nivel if d['codigo'] not in cuentas
+            ]
+            if not nuevas:
+                continue
+            CuentaContable.objects.bulk_create(nuevas, batch_size=BATCH_SIZE)
+            if any(c.pk is None for c in nuevas):
+                # Backends sin RETURNING: los ids se leen para resolver los hijos
+                nuevas = list(CuentaContable.objects.filter(
+                    empresa_id=empresa_id, codigo__in=[c.codigo for c in nuevas]
+                ))
+            cuentas.update({c.codigo: c for c in nuevas})
+            creadas += len(nuevas)
+        return cuentas, creadas
+
+    def _crear_plantillas(self, empresa_id, cuentas):
+        existentes = set(PlantillaPoliza.objects.filter(empresa_id=empresa_id).values_list('nombre', 'tipo_factura'))
+        nuevas = []
+        for plantilla_data in self.plantillas:
+            if (plantilla_data['nombre'], plantilla_data['tipo_factura']) in existentes:
+                continue
+            cuenta_flujo = cuentas.get(plantilla_data['cuenta_flujo_codigo'])
+            cuenta_provision = cuentas.get(plantilla_data['cuenta_provision_codigo'])
             if not cuenta_flujo or not cuenta_provision:
                 logger.warning(f"   ⚠️  Saltando plantilla {plantilla_data['nombre']}: cuentas no encontradas")
                 continue
-            
-            # Crear plantilla (idempotente)
-            plantilla, created = PlantillaPoliza.objects.get_or_create(
-                empresa=self.empresa,
+            nuevas.append(PlantillaPoliza(
+                empresa_id=empresa_id,
                 nombre=plantilla_data['nombre'],
                 tipo_factura=plantilla_data['tipo_factura'],
-                defaults={
-                    'cuenta_flujo': cuenta_flujo,
-                    'cuenta_provision': cuenta_provision,
-                    'cuenta_impuesto': cuenta_impuesto,
-                    'es_default': plantilla_data['es_default']
-                }
-            )
-            
-            if created:
-                logger.info(f"   ✅ Creada: {plantilla.nombre}")
-            else:
-                logger.debug(f"   ⏭️  Ya existe: {plantilla.nombre}")
-        
-        total_plantillas = PlantillaPoliza.objects.filter(empresa=self.empresa).count()
-        logger.info(f"📋 Plantillas completas: {total_plantillas}")
+                cuenta_flujo=cuenta_flujo,
+                cuenta_provision=cuenta_provision,
+                cuenta_impuesto=cuentas.get(plantilla_data['cuenta_impuesto_codigo'] or ''),
+                es_default=plantilla_data['es_default'],
+            ))
+        PlantillaPoliza.objects.bulk_create(nuevas, batch_size=BATCH_SIZE)
+        return len(nuevas)
+
+    def sembrar_empresa(self, empresa_id):
+        """
+        Siembra una empresa en una transacción (idempotente).
+
+        Returns:
+            dict: {'empresa_id', 'cuentas', 'plantillas', 'cuentas_por_codigo'}
+        """
+        from core.services.catalogo_cuentas import CatalogoCuentas
+
+        for intento in range(2):
+            try:
+                with transaction.atomic():
+                    cuentas, creadas = self._crear_cuentas(empresa_id)
+                    plantillas = self._crear_plantillas(empresa_id, cuentas)
+                    if creadas:
+                        CatalogoCuentas.invalidar(empresa_id)
+                break
+            except IntegrityError:
+                # Otro proceso sembró la misma empresa al mismo tiempo: se vuelve a comparar
+                if intento:
+                    raise
+        return {
+            'empresa_id': empresa_id, 'cuentas': creadas, 'plantillas': plantillas,
+            'cuentas_por_codigo': cuentas,
+        }
+
+    def ejecutar(self, empresa_ids, workers=1):
+        """
+        Siembra las empresas y produce el resultado de cada una al terminar
+        (sin 'cuentas_por_codigo'). Con workers > 1 se reparten entre procesos.
+        Un error en una empresa se reporta en 'error' y no detiene a las demás.
+        """
+        argumentos = [(empresa_id,) for empresa_id in empresa_ids]
+        for (empresa_id,), obtener in repartir(self.sembrar_empresa, argumentos, workers):
+            yield self._resumen(empresa_id, obtener)
+
+    @staticmethod
+    def _resumen(empresa_id, obtener):
+        try:
+            resultado = obtener()
+        except Exception as e:
+            logger.error(f"❌ Error sembrando empresa {empresa_id}: {e}", exc_info=True)
+            return {'empresa_id': empresa_id, 'cuentas': 0, 'plantillas': 0, 'error': str(e)}
+        resultado.pop('cuentas_por_codigo', None)
+        return resultado
 
 
 def inicializar_empresa(empresa: Empresa):
@@ -222,4 +313,4 @@ def inicializar_empresa(empresa: Empresa):
     Puede ser llamada manualmente o desde signals.
     """
     initializer = EmpresaInitializer(empresa)
-    initializer.inicializar()
+    return initializer.inicializar()
@@ -1,5 +1,6 @@
-from satcfdi.cfdi import CFDI
 from core.models import Factura, Concepto, Poliza, MovimientoPoliza, CuentaContable, Empresa
+from core.services.cfdi_fast_parser import extraer_cfdi, leer_bytes
+from core.services.dedup_xml import huella, buscar_duplicado, registrar_huella
 import logging
 logger = logging.getLogger(__name__)
 from decimal import Decimal
@@ -7,54 +8,7 @@ from django.core.files.base import ContentFile
 import uuid as uuid_lib
 from django.contrib import messages
 
-def _get_emisor(cfdi):
-    """Obtiene el nodo Emisor intentando atributo o dict."""
-    if hasattr(cfdi, 'emisor'): return cfdi.emisor
-    # CFDI 4.0/3.3 satcfdi dict access
-    try: return cfdi['Emisor']
-    except (KeyError, TypeError): raise ValueError("El XML no contiene nodo Emisor")
-
-def _get_receptor(cfdi):
-    """Obtiene el nodo Receptor intentando atributo o dict."""
-    if hasattr(cfdi, 'receptor'): return cfdi.receptor
-    try: return cfdi['Receptor']
-    except (KeyError, TypeError): raise ValueError("El XML no contiene nodo Receptor")
-
-def _get_fecha(cfdi):
-    """Obtiene la Fecha intentando atributo o dict."""
-    if hasattr(cfdi, 'fecha'): return cfdi.fecha
-    if hasattr(cfdi, 'Fecha'): return cfdi.Fecha
-    try: return cfdi['Fecha']
-    except (KeyError, TypeError): raise ValueError("El XML no contiene Fecha")
-
-def _get_tipo_comprobante(cfdi):
-    """Obtiene el TipoDeComprobante intentando atributo o dict y normaliza a código."""
-    val = None
-    if hasattr(cfdi, 'tipo_de_comprobante'): val = cfdi.tipo_de_comprobante
-    elif hasattr(cfdi, 'TipoDeComprobante'): val = cfdi.TipoDeComprobante
-    else:
-        try: val = cfdi['TipoDeComprobante']
-        except (KeyError, TypeError): raise ValueError("El XML no indica TipoDeComprobante")
-    
-    # Normalización agresiva
-    if not val: return 'I' # Default fallback? No, better error.
-    
-    val = str(val).upper().strip()
-    if val.startswith('I'): return 'I'
-    if val.startswith('E'): return 'E'
-    if val.startswith('T'): return 'T'
-    if val.startswith('N'): return 'N'
-    if val.startswith('P'): return 'P'
-    
-    return val # Return original if unknown (e.g. 'X')
-
-def _extract_val(node, attr, key):
-    """Helper para extraer valor de nodo (objeto o dict)."""
-    if hasattr(node, attr): return getattr(node, attr)
-    try: return node[key]
-    except (KeyError, TypeError, AttributeError): return None
-
-def procesar_xml_cfdi(archivo_xml, archivo_nombre, empresa):
+def procesar_xml_cfdi(archivo_xml, archivo_nombre, empresa, datos=None, sha256=None):
     """
     Procesa un archivo XML CFDI y crea/actualiza la factura en la base de datos.
     
@@ -69,6 +23,8 @@ def procesar_xml_cfdi(archivo_xml, archivo_nombre, empresa):
         archivo_xml: Archivo XML a procesar
         archivo_nombre: Nombre del archivo (para logging)
         empresa: Instancia de Empresa
+        datos: Resultado previo de extraer_cfdi (evita volver a leer el XML)
+        sha256: Huella del contenido cuando se pasa `datos` (para el índice de duplicados)
     
     Returns:
         tuple: (factura, created) - Factura creada/actualizada y booleano de creación
@@ -76,69 +32,33 @@ def procesar_xml_cfdi(archivo_xml, archivo_nombre, empresa):
     Raises:
         ValueError: Si el XML es inválido o no contiene datos requeridos
     """
-    try:
-        cfdi = CFDI.from_file(archivo_xml)
-    except Exception as e:
-        raise ValueError(f"XML inválido o no es CFDI legible: {str(e)}")
+    if datos is None:
+        # Duplicados por huella o UUID del timbre, antes de parsear
+        contenido = leer_bytes(archivo_xml)
+        sha256 = huella(contenido)
+        duplicado = buscar_duplicado(contenido, empresa, sha256=sha256)
+        if duplicado:
+            logger.info(f"ℹ️ El XML con UUID {duplicado['uuid']} ya fue procesado previamente ({duplicado['motivo']}).")
+            return None, False
+        datos = extraer_cfdi(contenido)
     
     # 1. Validar TipoDeComprobante
-    tipo_comprobante = _get_tipo_comprobante(cfdi)
+    tipo_comprobante = datos['tipo_comprobante']
+    if not tipo_comprobante:
+        raise ValueError("El XML no indica TipoDeComprobante")
     
-    # 1.5. Extraer UsoCFDI del SAT (para clasificación automática de gastos)
-    uso_cfdi = None
-    try:
-        # Intentar extraer UsoCFDI del nodo Receptor
-        receptor = _get_receptor(cfdi)
-        if hasattr(receptor, 'uso_cfdi'):
-            uso_cfdi = receptor.uso_cfdi
-        elif isinstance(receptor, dict) and 'UsoCFDI' in receptor:
-            uso_cfdi = receptor['UsoCFDI']
-        # Fallback: Buscar en raíz del CFDI
-        if not uso_cfdi:
-            uso_cfdi = cfdi.get('UsoCFDI', 'G03')  # Default G03
-    except Exception as e:
-        logger.warning(f"No se pudo extraer UsoCFDI: {e}. Usando G03 por defecto.")
-        uso_cfdi = 'G03'
+    # 1.5. UsoCFDI del SAT (para clasificación automática de gastos)
+    uso_cfdi = datos['receptor'].get('uso_cfdi') or 'G03'  # Default G03
     
     # VALIDACIÓN: Solo rechazar si NO es un tipo CFDI válido
     tipos_validos = ['I', 'E', 'P', 'N', 'T']
     if tipo_comprobante not in tipos_validos:
         raise ValueError(f"Tipo de comprobante '{tipo_comprobante}' no reconocido. Tipos válidos: {', '.join(tipos_validos)}")
     
-    # 2. Extraer Timbre Fiscal Digital de forma 100% segura
-    timbre = None
-    # Intento 1: Atributo .complemento (Objeto)
-    if hasattr(cfdi, 'complemento') and cfdi.complemento:
-        timbre = getattr(cfdi.complemento, 'timbre_fiscal_digital', None)
-    
-    # Intento 2: Dict access ['Complemento']
-    if not timbre:
-        try:
-            # Puede ser cfdi['Complemento']['TimbreFiscalDigital']
-            # Ojo: TimbreFiscalDigital puede ser objeto o dict dentro de Complemento
-            complemento = cfdi['Complemento']
-            # A veces satcfdi expone TimbreFiscalDigital directo o dentro de lista
-            # Asumimos estructura estándar satcfdi:
-            timbre = complemento.get('TimbreFiscalDigital')
-        except (KeyError, TypeError):
-            pass
-
-    if not timbre:
-        raise ValueError("El XML no contiene Timbre Fiscal Digital (UUID).")
-
-    # Extraer UUID string dependiendo de si timbre es objeto o dict
-    if isinstance(timbre, dict):
-        uuid_str = timbre.get('UUID')
-    else:
-        uuid_str = getattr(timbre, 'uuid', None)
-        
+    # 2. UUID del Timbre Fiscal Digital
+    uuid_str = datos['uuid']
     if not uuid_str:
-         raise ValueError("El Timbre Fiscal Digital no tiene UUID.")
-
-    # Validar si el UUID ya existe en la base de datos
-    uuid_str = cfdi.get('Complemento', {}).get('TimbreFiscalDigital', {}).get('UUID')
-    if not uuid_str:
-        raise ValueError("El XML no contiene UUID válido.")
+        raise ValueError("El XML no contiene Timbre Fiscal Digital (UUID).")
 
     factura_existente = Factura.objects.filter(uuid=uuid_str, empresa=empresa).exists()
     # Si el XML ya fue procesado, retornar indicador de duplicado
@@ -146,16 +66,21 @@ def procesar_xml_cfdi(archivo_xml, archivo_nombre, empresa):
         logger.info(f"ℹ️ El XML con UUID {uuid_str} ya fue procesado previamente.")
         return None, False
 
-    # 3. Obtener Nodos Principales usando helpers
-    emisor = _get_emisor(cfdi)
-    receptor = _get_receptor(cfdi)
-    fecha = _get_fecha(cfdi)
+    # 3. Nodos principales
+    emisor = datos['emisor']
+    receptor = datos['receptor']
+    if not emisor:
+        raise ValueError("El XML no contiene nodo Emisor")
+    if not receptor:
+        raise ValueError("El XML no contiene nodo Receptor")
+    fecha = datos['fecha']
+    if not fecha:
+        raise ValueError("El XML no contiene Fecha")
 
     # Identificar Naturaleza Contable (Ingreso vs Egreso vs Control)
     naturaleza = 'C' # Default Control/Excluido
-    emisor_rfc = _extract_val(emisor, 'rfc', 'Rfc')
-    receptor_rfc = _extract_val(receptor, 'rfc', 'Rfc')
-    empresa_rfc = empresa.rfc
+    emisor_rfc = emisor.get('rfc')
+    receptor_rfc = receptor.get('rfc')
     
     # REGLA DE ORO (OBLIGATORIA)
     # Prioridad absoluta a la detección de INGRESO vs EGRESO (Compra)
@@ -175,62 +100,27 @@ def procesar_xml_cfdi(archivo_xml, archivo_nombre, empresa):
     if tipo_comprobante in ['P', 'N', 'T']:
         naturaleza = 'C'
 
-    print(f"DEBUG XML: UUID={uuid_str} | Tipo={tipo_comprobante} | Emisor={emisor_rfc} | Receptor={receptor_rfc} | NatResultante={naturaleza}")
+    logger.debug(f"XML: UUID={uuid_str} | Tipo={tipo_comprobante} | Emisor={emisor_rfc} | Receptor={receptor_rfc} | NatResultante={naturaleza} | Parser={datos['parser']}")
 
     factura_data = {
-        'uuid': uuid_str, # Fix: Agregar UUID para evitar KeyError
+        'uuid': uuid_str,
         'fecha': fecha,
         'emisor_rfc': emisor_rfc,
-        'emisor_nombre': _extract_val(emisor, 'nombre', 'Nombre') or 'SIN NOMBRE',
+        'emisor_nombre': emisor.get('nombre') or 'SIN NOMBRE',
         'receptor_rfc': receptor_rfc,
-        'receptor_nombre': _extract_val(receptor, 'nombre', 'Nombre') or 'SIN NOMBRE',
-        'subtotal': Decimal(cfdi.get('SubTotal', 0)),
-        'descuento': Decimal(cfdi.get('Descuento', 0)),
-        'total': Decimal(cfdi.get('Total', 0)),
+        'receptor_nombre': receptor.get('nombre') or 'SIN NOMBRE',
+        'subtotal': datos['subtotal'],
+        'descuento': datos['descuento'],
+        'total': datos['total'],
         'tipo_comprobante': tipo_comprobante,
         'naturaleza': naturaleza,
         'estado_contable': 'PENDIENTE' if naturaleza in ['I', 'E'] else 'EXCLUIDA',
-        'uso_cfdi': uso_cfdi,  # ← NUEVO: UsoCFDI del SAT para clasificación automática
+        'uso_cfdi': uso_cfdi,  # UsoCFDI del SAT para clasificación automática
+        'total_impuestos_trasladados': datos['total_impuestos_trasladados'],
+        'total_impuestos_retenidos': datos['total_impuestos_retenidos'],
     }
-    # 5. Acceso BLINDADO a Impuestos con fallback a dict
-    # Intentamos obtener nodo impuestos
-    impuestos = None
-    if hasattr(cfdi, 'impuestos'): impuestos = cfdi.impuestos
-    if not impuestos:
-        try: impuestos = cfdi['Impuestos']
-        except: pass
-        
-    traslados_total = Decimal(0)
-    retenciones_total = Decimal(0)
-
-    if impuestos:
-        # Traslados
-        traslados = None
-        if hasattr(impuestos, 'traslados'): traslados = impuestos.traslados
-        if not traslados and isinstance(impuestos, dict): traslados = impuestos.get('Traslados')
-        
-        if traslados:
-             traslados_total = Decimal(_extract_val(traslados, 'total', 'TotalImpuestosTrasladados') or 0)
-             # A veces TotalImpuestosTrasladados está en raíz de Impuestos, no dentro de nodo Traslados en algunas versiones
-             if traslados_total == 0 and isinstance(impuestos, dict):
-                 traslados_total = Decimal(impuestos.get('TotalImpuestosTrasladados') or 0)
-             if traslados_total == 0 and hasattr(impuestos, 'total_impuestos_trasladados'):
-                 traslados_total = Decimal(impuestos.total_impuestos_trasladados or 0)
-
-        # Retenciones
-        retenciones = None
-        if hasattr(impuestos, 'retenciones'): retenciones = impuestos.retenciones
-        if not retenciones and isinstance(impuestos, dict): retenciones = impuestos.get('Retenciones')
-        
-        if retenciones:
-            retenciones_total = Decimal(_extract_val(retenciones, 'total', 'TotalImpuestosRetenidos') or 0)
-            if retenciones_total == 0 and isinstance(impuestos, dict):
-                 retenciones_total = Decimal(impuestos.get('TotalImpuestosRetenidos') or 0)
-
-    factura_data['total_impuestos_trasladados'] = traslados_total
-    factura_data['total_impuestos_retenidos'] = retenciones_total
     
-    # 6. Guardar Factura
+    # 4. Guardar Factura
     factura, created = Factura.objects.update_or_create(
         empresa=empresa,
         uuid=factura_data['uuid'],
@@ -241,66 +131,24 @@ def procesar_xml_cfdi(archivo_xml, archivo_nombre, empresa):
     # Si se necesita almacenar el XML físico, agregar campo FileField al modelo
     # Por ahora, solo procesamos y guardamos los datos parseados
     
+    if sha256:
+        registrar_huella(sha256, factura)
+    
     if not created:
         factura.conceptos.all().delete()
     
-    # 7. Procesar Conceptos
-    conceptos_list = []
-    if hasattr(cfdi, 'conceptos'): conceptos_list = cfdi.conceptos
-    elif isinstance(cfdi, dict) and 'Conceptos' in cfdi: conceptos_list = cfdi['Conceptos']
-    
-    # Unificar en lista si no lo es (satcfdi a veces devuelve objeto iterador o lista)
-    if not conceptos_list: conceptos_list = []
-
-    for concepto in conceptos_list:
-        # Extraer datos de concepto
-        c_clave = _extract_val(concepto, 'clave_prod_serv', 'ClaveProdServ')
-        c_cant = Decimal(_extract_val(concepto, 'cantidad', 'Cantidad') or 0)
-        c_desc = _extract_val(concepto, 'descripcion', 'Descripcion')
-        c_unit = Decimal(_extract_val(concepto, 'valor_unitario', 'ValorUnitario') or 0)
-        c_imp = Decimal(_extract_val(concepto, 'importe', 'Importe') or 0)
-        
-        # Impuestos Concepto
-        c_tras_total = Decimal(0)
-        c_impuestos = None
-        
-        if hasattr(concepto, 'impuestos'): c_impuestos = concepto.impuestos
-        elif isinstance(concepto, dict): c_impuestos = concepto.get('Impuestos')
-
-        if c_impuestos:
-            c_traslados = None
-            if hasattr(c_impuestos, 'traslados'): c_traslados = c_impuestos.traslados
-            elif isinstance(c_impuestos, dict): c_traslados = c_impuestos.get('Traslados')
-            
-            if c_traslados:
-                 # En concepto, traslados suele ser una lista de impuestos. Hay que sumar sus importes.
-                 # satcfdi puede dar objeto Traslados con propiedad 'traslado' que es lista
-                 # Simplificamos: intentar sacar total si existe precalculado (raro en concepto) o iterar
-                 # Asumimos 0 si es complejo, para no romper. 
-                 # O mejor: intentar leer el atributo 'Importe' del primer traslado si es lista
-                 pass 
-                 # NOTA: Para robustez extrema y cumplir "No asumir", dejamos en 0 si no es trivial
-                 # Mejor esfuerzo:
-                 try:
-                     # Si es lista directa
-                     if isinstance(c_traslados, list):
-                         for t in c_traslados:
-                             c_tras_total += Decimal(_extract_val(t, 'importe', 'Importe') or 0)
-                     # Si es objeto con lista
-                     elif hasattr(c_traslados, '__iter__'): 
-                          for t in c_traslados:
-                             c_tras_total += Decimal(_extract_val(t, 'importe', 'Importe') or 0)
-                 except:
-                     pass
-
-        Concepto.objects.create(
+    # 5. Conceptos (un solo INSERT)
+    Concepto.objects.bulk_create([
+        Concepto(
             factura=factura,
-            clave_prod_serv=c_clave,
-            cantidad=c_cant,
-            descripcion=c_desc,
-            valor_unitario=c_unit,
-            importe=c_imp
+            clave_prod_serv=c['clave_prod_serv'],
+            cantidad=c['cantidad'],
+            descripcion=c['descripcion'],
+            valor_unitario=c['valor_unitario'],
+            importe=c['importe']
         )
+        for c in datos['conceptos']
+    ])
     
     return factura, created
 
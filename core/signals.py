@@ -2,19 +2,11 @@
 Signals para automatizar la inicialización de empresas
 """
 
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from core.models import Empresa
-from core.services.seeder import inicializar_empresa
+from core.models import Empresa, UsuarioEmpresa, PlantillaPoliza, CuentaContable
 import logging
-from django.core.management import call_command
-import builtins
-import datetime
-import subprocess
-import sys
-from core.models import UsuarioEmpresa
-from django.db.models.signals import post_save
-from core.models import PlantillaPoliza, CuentaContable
 
 logger = logging.getLogger(__name__)
 
@@ -23,7 +15,9 @@ logger = logging.getLogger(__name__)
 def auto_inicializar_empresa(sender, instance, created, **kwargs):
     """
     Signal que se ejecuta automáticamente cuando se crea una nueva empresa.
-    Inicializa el catálogo de cuentas y plantillas de pólizas.
+    Encola la inicialización (catálogo de cuentas y plantillas), el rebuild
+    contable del año y la validación de XMLs como una tarea en segundo plano
+    (ver core/services/inicializacion_empresa.py); el guardado no espera.
     
     Args:
         sender: Modelo Empresa
@@ -31,33 +25,12 @@ def auto_inicializar_empresa(sender, instance, created, **kwargs):
         created: True si es una nueva empresa, False si es actualización
     """
     if created:
-        logger.info(f"🔔 Signal: Nueva empresa creada - {instance.nombre}")
-        try:
-            inicializar_empresa(instance)
-            logger.info(f"✅ Empresa {instance.nombre} inicializada automáticamente")
-        except Exception as e:
-            logger.error(f"❌ Error al inicializar empresa {instance.nombre}: {e}")
-            # No lanzamos la excepción para no bloquear la creación de la empresa
-            # El admin puede ejecutar la inicialización manualmente si falla
-        # Después de inicializar, intentar reconstruir contabilidad del año actual
-        try:
-            year = datetime.date.today().year
-            logger.info(f"🔁 Ejecutando rebuild contable para el año {year} (signal automático)")
-            # Evitar prompt de confirmación en el management command
-            saved_input = builtins.input
-            builtins.input = lambda prompt=None: 'REBUILD'
-            try:
-                call_command('rebuild_accounting_2025', year=year)
-            finally:
-                builtins.input = saved_input
-
-            # Ejecutar validación de XMLs (script externo)
-            script_path = os.path.join(getattr(settings, 'BASE_DIR', os.getcwd()), 'scripts', 'validate_xml_accounts.py')
-            if os.path.isfile(script_path):
-                logger.info('🔎 Ejecutando validación de XMLs (validate_xml_accounts.py)')
-                subprocess.run([sys.executable, script_path], check=False)
-        except Exception as e:
-            logger.error(f"❌ Error en post-inicialización automatizada: {e}")
+        from core.tasks import enqueue_inicializar_empresa
+        logger.info(f"🔔 Signal: Nueva empresa creada - {instance.nombre}, inicialización encolada")
+        # on_commit: el worker no debe ver la tarea antes que la empresa
+        transaction.on_commit(
+            lambda: enqueue_inicializar_empresa(instance.id, rebuild=True, validar_xml=True)
+        )
 
 
 # Cuando se crea un UsuarioEmpresa, asegurarse de que la empresa esté inicializada
@@ -66,23 +39,27 @@ def auto_on_usuario_empresa(sender, instance, created, **kwargs):
     if not created:
         return
     empresa = instance.empresa
-    # Si la empresa no tiene plantillas o pocas cuentas, inicializar
+    # Si la empresa no tiene plantillas o pocas cuentas, encolar la inicialización
     try:
         cuentas_count = CuentaContable.objects.filter(empresa=empresa).count()
         plantillas_count = PlantillaPoliza.objects.filter(empresa=empresa).count()
         if cuentas_count < 5 or plantillas_count == 0:
-            logger.info(f"🔔 UsuarioEmpresa creado — inicializando empresa {empresa.nombre} (cuentas: {cuentas_count}, plantillas: {plantillas_count})")
-            try:
-                inicializar_empresa(empresa)
-            except Exception as e:
-                logger.error(f"❌ Error inicializando empresa desde UsuarioEmpresa signal: {e}")
-        # Opcional: ejecutar rebuild en modo dry-run para verificar
-        year = datetime.date.today().year
-        saved_input = builtins.input
-        builtins.input = lambda prompt=None: 'REBUILD'
-        try:
-            call_command('rebuild_accounting_2025', year=year, dry_run=True)
-        finally:
-            builtins.input = saved_input
+            from core.tasks import enqueue_inicializar_empresa
+            logger.info(f"🔔 UsuarioEmpresa creado — encolando inicialización de {empresa.nombre} (cuentas: {cuentas_count}, plantillas: {plantillas_count})")
+            transaction.on_commit(lambda: enqueue_inicializar_empresa(empresa.id))
     except Exception as e:
         logger.error(f"❌ Error en signal UsuarioEmpresa: {e}")
+
+
+@receiver(post_save, sender=CuentaContable)
+@receiver(post_delete, sender=CuentaContable)
+def invalidar_catalogo_cuentas(sender, instance, created=False, **kwargs):
+    """
+    Incrementa la versión del catálogo en memoria de la empresa.
+    Las altas/bajas de subcuentas por RFC no afectan al catálogo (ver CatalogoCuentas).
+    """
+    from core.services.catalogo_cuentas import CatalogoCuentas
+    es_alta_o_baja = created or kwargs.get('signal') is post_delete
+    if instance.rfc_tercero and es_alta_o_baja:
+        return
+    CatalogoCuentas.invalidar(instance.empresa_id)
@@ -1,5 +1,8 @@
 from .models import BackgroundTask
+from django.db import IntegrityError, transaction
+from django.db.models import F
 from django.utils import timezone
+import datetime
 import json
 
 
@@ -17,6 +20,189 @@ def enqueue_contabilizar(factura_uuid, usuario_id=None):
     return task.id
 
 
+def enqueue_validar_sat(empresa_id, uuids, usuario_id=None, forzar=False, chunk_size=None):
+    """Crea una tarea en BD para validar en el SAT un conjunto de UUIDs por bloques."""
+    payload = {
+        'empresa_id': empresa_id,
+        'uuids': [str(u) for u in uuids],
+        'usuario_id': usuario_id,
+        'forzar': bool(forzar),
+        'chunk_size': chunk_size,
+        'procesados': 0,
+        'resumen': None,
+    }
+    task = BackgroundTask.objects.create(
+        task_type='validar_sat',
+        payload=payload,
+        status='PENDING'
+    )
+    return task.id
+
+
+def enqueue_contabilizar_lote(empresa_id, factura_uuids, usuario_id=None, origen_id=None):
+    """Crea una tarea en BD para contabilizar un lote de facturas recién cargadas."""
+    payload = {
+        'empresa_id': empresa_id,
+        'uuids': [str(u) for u in factura_uuids],
+        'usuario_id': usuario_id,
+        'origen_id': origen_id,
+        'procesados': 0,
+        'resumen': None,
+    }
+    task = BackgroundTask.objects.create(
+        task_type='contabilizar_lote',
+        payload=payload,
+        status='PENDING'
+    )
+    return task.id
+
+
+def enqueue_aplicar_cancelaciones(factura_ids):
+    """Crea una tarea en BD para descontabilizar facturas canceladas en el SAT."""
+    task = BackgroundTask.objects.create(
+        task_type='aplicar_cancelaciones',
+        payload={'factura_ids': list(factura_ids)},
+        status='PENDING'
+    )
+    return task.id
+
+
+def enqueue_unica(task_type, payload, dedup_key):
+    """
+    Crea una tarea solo si no hay otra activa (PENDING/IN_PROGRESS) con la misma
+    dedup_key; en ese caso retorna el id de la existente. La restricción única
+    parcial de BackgroundTask cubre la carrera entre dos procesos.
+    """
+    activa = BackgroundTask.objects.filter(
+        dedup_key=dedup_key, status__in=('PENDING', 'IN_PROGRESS')
+    ).values_list('id', flat=True).first()
+    if activa:
+        return activa
+    try:
+        with transaction.atomic():
+            task = BackgroundTask.objects.create(
+                task_type=task_type, payload=payload, status='PENDING', dedup_key=dedup_key
+            )
+        return task.id
+    except IntegrityError:
+        return BackgroundTask.objects.filter(
+            dedup_key=dedup_key, status__in=('PENDING', 'IN_PROGRESS')
+        ).values_list('id', flat=True).first()
+
+
+def enqueue_inicializar_empresa(empresa_id, rebuild=False, validar_xml=False):
+    """
+    Crea (o reutiliza) la tarea de inicialización de una empresa. Si ya hay una
+    pendiente, se le agregan los pasos solicitados que le falten.
+    """
+    from .services.inicializacion_empresa import PASOS, dedup_key
+
+    solicitados = {'inicializar', *(['rebuild'] if rebuild else []), *(['validar_xml'] if validar_xml else [])}
+    payload = {
+        'empresa_id': empresa_id,
+        'pasos': [p for p in PASOS if p in solicitados],
+        'anio': datetime.date.today().year,
+        'completados': [],
+        'resultados': {},
+    }
+    task_id = enqueue_unica('inicializar_empresa', payload, dedup_key(empresa_id))
+    with transaction.atomic():
+        task = BackgroundTask.objects.select_for_update().filter(pk=task_id, status='PENDING').first()
+        if task and not solicitados <= set(task.payload.get('pasos', [])):
+            pasos = solicitados | set(task.payload.get('pasos', []))
+            task.payload['pasos'] = [p for p in PASOS if p in pasos]
+            task.save(update_fields=['payload'])
+    return task_id
+
+
+def _ejecutar_contabilizar_factura(task):
+    from .services.accounting_service import AccountingService
+    payload = task.payload or {}
+    factura_uuid = payload.get('factura_uuid')
+    try:
+        AccountingService.contabilizar_factura(factura_uuid, usuario_id=payload.get('usuario_id'))
+    except ValueError as ve:
+        msg = str(ve or '').lower()
+        if 'ya está contabilizada' in msg or 'ya esta contabilizada' in msg or 'ya está contabilizado' in msg:
+            # Factura already processed — mark as completed and continue
+            return f'WARNING: Factura ya procesada, saltando (factura {factura_uuid})'
+        raise
+    return f'factura {factura_uuid}'
+
+
+def _ejecutar_validar_sat(task):
+    from .services.sat_lote import ValidacionSatLote
+    resumen = ValidacionSatLote.procesar_tarea(task)
+    return f"validar_sat {task.payload.get('procesados', 0)} UUIDs: {resumen}"
+
+
+def _ejecutar_contabilizar_lote(task):
+    from .services.contabilizacion_automatica import ContabilizacionAutomatica
+    resumen = ContabilizacionAutomatica.procesar_tarea(task)
+    return f"contabilizar_lote {task.payload.get('procesados', 0)} facturas: {resumen}"
+
+
+def _ejecutar_aplicar_cancelaciones(task):
+    from .services.sat_lote import ValidacionSatLote
+    factura_ids = (task.payload or {}).get('factura_ids', [])
+    excluidas = ValidacionSatLote.aplicar_cancelaciones(factura_ids)
+    return f'aplicar_cancelaciones {excluidas} facturas excluidas'
+
+
+def _ejecutar_ingestar_xml(task):
+    from .services.ingesta_xml import IngestaXML
+    resumen = IngestaXML.procesar_tarea(task)
+    return f"ingestar_xml {task.payload.get('total', 0)} archivos: {resumen}"
+
+
+def _ejecutar_inicializar_empresa(task):
+    from .services.inicializacion_empresa import InicializacionEmpresa
+    resultados = InicializacionEmpresa.procesar_tarea(task)
+    return f"inicializar_empresa {task.payload.get('empresa_id')}: {resultados}"
+
+
+TASK_HANDLERS = {
+    'contabilizar_factura': _ejecutar_contabilizar_factura,
+    'contabilizar_lote': _ejecutar_contabilizar_lote,
+    'validar_sat': _ejecutar_validar_sat,
+    'aplicar_cancelaciones': _ejecutar_aplicar_cancelaciones,
+    'ingestar_xml': _ejecutar_ingestar_xml,
+    'inicializar_empresa': _ejecutar_inicializar_empresa,
+}
+
+
+def ejecutar_tarea(task):
+    """
+    Ejecuta una tarea según su task_type. Retorna un mensaje para el log del worker.
+    Cualquier excepción debe tratarse como falla de la tarea.
+    """
+    handler = TASK_HANDLERS.get(task.task_type)
+    if handler is None:
+        raise ValueError(f"Unknown task_type: {task.task_type}")
+    return handler(task)
+
+
+def reclamar_siguiente():
+    """
+    Toma la tarea PENDING más antigua y la marca IN_PROGRESS.
+
+    El UPDATE condicionado a status='PENDING' hace que solo un worker gane la
+    tarea aunque el backend ignore select_for_update(skip_locked=True) (SQLite).
+    Si otro worker la ganó, se intenta con la siguiente.
+    """
+    for _ in range(10):
+        task = BackgroundTask.objects.filter(status='PENDING').order_by('created_at').first()
+        if task is None:
+            return None
+        reclamada = BackgroundTask.objects.filter(pk=task.pk, status='PENDING').update(
+            status='IN_PROGRESS', started_at=timezone.now(), attempts=F('attempts') + 1
+        )
+        if reclamada:
+            task.refresh_from_db()
+            return task
+    return None
+
+
 def mark_started(task):
     task.status = 'IN_PROGRESS'
     task.started_at = timezone.now()
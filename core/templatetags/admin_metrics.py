@@ -1,21 +1,46 @@
 from django import template
+from django.conf import settings
+from django.core.cache import cache
 from django.urls import reverse
 from django.utils import timezone
 from core.models import BackgroundTask
+from core.utils.consultas import rango_fechas
+from core.utils.paginacion import conteo_limitado
 
 register = template.Library()
 
+CLAVE_METRICAS = 'admin:background_task_metrics'
+
+
+def metricas_tareas():
+    """
+    Conteos del widget de tareas, guardados en caché ADMIN_METRICAS_CACHE_SEGUNDOS.
+    Cada conteo usa un índice (status, ...) y se detiene en ADMIN_METRICAS_LIMITE.
+    """
+    metricas = cache.get(CLAVE_METRICAS)
+    if metricas is None:
+        limite = settings.ADMIN_METRICAS_LIMITE
+        desde, hasta = rango_fechas(timezone.localdate(), timezone.localdate())
+        consultas = {
+            'pending': BackgroundTask.objects.filter(status='PENDING'),
+            'failed': BackgroundTask.objects.filter(status='FAILED'),
+            'completed_today': BackgroundTask.objects.filter(
+                status='COMPLETED', finished_at__gte=desde, finished_at__lt=hasta
+            ),
+        }
+        metricas = {}
+        for nombre, qs in consultas.items():
+            total, excede = conteo_limitado(qs, limite)
+            metricas[nombre] = f'{total}+' if excede else total
+        cache.set(CLAVE_METRICAS, metricas, settings.ADMIN_METRICAS_CACHE_SEGUNDOS)
+    return metricas
+
+
 @register.inclusion_tag('admin/_background_task_metrics.html', takes_context=True)
 def background_task_metrics(context):
-    today = timezone.now().date()
-    pending = BackgroundTask.objects.filter(status='PENDING').count()
-    failed = BackgroundTask.objects.filter(status='FAILED').count()
-    completed_today = BackgroundTask.objects.filter(status='COMPLETED', finished_at__date=today).count()
     failed_url = reverse('admin:core_backgroundtask_changelist') + '?status=FAILED'
     return {
-        'pending': pending,
-        'failed': failed,
-        'completed_today': completed_today,
+        **metricas_tareas(),
         'failed_url': failed_url,
         'user': context.get('user')
     }
@@ -0,0 +1,16 @@
+from django.test import TestCase
+from core.utils.planes_factura import consultas, desactivar_seqscan, problemas
+
+
+class PlanesFacturaTests(TestCase):
+    """Las consultas frecuentes sobre Factura deben resolverse con índice."""
+
+    def setUp(self):
+        # TestCase corre dentro de una transacción: SET LOCAL no afecta a otras pruebas
+        desactivar_seqscan(local=True)
+
+    def test_consultas_usan_indice(self):
+        for nombre, qs, ordenada in consultas(empresa_id=1):
+            with self.subTest(consulta=nombre):
+                plan = qs.explain()
+                self.assertEqual(problemas(plan, ordenada), [], f"{nombre}\n{plan}")
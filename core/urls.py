@@ -21,6 +21,8 @@ urlpatterns = [
     path('switch-empresa/<int:empresa_id>/', views.switch_empresa, name='switch_empresa'),
     path('upload/', views.upload_xml, name='upload_xml'),
     path('carga-masiva-xml/', views.carga_masiva_xml, name='carga_masiva_xml'),
+    path('ingesta/<int:task_id>/', views.resultado_ingesta, name='resultado_ingesta'),
+    path('ingesta/<int:task_id>/progreso/', views.progreso_ingesta, name='progreso_ingesta'),
     path('factura/<uuid:pk>/', views.detalle_factura, name='factura_detail'),
     path('factura/<uuid:pk>/xml/', views.descargar_xml, name='descargar_xml'),
     path('factura/<uuid:pk>/pdf/', views.ver_pdf, name='ver_pdf'),
@@ -40,6 +42,7 @@ urlpatterns = [
     
     path('contabilizar-lote/', contabilizar_lote, name='contabilizar_lote'),  # Bulk contabilization
     path('validar-sat-lote/', views.validar_sat_lote, name='validar_sat_lote'),  # SAT validation
+    path('validar-sat-lote/progreso/<int:task_id>/', views.progreso_validacion_sat, name='progreso_validacion_sat'),
     
     # Reportes
     path('reportes/balanza/', reporte_balanza, name='reporte_balanza'),
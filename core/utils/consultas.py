@@ -0,0 +1,44 @@
+"""
+Iteración de consultas grandes (exportaciones y reportes) y filtros por fecha
+que aprovechan los índices.
+
+En PostgreSQL QuerySet.iterator() abre un cursor del lado del servidor y trae
+las filas en bloques de DB_ITERATOR_CHUNK_SIZE, así que la memoria no crece
+con el tamaño de la exportación. Con DISABLE_SERVER_SIDE_CURSORS (PgBouncer en
+modo transacción) o en SQLite se recorre el queryset normal.
+"""
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+import datetime
+
+
+def iterar(qs, chunk_size=None):
+    """Recorre el queryset por bloques con cursor del servidor cuando el backend lo permite."""
+    conexion = connections[qs.db]
+    if conexion.vendor != 'postgresql' or conexion.settings_dict.get('DISABLE_SERVER_SIDE_CURSORS'):
+        return qs
+    return qs.iterator(chunk_size=chunk_size or settings.DB_ITERATOR_CHUNK_SIZE)
+
+
+def rango_fechas(fecha_inicio, fecha_fin):
+    """
+    Límites [desde, hasta) en hora local para filtrar un DateTimeField por días
+    completos: filter(fecha__gte=desde, fecha__lt=hasta).
+
+    A diferencia de fecha__date__gte/lte o fecha__month (que aplican una función
+    a la columna), la comparación directa permite usar los índices (empresa, ..., fecha).
+    """
+    desde = datetime.datetime.combine(fecha_inicio, datetime.time.min)
+    hasta = datetime.datetime.combine(fecha_fin + datetime.timedelta(days=1), datetime.time.min)
+    if settings.USE_TZ:
+        desde, hasta = timezone.make_aware(desde), timezone.make_aware(hasta)
+    return desde, hasta
+
+
+def rango_mes(anio, mes):
+    """Límites [desde, hasta) del mes en hora local (ver rango_fechas)."""
+    inicio = datetime.date(anio, mes, 1)
+    siguiente = datetime.date(anio + mes // 12, mes % 12 + 1, 1)
+    return rango_fechas(inicio, siguiente - datetime.timedelta(days=1))
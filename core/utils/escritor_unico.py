@@ -0,0 +1,64 @@
+"""
+Escritor Único para SQLite
+
+SQLite admite un solo escritor a la vez. Los workers de tareas ejecutan cada
+tarea dentro de escritor_unico(), un candado de archivo entre procesos
+(settings.SQLITE_WRITER_LOCK), así que las escrituras de fondo se forman en
+una sola fila en lugar de competir por el candado de la base y agotar el
+busy_timeout. Con WAL las lecturas (reportes, dashboard) no esperan al escritor.
+
+En PostgreSQL no hace nada: ahí los workers escriben en paralelo.
+"""
+
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import connections
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Serializa también los hilos de un mismo proceso (flock es por descriptor)
+_candado_proceso = threading.Lock()
+
+
+def _bloquear(archivo):
+    if fcntl is not None:
+        fcntl.flock(archivo.fileno(), fcntl.LOCK_EX)
+        return
+    while True:
+        try:
+            msvcrt.locking(archivo.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            # LK_LOCK reintenta ~10s y se rinde; se sigue esperando
+            time.sleep(0.1)
+
+
+def _liberar(archivo):
+    if fcntl is not None:
+        fcntl.flock(archivo.fileno(), fcntl.LOCK_UN)
+    else:
+        archivo.seek(0)
+        msvcrt.locking(archivo.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def escritor_unico(alias='default'):
+    """Bloque de escritura de fondo; en SQLite espera a que ningún otro worker esté escribiendo."""
+    if connections[alias].vendor != 'sqlite':
+        yield
+        return
+    ruta = settings.SQLITE_WRITER_LOCK
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with _candado_proceso, open(ruta, 'a+b') as archivo:
+        _bloquear(archivo)
+        try:
+            yield
+        finally:
+            _liberar(archivo)
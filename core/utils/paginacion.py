@@ -0,0 +1,246 @@
+"""
+Paginación por cursor (keyset) y conteos aproximados para listados grandes.
+
+La paginación con OFFSET lee y descarta todas las filas anteriores a la
+página, así que la página 500 cuesta 500 veces la página 1. Aquí cada página
+continúa desde la última fila mostrada: WHERE (fecha, id) > (cursor) ORDER BY
+fecha, id LIMIT n, que con el índice (empresa, ..., fecha) cuesta lo mismo en
+cualquier página. El cursor viaja en la URL (?despues=... / ?antes=...); no hay
+saltos a una página arbitraria.
+
+El total del listado tampoco se cuenta completo en cada petición: por debajo
+de CONTEO_EXACTO_HASTA filas se cuenta exacto; por encima se usa la
+estimación del planificador de PostgreSQL o, en SQLite, el último conteo
+guardado en caché por CONTEO_CACHE_SEGUNDOS. PaginadorConteoAproximado aplica
+el mismo conteo a la paginación por números (admin ordenado por columna) y
+conteo_limitado cuenta solo hasta un tope (widgets que muestran "10000+").
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+import base64
+import hashlib
+import json
+
+PARAM_DESPUES = 'despues'
+PARAM_ANTES = 'antes'
+
+
+def _clave_conteo(qs):
+    sql, params = qs.query.sql_with_params()
+    firma = f'{qs.db}|{sql}|{params!r}'
+    return 'conteo:' + hashlib.sha1(firma.encode()).hexdigest()
+
+
+def _estimacion_postgres(qs):
+    """Filas estimadas por el planificador (EXPLAIN), sin ejecutar la consulta."""
+    sql, params = qs.query.sql_with_params()
+    with connections[qs.db].cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def conteo_aproximado(qs):
+    """
+    Total de filas del queryset sin recorrerlo completo cuando es grande.
+
+    Returns:
+        tuple: (total, aproximado) con aproximado=True si no es un conteo exacto al momento
+    """
+    qs = qs.order_by().select_related(None)
+    try:
+        clave = _clave_conteo(qs)
+    except EmptyResultSet:
+        return 0, False
+
+    guardado = cache.get(clave)
+    if guardado is not None:
+        return guardado, True
+
+    if connections[qs.db].vendor == 'postgresql':
+        estimado = _estimacion_postgres(qs)
+        if estimado > settings.CONTEO_EXACTO_HASTA:
+            cache.set(clave, estimado, settings.CONTEO_CACHE_SEGUNDOS)
+            return estimado, True
+
+    total = qs.count()
+    if total > settings.CONTEO_EXACTO_HASTA:
+        cache.set(clave, total, settings.CONTEO_CACHE_SEGUNDOS)
+    return total, False
+
+
+def conteo_limitado(qs, limite):
+    """
+    Cuenta a lo más 'limite' filas (COUNT sobre una subconsulta con LIMIT).
+
+    Returns:
+        tuple: (total, excede) con excede=True si hay más de 'limite' filas
+    """
+    total = qs.order_by()[:limite + 1].count()
+    return min(total, limite), total > limite
+
+
+class PaginadorConteoAproximado(Paginator):
+    """Paginator de Django con el total de conteo_aproximado."""
+
+    @cached_property
+    def _conteo(self):
+        return conteo_aproximado(self.object_list)
+
+    @cached_property
+    def count(self):
+        return self._conteo[0]
+
+    @property
+    def aproximado(self):
+        return self._conteo[1]
+
+
+def codificar_cursor(valores):
+    texto = json.dumps([v.isoformat() if hasattr(v, 'isoformat') else v for v in valores])
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(modelo, campos, cursor):
+    """Valores del cursor convertidos al tipo de cada campo, o None si no es válido."""
+    if not cursor:
+        return None
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if len(valores) != len(campos):
+            return None
+        return [modelo._meta.get_field(campo).to_python(valor) for campo, valor in zip(campos, valores)]
+    except Exception:
+        return None
+
+
+def _posteriores(campos, valores):
+    """
+    Filas con (campo1, campo2) > valores en el orden ascendente.
+    Se escribe como campo1 >= v1 AND (campo1 > v1 OR campo2 > v2) para que el
+    índice pueda empezar el recorrido en v1.
+    """
+    (primero, segundo), (v1, v2) = campos, valores
+    return Q(**{f'{primero}__gte': v1}) & (Q(**{f'{primero}__gt': v1}) | Q(**{f'{segundo}__gt': v2}))
+
+
+def _anteriores(campos, valores):
+    (primero, segundo), (v1, v2) = campos, valores
+    return Q(**{f'{primero}__lte': v1}) & (Q(**{f'{primero}__lt': v1}) | Q(**{f'{segundo}__lt': v2}))
+
+
+class PaginaKeyset:
+    """Página de resultados con la interfaz de django.core.paginator.Page que usan las plantillas."""
+
+    def __init__(self, object_list, paginator, hay_siguiente, hay_anterior):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._hay_siguiente = hay_siguiente
+        self._hay_anterior = hay_anterior
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, indice):
+        return self.object_list[indice]
+
+    def has_next(self):
+        return self._hay_siguiente
+
+    def has_previous(self):
+        return self._hay_anterior
+
+    def has_other_pages(self):
+        return self._hay_siguiente or self._hay_anterior
+
+    def _cursor(self, fila):
+        return codificar_cursor([getattr(fila, campo) for campo in self.paginator.campos])
+
+    @property
+    def cursor_siguiente(self):
+        return self._cursor(self.object_list[-1]) if self._hay_siguiente and self.object_list else None
+
+    @property
+    def cursor_anterior(self):
+        return self._cursor(self.object_list[0]) if self._hay_anterior and self.object_list else None
+
+
+class PaginadorKeyset:
+    """
+    Uso:
+        paginador = PaginadorKeyset(qs, 20, campos=('fecha', 'id'), descendente=True)
+        pagina = paginador.pagina(despues=request.GET.get('despues'), antes=request.GET.get('antes'))
+        pagina.cursor_siguiente, paginador.count, paginador.aproximado
+    """
+
+    def __init__(self, queryset, por_pagina, campos=('fecha', 'id'), descendente=False):
+        self.queryset = queryset
+        self.por_pagina = int(por_pagina)
+        self.campos = tuple(campos)
+        self.descendente = descendente
+
+    @cached_property
+    def _conteo(self):
+        return conteo_aproximado(self.queryset)
+
+    @property
+    def count(self):
+        return self._conteo[0]
+
+    @property
+    def aproximado(self):
+        return self._conteo[1]
+
+    def _orden(self, invertido):
+        descendente = self.descendente != invertido
+        return [f'-{campo}' if descendente else campo for campo in self.campos]
+
+    def pagina(self, despues=None, antes=None):
+        modelo = self.queryset.model
+        valores_despues = decodificar_cursor(modelo, self.campos, despues)
+        valores_antes = None if valores_despues else decodificar_cursor(modelo, self.campos, antes)
+
+        qs = self.queryset
+        if valores_antes:
+            # Página anterior: se lee hacia atrás desde el cursor y se invierte
+            condicion = _posteriores if self.descendente else _anteriores
+            filas = list(qs.filter(condicion(self.campos, valores_antes))
+                         .order_by(*self._orden(True))[:self.por_pagina + 1])
+            hay_anterior = len(filas) > self.por_pagina
+            filas = filas[:self.por_pagina][::-1]
+            return PaginaKeyset(filas, self, hay_siguiente=True, hay_anterior=hay_anterior)
+
+        if valores_despues:
+            condicion = _anteriores if self.descendente else _posteriores
+            qs = qs.filter(condicion(self.campos, valores_despues))
+        filas = list(qs.order_by(*self._orden(False))[:self.por_pagina + 1])
+        hay_siguiente = len(filas) > self.por_pagina
+        return PaginaKeyset(filas[:self.por_pagina], self, hay_siguiente=hay_siguiente,
+                            hay_anterior=bool(valores_despues))
+
+
+class KeysetPaginationMixin:
+    """
+    Paginación por cursor para ListView: sustituye paginate_queryset y deja en
+    el contexto paginator (PaginadorKeyset), page_obj (PaginaKeyset) e is_paginated.
+    """
+    orden_keyset = ('fecha', 'id')
+    keyset_descendente = False
+
+    def paginate_queryset(self, queryset, page_size):
+        paginador = PaginadorKeyset(queryset, page_size, self.orden_keyset, self.keyset_descendente)
+        pagina = paginador.pagina(
+            despues=self.request.GET.get(PARAM_DESPUES), antes=self.request.GET.get(PARAM_ANTES)
+        )
+        return paginador, pagina, pagina.object_list, pagina.has_other_pages()
@@ -0,0 +1,183 @@
+"""
+Particiones por Ejercicio (PostgreSQL)
+
+MovimientoPoliza se particiona por rango sobre 'ejercicio' (año de la póliza):
+una tabla <tabla>_<año> por ejercicio y <tabla>_default para cualquier año
+sin partición, así que un INSERT nunca falla por falta de partición.
+
+- convertir_a_particionada: migración 0025; reescribe la tabla existente.
+- asegurar_particiones: crea las particiones faltantes (post_migrate crea el
+  año en curso y los siguientes). Si la partición default ya tiene filas de
+  ese año, se mueven a la nueva partición antes de adjuntarla.
+- desprender_particion: DETACH de un año para archivarlo (pg_dump / DROP);
+  la tabla queda como tabla independiente.
+
+Fuera de PostgreSQL todas las funciones son no-op. Este módulo no importa
+modelos: la migración lo usa con el modelo histórico.
+"""
+
+from django.utils import timezone
+import logging
+
+logger = logging.getLogger(__name__)
+
+LLAVE = 'ejercicio'
+# Ejercicios futuros que se preparan en cada migrate
+ANIOS_ADELANTE = 2
+
+
+def _q(connection, nombre):
+    return connection.ops.quote_name(nombre)
+
+
+def nombre_particion(tabla, anio):
+    return f'{tabla}_{anio}'
+
+
+def es_particionada(connection, tabla):
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [tabla],
+        )
+        return cursor.fetchone() is not None
+
+
+def listar_particiones(connection, tabla):
+    """
+    Returns:
+        list: [(nombre, limites, filas_estimadas)] de las particiones adjuntas
+    """
+    if not es_particionada(connection, tabla):
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT hijo.relname, pg_get_expr(hijo.relpartbound, hijo.oid), hijo.reltuples::bigint "
+            "FROM pg_inherits i "
+            "JOIN pg_class padre ON padre.oid = i.inhparent "
+            "JOIN pg_class hijo ON hijo.oid = i.inhrelid "
+            "WHERE padre.relname = %s AND pg_table_is_visible(padre.oid) ORDER BY hijo.relname",
+            [tabla],
+        )
+        return cursor.fetchall()
+
+
+def _crear_particion(connection, tabla, anio):
+    """Crea la partición del año moviendo las filas que hubiera en la default."""
+    particion = nombre_particion(tabla, anio)
+    default = nombre_particion(tabla, 'default')
+    q = lambda nombre: _q(connection, nombre)
+    with connection.cursor() as cursor:
+        cursor.execute(f"CREATE TABLE {q(particion)} (LIKE {q(tabla)} INCLUDING DEFAULTS)")
+        cursor.execute(
+            f"WITH movidas AS (DELETE FROM {q(default)} WHERE {q(LLAVE)} = %s RETURNING *) "
+            f"INSERT INTO {q(particion)} SELECT * FROM movidas",
+            [anio],
+        )
+        movidas = cursor.rowcount
+        cursor.execute(
+            f"ALTER TABLE {q(tabla)} ATTACH PARTITION {q(particion)} FOR VALUES FROM (%s) TO (%s)",
+            [anio, anio + 1],
+        )
+    logger.info(f"🗂️ Partición {particion} creada ({movidas} filas movidas desde default)")
+
+
+def asegurar_particiones(connection, tabla, anios=None, adelante=ANIOS_ADELANTE):
+    """
+    Crea las particiones faltantes de los años dados (por defecto: el año en
+    curso y 'adelante' años más, más los años que tengan filas en la default).
+
+    Returns:
+        list: años cuyas particiones se crearon
+    """
+    if not es_particionada(connection, tabla):
+        return []
+    from django.db import transaction
+
+    existentes = {nombre for nombre, _, _ in listar_particiones(connection, tabla)}
+    if anios is None:
+        actual = timezone.localdate().year
+        anios = set(range(actual, actual + adelante + 1))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT DISTINCT {_q(connection, LLAVE)} FROM {_q(connection, nombre_particion(tabla, 'default'))}"
+            )
+            anios |= {fila[0] for fila in cursor.fetchall()}
+
+    creados = []
+    for anio in sorted(set(anios)):
+        if nombre_particion(tabla, anio) in existentes:
+            continue
+        with transaction.atomic(using=connection.alias):
+            _crear_particion(connection, tabla, anio)
+        creados.append(anio)
+    return creados
+
+
+def desprender_particion(connection, tabla, anio, concurrente=False):
+    """
+    Separa la partición del año de la tabla (queda como tabla independiente
+    para archivarla). Con concurrente=True usa DETACH ... CONCURRENTLY
+    (PostgreSQL 14+, no bloquea lecturas/escrituras; no puede ir en una transacción).
+    """
+    if not es_particionada(connection, tabla):
+        raise ValueError(f"{tabla} no está particionada")
+    particion = nombre_particion(tabla, anio)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"ALTER TABLE {_q(connection, tabla)} DETACH PARTITION {_q(connection, particion)}"
+            f"{' CONCURRENTLY' if concurrente else ''}"
+        )
+    logger.info(f"📦 Partición {particion} desprendida de {tabla}")
+    return particion
+
+
+def convertir_a_particionada(schema_editor, modelo, adelante=ANIOS_ADELANTE):
+    """
+    Reescribe la tabla del modelo como tabla particionada por ejercicio:
+    copia las filas, recrea la llave primaria (id, ejercicio), las llaves
+    foráneas y los índices con los nombres que Django espera.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql' or es_particionada(connection, modelo._meta.db_table):
+        return
+    tabla = modelo._meta.db_table
+    legado = f'{tabla}_legado'
+    q = lambda nombre: _q(connection, nombre)
+
+    schema_editor.execute(f"ALTER TABLE {q(tabla)} RENAME TO {q(legado)}")
+    schema_editor.execute(
+        f"CREATE TABLE {q(tabla)} (LIKE {q(legado)} INCLUDING DEFAULTS INCLUDING IDENTITY) "
+        f"PARTITION BY RANGE ({q(LLAVE)})"
+    )
+    schema_editor.execute(
+        f"CREATE TABLE {q(nombre_particion(tabla, 'default'))} PARTITION OF {q(tabla)} DEFAULT"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT DISTINCT {q(LLAVE)} FROM {q(legado)}")
+        anios = {fila[0] for fila in cursor.fetchall()}
+    actual = timezone.localdate().year
+    for anio in sorted(anios | set(range(actual, actual + adelante + 1))):
+        schema_editor.execute(
+            f"CREATE TABLE {q(nombre_particion(tabla, anio))} PARTITION OF {q(tabla)} "
+            f"FOR VALUES FROM ({int(anio)}) TO ({int(anio) + 1})"
+        )
+
+    schema_editor.execute(f"INSERT INTO {q(tabla)} SELECT * FROM {q(legado)}")
+    schema_editor.execute(f"DROP TABLE {q(legado)}")
+    schema_editor.execute(
+        f"SELECT setval(pg_get_serial_sequence('{tabla}', 'id'), COALESCE((SELECT MAX(id) FROM {q(tabla)}), 1))"
+    )
+
+    # La llave primaria de una tabla particionada debe incluir la llave de partición
+    schema_editor.execute(f"ALTER TABLE {q(tabla)} ADD CONSTRAINT {q(tabla + '_pkey')} PRIMARY KEY (id, {q(LLAVE)})")
+    for campo in modelo._meta.local_fields:
+        if campo.remote_field and campo.db_constraint:
+            schema_editor.execute(schema_editor._create_fk_sql(modelo, campo, '_fk_%(to_table)s_%(to_column)s'))
+        if campo.remote_field and campo.db_index:
+            schema_editor.execute(schema_editor._create_index_sql(modelo, fields=[campo]))
+    for indice in modelo._meta.indexes:
+        schema_editor.add_index(modelo, indice)
@@ -0,0 +1,74 @@
+"""
+Planes de ejecución de las consultas frecuentes sobre Factura.
+
+consultas() construye cada consulta igual que la vista o el comando que la
+ejecuta (dashboard, bandeja, exportación a Excel, admin, reconstrucción,
+auditoría de gemelos) y problemas() revisa su EXPLAIN:
+- SQLite: 'SCAN core_factura' sin índice, o un ordenamiento en B-tree
+  temporal en consultas que deben salir ordenadas del índice.
+- PostgreSQL: 'Seq Scan on core_factura' o un Sort en las consultas
+  ordenadas. Con pocas filas el planificador prefiere el Seq Scan aunque
+  exista índice, así que quien revise el plan debe desactivar enable_seqscan
+  (ver desactivar_seqscan).
+
+Lo usan core.tests.test_planes_factura y scripts/verificar_planes_factura.py.
+"""
+
+from django.db import connection
+from django.db.models import Q, Sum
+from core.models import Factura
+from core.services.reconstruccion_contable import NATURALEZAS, facturas_particion
+from core.utils.consultas import rango_fechas
+import datetime
+import re
+
+
+def consultas(empresa_id):
+    """[(nombre, queryset, debe_salir_ordenada)] tal como las arman las vistas y comandos."""
+    hoy = datetime.date.today()
+    desde, hasta = rango_fechas(hoy.replace(day=1), hoy)
+    periodo = Factura.objects.filter(empresa_id=empresa_id, fecha__gte=desde, fecha__lt=hasta)
+    return [
+        ('DashboardView: listado del periodo',
+         periodo.select_related('empresa').order_by('-fecha', '-id'), True),
+        ('DashboardView: página siguiente (cursor)',
+         periodo.filter(Q(fecha__lte=hasta) & (Q(fecha__lt=hasta) | Q(id__lt=0))).order_by('-fecha', '-id'), True),
+        ('DashboardView: total de ingresos',
+         periodo.filter(naturaleza='I').values('empresa_id').annotate(total=Sum('total')).order_by(), False),
+        ('BandejaContabilizacionView: pendientes',
+         Factura.objects.filter(empresa_id=empresa_id, estado_contable='PENDIENTE').order_by('fecha', 'id'), True),
+        ('exportar_estado_facturas_a_excel',
+         Factura.objects.filter(empresa_id=empresa_id).order_by('fecha', 'id'), True),
+        ('ReconstruccionContable: partición (empresa, mes)',
+         facturas_particion(empresa_id, hoy.year, hoy.month), False),
+        ('rebuild_accounting: totales del año',
+         Factura.objects.filter(fecha__year=hoy.year, naturaleza__in=NATURALEZAS).exclude(estado_sat='Cancelado'), False),
+        ('FacturaAdmin: changelist sin filtro (cursor)',
+         Factura.objects.filter(Q(fecha__lte=hasta) & (Q(fecha__lt=hasta) | Q(id__lt=0))).order_by('-fecha', '-id'), True),
+        ('auditar_gemelos: ingresos del año',
+         Factura.objects.filter(naturaleza='I', fecha__year=hoy.year).order_by('subtotal', 'fecha'), False),
+    ]
+
+
+def desactivar_seqscan(local=False):
+    """En PostgreSQL obliga al planificador a usar índice si puede (SET LOCAL dentro de una transacción)."""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(f"SET {'LOCAL ' if local else ''}enable_seqscan = off")
+
+
+def problemas(plan, ordenada):
+    """Lista de problemas del plan (vacía si la consulta usa índice)."""
+    tabla = re.escape(Factura._meta.db_table)
+    encontrados = []
+    if connection.vendor == 'sqlite':
+        if re.search(rf'SCAN {tabla}\b(?! USING)', plan):
+            encontrados.append('recorrido completo de la tabla')
+        if ordenada and 'TEMP B-TREE FOR ORDER BY' in plan:
+            encontrados.append('ordenamiento fuera del índice')
+    else:
+        if re.search(rf'Seq Scan on {tabla}\b', plan):
+            encontrados.append('Seq Scan')
+        if ordenada and re.search(r'^\s*(->\s*)?Sort\b', plan, re.MULTILINE):
+            encontrados.append('Sort fuera del índice')
+    return encontrados
@@ -0,0 +1,56 @@
+"""
+Reparto de trabajo entre procesos (fork) para servicios por lotes.
+
+repartir() ejecuta una función por cada juego de argumentos, en serie o en
+un ProcessPoolExecutor, y entrega cada resultado al terminar. Lo usan la
+reconstrucción contable (por partición) y la siembra de catálogos (por empresa).
+
+- SQLite admite un solo escritor y fork no existe en todas las plataformas:
+  en esos casos se trabaja en serie (ver workers_efectivos).
+- Los hijos heredan la memoria del proceso, no sus conexiones abiertas: se
+  cierran antes de crear el pool y cada hijo abre la suya en la primera consulta.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from django.db import connection, connections
+from functools import partial
+import multiprocessing
+
+
+def workers_efectivos(workers):
+    """Procesos que realmente se usarán (1 en SQLite o sin fork)."""
+    if workers <= 1 or connection.vendor == 'sqlite':
+        return 1
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        return 1
+    return workers
+
+
+def _en_worker(funcion, args):
+    try:
+        return funcion(*args)
+    finally:
+        connections.close_all()
+
+
+def repartir(funcion, argumentos, workers=1):
+    """
+    Ejecuta funcion(*args) para cada args de 'argumentos'.
+
+    Produce (args, obtener) en el orden en que terminan; obtener() regresa el
+    resultado o lanza la excepción de esa ejecución, así cada servicio decide
+    si un error detiene el resto. La función y sus argumentos deben poder
+    serializarse (pickle) cuando workers > 1.
+    """
+    argumentos = [tuple(args) for args in argumentos]
+    if workers_efectivos(workers) == 1:
+        for args in argumentos:
+            yield args, partial(funcion, *args)
+        return
+
+    connections.close_all()
+    contexto = multiprocessing.get_context('fork')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=contexto) as pool:
+        futuros = {pool.submit(_en_worker, funcion, args): args for args in argumentos}
+        for futuro in as_completed(futuros):
+            yield futuros[futuro], futuro.result
@@ -8,12 +8,15 @@ from django.db import transaction  # <--- MODIFICACIÓN 1: Importar la funcional
 from django.http import FileResponse, HttpResponse, HttpResponseBadRequest
 from .forms import UploadXMLForm
 from .services.xml_processor import procesar_xml_cfdi
+from .services.ingesta_xml import IngestaXML
 from .services.accounting_service import AccountingService
 from .models import Factura, Empresa, CuentaContable, UsuarioEmpresa, MovimientoPoliza, Poliza, PlantillaPoliza
 from .decorators import require_active_empresa
 import logging
 import os
 from .services.export_service import ExportService
+from .utils.consultas import iterar, rango_fechas
+from .utils.paginacion import KeysetPaginationMixin
 import datetime
 import openpyxl
 from openpyxl.styles import Alignment
@@ -77,49 +80,10 @@ def upload_xml(request):
         form = UploadXMLForm(request.POST, request.FILES)
         if form.is_valid():
             files = request.FILES.getlist('xml_files')
-            procesadas = 0
-            errores = 0
-            errores_detalle = []
-
-            for file in files:
-                try:
-                    factura, created = procesar_xml_cfdi(file, file.name, empresa)
-                    # Si se creó la factura, intentamos contabilizarla automáticamente
-                    if created:
-                        try:
-                            from . import tasks as task_module
-                            task_module.enqueue_contabilizar(factura.uuid, request.user.id)
-                            procesadas += 1
-                        except Exception as e:
-                            errores += 1
-                            logger.error(f"Error encolando contabilización {file.name} (UUID={getattr(factura,'uuid',None)}): {e}")
-                            if len(errores_detalle) < 5:
-                                errores_detalle.append(f"{file.name}: encolado fallido: {str(e)[:100]}")
-                    else:
-                        # Archivo ya existía (duplicado)
-                        # Contamos como procesado para el propósito de upload simple
-                        procesadas += 1
-                except Exception as e:
-                    errores += 1
-                    # Log detallado en servidor
-                    logger.error(f"Error procesando {file.name}: {str(e)}")
-                    # Guardar para resumen (máximo 5 para no saturar UI)
-                    if len(errores_detalle) < 5:
-                        errores_detalle.append(f"{file.name}: {str(e)[:100]}")
-
-            # Mensajes consolidados profesionales
-            if procesadas > 0:
-                messages.success(request, f"✅ {procesadas} factura(s) procesada(s) correctamente para {empresa.nombre}.")
-            
-            if errores > 0:
-                error_msg = f"⚠️ {errores} archivo(s) no pudieron procesarse."
-                if errores_detalle:
-                    error_msg += " Primeros errores: " + "; ".join(errores_detalle)
-                if errores > 5:
-                    error_msg += f" (y {errores - 5} más - ver logs del servidor)"
-                messages.warning(request, error_msg)
-                
-            return redirect('dashboard')
+            # Solo se guardan en disco; el worker procesa los XML (tarea 'ingestar_xml')
+            task = IngestaXML.crear_trabajo(empresa, files, usuario_id=request.user.id)
+            messages.info(request, f"📥 {len(files)} archivo(s) recibidos. Se están procesando en segundo plano.")
+            return redirect('resultado_ingesta', task_id=task.id)
     else:
         form = UploadXMLForm()
     
@@ -162,58 +126,59 @@ def carga_masiva_xml(request):
             messages.error(request, "Debe seleccionar al menos un archivo XML.")
             return redirect("carga_masiva_xml")
 
-        procesados = 0
-        duplicados = 0
-        errores = 0
-        errores_detalle = []
-
-        for file in files:
-            try:
-                # procesar_xml_cfdi returns (factura, created)
-                factura, created = procesar_xml_cfdi(file, file.name, empresa)
-                if created:
-                    try:
-                        from . import tasks as task_module
-                        task_module.enqueue_contabilizar(factura.uuid, request.user.id)
-                        procesadas += 1
-                    except Exception as e:
-                        errores += 1
-                        logger.error(f"Error encolando contabilización {file.name} (UUID={getattr(factura,'uuid',None)}): {e}")
-                        if len(errores_detalle) < 5:
-                            errores_detalle.append(f"{file.name}: encolado fallido: {str(e)[:100]}")
-                else:
-                    duplicados += 1
-            except Exception as e:
-                errores += 1
-                # Log detallado en servidor
-                logger.error(f"Error procesando {file.name}: {str(e)}")
-                # Guardar para resumen (máximo 5 para no saturar UI)
-                if len(errores_detalle) < 5:
-                    errores_detalle.append(f"{file.name}: {str(e)[:100]}")
-        
-        # Mensajes consolidados profesionales
-        if procesados > 0:
-            messages.success(request, f"✅ {procesados} factura(s) procesada(s) correctamente.")
-        if duplicados > 0:
-            messages.info(request, f"ℹ️ {duplicados} factura(s) ya existían (duplicadas).")
-        if errores > 0:
-            error_msg = f"⚠️ {errores} archivo(s) fallaron."
-            if errores_detalle:
-                error_msg += " Primeros errores: " + "; ".join(errores_detalle)
-            if errores > 5:
-                error_msg += f" (y {errores - 5} más - revisar logs del servidor)"
-            messages.warning(request, error_msg)
-            
-        return redirect("dashboard")
+        # Solo se guardan en disco; el worker procesa los XML (tarea 'ingestar_xml')
+        task = IngestaXML.crear_trabajo(empresa, files, usuario_id=request.user.id)
+        messages.info(request, f"📥 {len(files)} archivo(s) recibidos. Se están procesando en segundo plano.")
+        return redirect("resultado_ingesta", task_id=task.id)
     
     return render(request, "core/carga_masiva_xml.html", {})
 
+def _tarea_ingesta_de_empresa(task_id, empresa):
+    """Obtiene una tarea 'ingestar_xml' verificando que sea de la empresa activa."""
+    from .models import BackgroundTask
+    task = get_object_or_404(BackgroundTask, pk=task_id, task_type='ingestar_xml')
+    if (task.payload or {}).get('empresa_id') != empresa.id:
+        from django.http import Http404
+        raise Http404("Tarea no encontrada")
+    return task
+
+@login_required
+@require_active_empresa
+def progreso_ingesta(request, task_id):
+    """Progreso (JSON) de una carga de XML en segundo plano"""
+    from django.http import JsonResponse
+    task = _tarea_ingesta_de_empresa(task_id, request.empresa)
+    return JsonResponse({'success': True, **IngestaXML.progreso(task)})
+
+@login_required
+@require_active_empresa
+def resultado_ingesta(request, task_id):
+    """Resultados por archivo de una carga de XML"""
+    task = _tarea_ingesta_de_empresa(task_id, request.empresa)
+    filtro = request.GET.get('estado', '')
+    archivos = task.archivos_ingesta.order_by('id')
+    if filtro:
+        archivos = archivos.filter(estado=filtro)
+    
+    from django.core.paginator import Paginator
+    page_obj = Paginator(archivos, 100).get_page(request.GET.get('page'))
+    
+    return render(request, 'core/resultado_ingesta.html', {
+        'task': task,
+        'progreso': IngestaXML.progreso(task),
+        'page_obj': page_obj,
+        'archivos': page_obj.object_list,
+        'filtro': filtro,
+        'estados': task.archivos_ingesta.model.ESTADO_CHOICES,
+    })
+
 @method_decorator(login_required, name='dispatch')
-class DashboardView(ListView):
+class DashboardView(KeysetPaginationMixin, ListView):
     model = Factura
     template_name = 'core/dashboard.html'
     context_object_name = 'facturas'
     paginate_by = 20
+    keyset_descendente = True
     
     def get_queryset(self):
         # NO auto-select - usuario DEBE seleccionar manualmente
@@ -224,12 +189,13 @@ class DashboardView(ListView):
         # Obtener rango de fechas
         fecha_inicio, fecha_fin = self._get_date_range()
         
-        # Filtrar por empresa y rango de fechas
+        # Filtrar por empresa y rango de fechas (índice empresa + fecha)
+        desde, hasta = rango_fechas(fecha_inicio, fecha_fin)
         queryset = Factura.objects.filter(
             empresa_id=active_id,
-            fecha__date__gte=fecha_inicio,
-            fecha__date__lte=fecha_fin
-        ).select_related('empresa').order_by('-fecha')
+            fecha__gte=desde,
+            fecha__lt=hasta
+        ).select_related('empresa').order_by('-fecha', '-id')
         
         return queryset
     
@@ -340,10 +306,11 @@ class DashboardView(ListView):
             # Esto permite ver totales INMEDIATAMENTE después de carga masiva
             
             # Queryset filtrado por fechas para totales
+            desde, hasta = rango_fechas(fecha_inicio, fecha_fin)
             qs_total = Factura.objects.filter(
                 empresa_id=active_id,
-                fecha__date__gte=fecha_inicio,
-                fecha__date__lte=fecha_fin
+                fecha__gte=desde,
+                fecha__lt=hasta
             )
             
             # INGRESOS: Suma directa de Facturas con naturaleza 'I'
@@ -360,8 +327,8 @@ class DashboardView(ListView):
                 total=Sum('total')
             )['total'] or 0
             
-            # CONTADOR: Total de facturas en el periodo
-            total_facturas = qs_total.count()
+            # CONTADOR: Total de facturas en el periodo (mismo conteo que la paginación)
+            total_facturas = context['paginator'].count
             
             context['total_ingresos'] = total_ingresos
             context['total_egresos'] = total_egresos
@@ -536,7 +503,7 @@ def eliminar_factura(request, pk):
     return render(request, 'core/confirm_delete.html', context)
 
 @method_decorator(login_required, name='dispatch')
-class BandejaContabilizacionView(ListView):
+class BandejaContabilizacionView(KeysetPaginationMixin, ListView):
     model = Factura
     template_name = 'core/bandeja_contabilizacion.html'
     context_object_name = 'facturas_pendientes'
@@ -550,7 +517,7 @@ class BandejaContabilizacionView(ListView):
         return Factura.objects.filter(
             empresa_id=active_id,
             estado_contable='PENDIENTE'
-        ).order_by('fecha')
+        ).order_by('fecha', 'id')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -596,10 +563,18 @@ def validar_sat_lote(request):
     para determinar si están Vigentes o Canceladas.
     
     Si una factura está cancelada, elimina sus pólizas y la marca como EXCLUIDA.
+    
+    Las facturas con resultado fresco o terminal (Cancelado) se omiten según
+    SatRevalidationPolicy, salvo que el JSON incluya "forzar": true.
+    
+    Selecciones mayores a settings.SAT_LOTE_SINCRONO_MAX se encolan como
+    tarea 'validar_sat' y la respuesta incluye la URL de progreso.
     """
+    from django.conf import settings
     from django.http import JsonResponse
-    from django.utils import timezone
-    from .services.sat_status import SatStatusValidator
+    from django.urls import reverse
+    from .services.sat_lote import ValidacionSatLote, SatNoDisponibleError
+    from .tasks import enqueue_validar_sat
     import json
     
     if request.method != 'POST':
@@ -609,6 +584,7 @@ def validar_sat_lote(request):
         # Parsear JSON
         data = json.loads(request.body)
         uuids = data.get('uuids', [])
+        forzar = bool(data.get('forzar', False))
         
         if not uuids:
             return JsonResponse({'success': False, 'error': 'No se proporcionaron UUIDs'}, status=400)
@@ -618,71 +594,32 @@ def validar_sat_lote(request):
         if not empresa_id:
             return JsonResponse({'success': False, 'error': 'No hay empresa activa'}, status=400)
         
-        # Contadores
-        vigentes = 0
-        canceladas = 0
-        no_encontradas = 0
-        errores = 0
+        # Lotes grandes: procesar en segundo plano por bloques
+        if len(uuids) > getattr(settings, 'SAT_LOTE_SINCRONO_MAX', 20):
+            task_id = enqueue_validar_sat(
+                empresa_id, uuids,
+                usuario_id=request.user.id,
+                forzar=forzar,
+            )
+            logger.info(f"📥 Validación SAT de {len(uuids)} facturas encolada (tarea {task_id})")
+            return JsonResponse({
+                'success': True,
+                'en_cola': True,
+                'task_id': task_id,
+                'progreso_url': reverse('progreso_validacion_sat', args=[task_id]),
+                'total': len(uuids),
+            })
         
-        # Procesar cada factura
-        for uuid_str in uuids:
-            try:
-                # Buscar factura
-                factura = Factura.objects.get(uuid=uuid_str, empresa_id=empresa_id)
-                
-                # Validar con SAT
-                logger.info(f"Validando factura {uuid_str} con SAT...")
-                resultado = SatStatusValidator.validar_factura_model(factura)
-                
-                estado_sat = resultado['estado']
-                
-                # Actualizar estado en BD
-                factura.estado_sat = estado_sat
-                factura.ultima_validacion = timezone.now()
-                factura.save()
-                
-                # Contar y tomar acciones
-                if estado_sat == 'Vigente':
-                    vigentes += 1
-                    logger.info(f"✅ Factura {uuid_str}: Vigente")
-                
-                elif estado_sat == 'Cancelado':
-                    canceladas += 1
-                    logger.warning(f"❌ Factura {uuid_str}: CANCELADA - Eliminando pólizas")
-                    
-                    # Eliminar pólizas contables
-                    polizas = Poliza.objects.filter(factura=factura)
-                    if polizas.exists():
-                        MovimientoPoliza.objects.filter(poliza__in=polizas).delete()
-                        polizas.delete()
-                    
-                    # Marcar como excluida
-                    factura.estado_contable = 'EXCLUIDA'
-                    factura.save()
-                
-                elif estado_sat == 'No Encontrado':
-                    no_encontradas += 1
-                    logger.warning(f"⚠️ Factura {uuid_str}: No encontrada en SAT")
-                
-                else:  # Error
-                    errores += 1
-                    logger.error(f"❌ Error validando {uuid_str}: {resultado.get('mensaje')}")
-            
-            except Factura.DoesNotExist:
-                errores += 1
-                logger.error(f"❌ Factura {uuid_str} no encontrada en BD")
-            
-            except Exception as e:
-                errores += 1
-                logger.error(f"❌ Error procesando {uuid_str}: {e}", exc_info=True)
+        try:
+            resumen = ValidacionSatLote.validar_chunk(empresa_id, uuids, forzar=forzar)
+        except SatNoDisponibleError as e:
+            logger.error(f"🔌 {e}")
+            return JsonResponse({'success': False, 'error': str(e)}, status=503)
         
         # Respuesta
         return JsonResponse({
             'success': True,
-            'vigentes': vigentes,
-            'canceladas': canceladas,
-            'no_encontradas': no_encontradas,
-            'errores': errores,
+            **resumen,
             'total': len(uuids)
         })
     
@@ -694,6 +631,24 @@ def validar_sat_lote(request):
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
 
+@login_required
+def progreso_validacion_sat(request, task_id):
+    """
+    Progreso (JSON) de una tarea 'validar_sat' de la empresa activa.
+    La bandeja lo consulta periódicamente mientras la tarea está en curso.
+    """
+    from django.http import JsonResponse
+    from .models import BackgroundTask
+    from .services.sat_lote import ValidacionSatLote
+    
+    empresa_id = get_active_empresa_id(request)
+    task = BackgroundTask.objects.filter(pk=task_id, task_type='validar_sat').first()
+    if not task or not empresa_id or (task.payload or {}).get('empresa_id') != empresa_id:
+        return JsonResponse({'success': False, 'error': 'Tarea no encontrada'}, status=404)
+    
+    return JsonResponse({'success': True, **ValidacionSatLote.progreso(task)})
+
+
 @login_required
 @require_active_empresa
 def cumplimiento_sat(request):
@@ -774,7 +729,7 @@ def cumplimiento_sat_download(request):
 def exportar_estado_facturas_a_excel(request):
     """Genera un archivo Excel consolidado de todas las facturas."""
     empresa = request.empresa
-    facturas = Factura.objects.filter(empresa=empresa).values(
+    facturas = Factura.objects.filter(empresa=empresa).order_by('fecha', 'id').values(
         'uuid', 'fecha', 'emisor_rfc', 'emisor_nombre', 'receptor_rfc', 'receptor_nombre', 'total', 'tipo_comprobante', 'estado_contable'
     )
 
@@ -791,8 +746,8 @@ def exportar_estado_facturas_a_excel(request):
         for cell in col:
             cell.alignment = Alignment(horizontal="center", vertical="center")
 
-    # Agregar datos
-    for factura in facturas:
+    # Agregar datos (por bloques con cursor del servidor en PostgreSQL)
+    for factura in iterar(facturas):
         ws.append([
             str(factura['uuid']),
             factura['fecha'].strftime('%Y-%m-%d'),
@@ -4,6 +4,7 @@ from django.contrib import messages
 from django.http import JsonResponse
 from core.models import Factura, Poliza, MovimientoPoliza
 from core.services.accounting_service import AccountingService
+from core.services.eliminacion_masiva import EliminacionMasiva
 from core.decorators import require_active_empresa
 from decimal import Decimal
 
@@ -50,15 +51,13 @@ def descontabilizar_factura(request, uuid):
     empresa = request.empresa
     factura = get_object_or_404(Factura, uuid=uuid, empresa=empresa)
     
-    try:
-        poliza = Poliza.objects.get(factura=factura)
-        poliza.delete()  # Esto eliminará también los MovimientoPoliza por CASCADE
-        
-        factura.estado_contable = 'PENDIENTE'
-        factura.save()
-        
-        messages.success(request, f'Factura {factura.folio} descontabilizada correctamente.')
-    except Poliza.DoesNotExist:
+    # Sin póliza no se toca el estado (una factura EXCLUIDA debe seguir así)
+    if not Poliza.objects.filter(factura=factura).exists():
         messages.warning(request, 'Esta factura no estaba contabilizada.')
+        return redirect('detalle_contable_xml', uuid=uuid)
+
+    # Póliza y movimientos por SQL directo; la factura vuelve a PENDIENTE
+    EliminacionMasiva.descontabilizar([factura.id])
+    messages.success(request, f'Factura {factura.uuid} descontabilizada correctamente.')
     
     return redirect('detalle_contable_xml', uuid=uuid)
@@ -5,9 +5,34 @@ from django.utils import timezone
 from django.db import transaction
 from django.db.models import Q
 from core.models import Poliza, MovimientoPoliza, CuentaContable, Empresa
+from core.services.catalogo_cuentas import CatalogoCuentas
 from decimal import Decimal
 import json
 
+def _cuentas_de_movimientos(empresa, movimientos_data):
+    """{cuenta_id: cuenta} de los movimientos enviados; falla si alguna no es de la empresa."""
+    ids = {int(m['cuenta_id']) for m in movimientos_data}
+    cuentas = CatalogoCuentas.cuentas_por_id(empresa, ids)
+    if len(cuentas) != len(ids):
+        raise CuentaContable.DoesNotExist(
+            f"Cuenta(s) no encontradas en el catálogo de la empresa: {sorted(ids - set(cuentas))}"
+        )
+    return cuentas
+
+
+def _empresa_de_poliza(request, poliza):
+    """
+    Empresa de la póliza: la de su factura; en pólizas manuales, la de las
+    cuentas de sus movimientos actuales o, si no tiene, la empresa activa.
+    """
+    if poliza.factura_id:
+        return poliza.factura.empresa
+    empresa_id = poliza.movimientopoliza_set.values_list('cuenta__empresa_id', flat=True).first()
+    if empresa_id is None:
+        empresa_id = getattr(getattr(request, 'empresa', None), 'id', None) or request.session.get('active_empresa_id')
+    return Empresa.objects.filter(pk=empresa_id).first() if empresa_id else None
+
+
 @login_required
 def editar_poliza(request, poliza_id):
     """
@@ -33,19 +58,26 @@ def editar_poliza(request, poliza_id):
                         'error': f'La póliza no cuadra. Diferencia: ${diferencia:.2f}'
                     })
                 
+                # Cuentas desde el catálogo en memoria (solo de la empresa de la póliza)
+                empresa = _empresa_de_poliza(request, poliza)
+                if empresa is None:
+                    raise Empresa.DoesNotExist("No se pudo determinar la empresa de la póliza")
+                cuentas = _cuentas_de_movimientos(empresa, movimientos_data)
+                
                 # Eliminar movimientos existentes
                 poliza.movimientopoliza_set.all().delete()
                 
                 # Crear nuevos movimientos
-                for mov_data in movimientos_data:
-                    cuenta = CuentaContable.objects.get(id=mov_data['cuenta_id'])
-                    MovimientoPoliza.objects.create(
+                MovimientoPoliza.objects.bulk_create([
+                    MovimientoPoliza(
                         poliza=poliza,
-                        cuenta=cuenta,
+                        cuenta=cuentas[int(mov_data['cuenta_id'])],
                         debe=Decimal(mov_data['debe']),
                         haber=Decimal(mov_data['haber']),
                         descripcion=mov_data.get('descripcion', '')
                     )
+                    for mov_data in movimientos_data
+                ])
                 
                 # Marcar como editada manualmente
                 poliza.editada_manualmente = True
@@ -68,7 +100,7 @@ def editar_poliza(request, poliza_id):
     movimientos = poliza.movimientopoliza_set.all().order_by('id')
     
     # Obtener empresa de la póliza
-    empresa = poliza.factura.empresa if poliza.factura else Empresa.objects.first()
+    empresa = _empresa_de_poliza(request, poliza)
     cuentas = CuentaContable.objects.filter(empresa=empresa).order_by('codigo')
     
     return render(request, 'core/editar_poliza.html', {
@@ -116,15 +148,17 @@ def crear_poliza_manual(request):
                 )
                 
                 # Crear movimientos
-                for mov_data in movimientos_data:
-                    cuenta = CuentaContable.objects.get(id=mov_data['cuenta_id'])
-                    MovimientoPoliza.objects.create(
+                cuentas = _cuentas_de_movimientos(int(empresa_id), movimientos_data)
+                MovimientoPoliza.objects.bulk_create([
+                    MovimientoPoliza(
                         poliza=poliza,
-                        cuenta=cuenta,
+                        cuenta=cuentas[int(mov_data['cuenta_id'])],
                         debe=Decimal(mov_data['debe']),
                         haber=Decimal(mov_data['haber']),
                         descripcion=mov_data.get('descripcion', '')
                     )
+                    for mov_data in movimientos_data
+                ])
                 
                 return JsonResponse({
                     'success': True,
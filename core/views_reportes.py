@@ -135,11 +135,7 @@ def reporte_estado_resultados(request):
 
     def saldo_para_cuenta(cuenta):
         # Sumar movimientos dentro del periodo
-        movs = MovimientoPoliza.objects.filter(
-            cuenta=cuenta,
-            poliza__fecha__date__gte=fecha_inicio,
-            poliza__fecha__date__lte=fecha_fin
-        )
+        movs = MovimientoPoliza.objects.filter(cuenta=cuenta).del_periodo(fecha_inicio, fecha_fin)
         total_debe = movs.aggregate(total=Sum('debe'))['total'] or Decimal('0')
         total_haber = movs.aggregate(total=Sum('haber'))['total'] or Decimal('0')
 
@@ -254,6 +250,8 @@ def reporte_auxiliares(request):
 
     fecha_inicio = parse_date(fecha_inicio_str)
     fecha_fin = parse_date(fecha_fin_str)
+    if not fecha_inicio or not fecha_fin:
+        return HttpResponse("Fechas inválidas.", status=400)
 
     try:
         cuenta = CuentaContable.objects.get(id=cuenta_id, empresa=empresa)
@@ -262,6 +260,8 @@ def reporte_auxiliares(request):
 
     movimientos = MovimientoPoliza.objects.filter(
         cuenta=cuenta,
+        ejercicio__gte=fecha_inicio.year,
+        ejercicio__lte=fecha_fin.year,
         poliza__fecha__range=[fecha_inicio, fecha_fin]
     ).select_related('poliza', 'poliza__factura').order_by('poliza__fecha', 'id')
 
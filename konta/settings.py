@@ -77,25 +77,81 @@ WSGI_APPLICATION = 'konta.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-# Configuración por defecto: SQLite (Desarrollo simple)
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Motor por variable de entorno: DB_ENGINE=sqlite (default, desarrollo) | postgres
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite').lower()
+
+if DB_ENGINE in ('postgres', 'postgresql'):
+    # PostgreSQL (Producción): web y worker escriben en paralelo sin "database is locked"
+    # DB_POOL=1 usa el pool de psycopg 3 (psycopg[pool]); si no, conexiones persistentes.
+    DB_POOL = os.environ.get('DB_POOL', '0') == '1'
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'konta_db'),
+            'USER': os.environ.get('DB_USER', 'postgres'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            # El pool no admite conexiones persistentes (las administra él)
+            'CONN_MAX_AGE': 0 if DB_POOL else int(os.environ.get('DB_CONN_MAX_AGE', '600')),
+            # Verifica la conexión reutilizada antes de cada request
+            'CONN_HEALTH_CHECKS': True,
+            # Detrás de PgBouncer en modo transacción los cursores del servidor no sobreviven
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DB_DISABLE_SERVER_SIDE_CURSORS', '0') == '1',
+            'OPTIONS': {
+                'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', '5')),
+                'application_name': os.environ.get('DB_APPLICATION_NAME', 'konta'),
+            },
+            # python manage.py test crea/destruye esta base en el mismo servidor
+            'TEST': {
+                'NAME': os.environ.get('DB_TEST_NAME', 'test_konta_db'),
+            },
+        }
     }
-}
+    if DB_POOL:
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '10')),
+            'timeout': int(os.environ.get('DB_POOL_TIMEOUT', '10')),
+        }
+else:
+    # SQLite (Desarrollo simple / despliegues pequeños)
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # busy timeout: espera hasta N segundos por el candado de escritura en lugar de fallar con "database is locked"
+                'timeout': int(os.environ.get('DB_SQLITE_TIMEOUT', '30')),
+                # BEGIN IMMEDIATE: una transacción toma el candado al iniciar y no al
+                # subir de lectura a escritura, donde SQLite no puede esperar
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
+    }
+    if os.environ.get('DB_SQLITE_WAL', '1') == '1':
+        # WAL: los lectores (reportes, dashboard) no se bloquean mientras hay un escritor
+        DATABASES['default']['OPTIONS']['init_command'] = (
+            'PRAGMA journal_mode=WAL;'
+            'PRAGMA synchronous=NORMAL;'
+            f"PRAGMA mmap_size={int(os.environ.get('DB_SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))};"
+        )
+
+# Archivo de candado del escritor único de tareas en SQLite (core/utils/escritor_unico.py)
+SQLITE_WRITER_LOCK = os.environ.get('SQLITE_WRITER_LOCK', str(BASE_DIR / 'tmp' / 'sqlite-writer.lock'))
 
-# Configuración opcional: PostgreSQL (Producción / Avanzado)
-# DATABASES = {
-#     'default': {
-#         'ENGINE': 'django.db.backends.postgresql',
-#         'NAME': 'konta_db',
-#         'USER': 'postgres',
-#         'PASSWORD': 'password',
-#         'HOST': 'localhost',
-#         'PORT': '5432',
-#     }
-# }
+# Filas por bloque al recorrer exportaciones/reportes grandes (core/utils/consultas.py)
+DB_ITERATOR_CHUNK_SIZE = int(os.environ.get('DB_ITERATOR_CHUNK_SIZE', '2000'))
+
+# Conteos de listados paginados (core/utils/paginacion.py): hasta CONTEO_EXACTO_HASTA
+# filas se cuenta exacto en cada petición; por encima se usa la estimación del
+# planificador (PostgreSQL) o un conteo guardado en caché CONTEO_CACHE_SEGUNDOS
+CONTEO_EXACTO_HASTA = int(os.environ.get('CONTEO_EXACTO_HASTA', '10000'))
+CONTEO_CACHE_SEGUNDOS = int(os.environ.get('CONTEO_CACHE_SEGUNDOS', '300'))
+
+# Widget de tareas del índice del admin (core/templatetags/admin_metrics.py)
+ADMIN_METRICAS_CACHE_SEGUNDOS = int(os.environ.get('ADMIN_METRICAS_CACHE_SEGUNDOS', '30'))
+ADMIN_METRICAS_LIMITE = int(os.environ.get('ADMIN_METRICAS_LIMITE', '10000'))
 
 
 # Password validation
@@ -168,9 +224,21 @@ SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SAMESITE = 'Lax'
 
 # --- CONFIGURACIÓN PARA SUBIDA MASIVA (SOLUCIÓN AL ERROR) ---
+# Los XML subidos se guardan aquí y el worker los procesa (tarea 'ingestar_xml')
+INGESTA_SPOOL_DIR = os.environ.get('INGESTA_SPOOL_DIR', str(BASE_DIR / 'tmp' / 'ingesta'))
+
 # Permite subir hasta 2000 archivos en una sola selección (Default de Django es 100)
 DATA_UPLOAD_MAX_NUMBER_FILES = 2000
 
 # Aumenta el límite de memoria de la petición a 5MB (Default 2.5MB)
 # Esto ayuda si subes muchos XML juntos para que no corte la conexión.
-DATA_UPLOAD_MAX_MEMORY_SIZE = 5242880
\ No newline at end of file
+DATA_UPLOAD_MAX_MEMORY_SIZE = 5242880
+# --- CONSULTA DE ESTATUS SAT ---
+# Permite apuntar el cliente a un stub local (scripts/sat_stub_fallas.py) en pruebas
+SAT_CONSULTA_ENDPOINT = os.environ.get(
+    'SAT_CONSULTA_ENDPOINT',
+    'https://consultaqr.facturaelectronica.sat.gob.mx/ConsultaCFDIService.svc'
+)
+
+# Validación SAT desde la bandeja: selecciones mayores se procesan como tarea de fondo
+SAT_LOTE_SINCRONO_MAX = int(os.environ.get('SAT_LOTE_SINCRONO_MAX', '20'))
@@ -0,0 +1,135 @@
+"""
+Benchmark del extractor de CFDI: streaming (lxml.iterparse) vs satcfdi.
+
+Genera un corpus de CFDI 3.3 y 4.0 timbrados (sin sello válido) con un
+número variable de conceptos, verifica que ambos caminos extraen los mismos
+datos y mide el tiempo de cada uno.
+
+Uso:
+    python scripts/benchmark_xml_parser.py
+    python scripts/benchmark_xml_parser.py --archivos 2000 --max-conceptos 40
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from decimal import Decimal
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'konta.settings')
+import django
+django.setup()
+
+from core.services.cfdi_fast_parser import _extraer_rapido, _extraer_satcfdi, leer_bytes
+
+NAMESPACES = {
+    '3.3': 'http://www.sat.gob.mx/cfd/3',
+    '4.0': 'http://www.sat.gob.mx/cfd/4',
+}
+
+
+def generar_cfdi(version, n_conceptos):
+    """Genera el XML de un CFDI de ingreso con IVA trasladado y retención ISR."""
+    es_40 = version == '4.0'
+    objeto_imp = ' ObjetoImp="02"' if es_40 else ''
+    conceptos = []
+    subtotal = Decimal('0.00')
+    iva = Decimal('0.00')
+    isr = Decimal('0.00')
+    for i in range(n_conceptos):
+        importe = Decimal(random.randint(100, 50000)) / 100
+        t = (importe * Decimal('0.16')).quantize(Decimal('0.01'))
+        r = (importe * Decimal('0.10')).quantize(Decimal('0.01'))
+        subtotal += importe
+        iva += t
+        isr += r
+        conceptos.append(
+            f'<cfdi:Concepto ClaveProdServ="84111506" Cantidad="1" ClaveUnidad="E48" '
+            f'Descripcion="Servicio profesional {i}" ValorUnitario="{importe}" Importe="{importe}"{objeto_imp}>'
+            f'<cfdi:Impuestos><cfdi:Traslados><cfdi:Traslado Base="{importe}" Impuesto="002" '
+            f'TipoFactor="Tasa" TasaOCuota="0.160000" Importe="{t}"/></cfdi:Traslados>'
+            f'<cfdi:Retenciones><cfdi:Retencion Base="{importe}" Impuesto="001" TipoFactor="Tasa" '
+            f'TasaOCuota="0.100000" Importe="{r}"/></cfdi:Retenciones></cfdi:Impuestos></cfdi:Concepto>'
+        )
+    total = subtotal + iva - isr
+    receptor_40 = ' DomicilioFiscalReceptor="06000" RegimenFiscalReceptor="601"' if es_40 else ''
+    exportacion = ' Exportacion="01"' if es_40 else ''
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?>'
+        f'<cfdi:Comprobante xmlns:cfdi="{NAMESPACES[version]}" '
+        f'xmlns:tfd="http://www.sat.gob.mx/TimbreFiscalDigital" '
+        f'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" Version="{version}" Serie="A" '
+        f'Folio="{random.randint(1, 99999)}" Fecha="2025-{random.randint(1, 12):02d}-15T10:11:12" '
+        f'SubTotal="{subtotal}" Moneda="MXN" Total="{total}" TipoDeComprobante="I"{exportacion} '
+        f'MetodoPago="PUE" LugarExpedicion="06000" NoCertificado="00001000000500000000" '
+        f'Certificado="" Sello="">'
+        f'<cfdi:Emisor Rfc="AAA010101AAA" Nombre="EMISOR DE PRUEBA" RegimenFiscal="601"/>'
+        f'<cfdi:Receptor Rfc="BBB010101BBB" Nombre="RECEPTOR DE PRUEBA" UsoCFDI="G03"{receptor_40}/>'
+        f'<cfdi:Conceptos>{"".join(conceptos)}</cfdi:Conceptos>'
+        f'<cfdi:Impuestos TotalImpuestosRetenidos="{isr}" TotalImpuestosTrasladados="{iva}">'
+        f'<cfdi:Retenciones><cfdi:Retencion Impuesto="001" Importe="{isr}"/></cfdi:Retenciones>'
+        f'<cfdi:Traslados><cfdi:Traslado Base="{subtotal}" Impuesto="002" TipoFactor="Tasa" '
+        f'TasaOCuota="0.160000" Importe="{iva}"/></cfdi:Traslados></cfdi:Impuestos>'
+        f'<cfdi:Complemento><tfd:TimbreFiscalDigital Version="1.1" UUID="{str(uuid.uuid4()).upper()}" '
+        f'FechaTimbrado="2025-01-01T00:00:00" RfcProvCertif="SAT970701NN3" SelloCFD="" '
+        f'NoCertificadoSAT="00001000000500000000" SelloSAT=""/></cfdi:Complemento>'
+        f'</cfdi:Comprobante>'
+    )
+
+
+def medir(nombre, funcion, rutas):
+    inicio = time.perf_counter()
+    resultados = [funcion(leer_bytes(ruta)) for ruta in rutas]
+    duracion = time.perf_counter() - inicio
+    print(f'   {nombre:<10} {duracion:8.3f}s  ({len(rutas) / duracion:8.1f} archivos/s)')
+    return resultados, duracion
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark extractor CFDI')
+    parser.add_argument('--archivos', type=int, default=500)
+    parser.add_argument('--max-conceptos', type=int, default=20)
+    parser.add_argument('--semilla', type=int, default=2025)
+    opciones = parser.parse_args()
+    random.seed(opciones.semilla)
+
+    with tempfile.TemporaryDirectory() as directorio:
+        rutas = []
+        for i in range(opciones.archivos):
+            version = '3.3' if i % 2 else '4.0'
+            ruta = os.path.join(directorio, f'cfdi_{i:05d}.xml')
+            with open(ruta, 'w', encoding='utf-8') as fh:
+                fh.write(generar_cfdi(version, random.randint(1, opciones.max_conceptos)))
+            rutas.append(ruta)
+
+        print('=' * 60)
+        print('BENCHMARK: Extracción de CFDI')
+        print('=' * 60)
+        print(f'Corpus: {opciones.archivos} archivos (3.3 y 4.0), 1-{opciones.max_conceptos} conceptos')
+        print('-' * 60)
+
+        actuales, t_actual = medir('satcfdi', _extraer_satcfdi, rutas)
+        rapidos, t_rapido = medir('rápido', _extraer_rapido, rutas)
+
+        diferencias = 0
+        for a, r in zip(actuales, rapidos):
+            a = {k: v for k, v in a.items() if k != 'parser'}
+            r = {k: v for k, v in r.items() if k != 'parser'}
+            if a != r:
+                diferencias += 1
+
+        print('-' * 60)
+        print(f'   Aceleración: {t_actual / t_rapido:.1f}x')
+        if diferencias:
+            print(f'❌ {diferencias} archivo(s) con datos distintos entre extractores')
+        else:
+            print('✅ Ambos extractores producen datos idénticos')
+        print('=' * 60)
+
+
+if __name__ == '__main__':
+    main()
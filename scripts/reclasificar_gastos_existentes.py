@@ -11,7 +11,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'konta.settings')
 django.setup()
 
 from core.models import Empresa, CuentaContable, MovimientoPoliza, Poliza
-from core.utils.clasificador_gastos import clasificar_gasto_por_concepto
+from core.services.clasificador_gastos import ClasificadorGastos
 from django.db import transaction
 
 print("=" * 80)
@@ -48,7 +48,7 @@ print(f"\n📊 Cuenta a reclasificar: {cuenta_default.codigo} - {cuenta_default.
 # Buscar todos los movimientos en esta cuenta
 movimientos = MovimientoPoliza.objects.filter(
     cuenta=cuenta_default
-).select_related('poliza__factura')
+).select_related('poliza__factura').prefetch_related('poliza__factura__conceptos')
 
 print(f"   Total de movimientos: {movimientos.count()}")
 
@@ -56,7 +56,8 @@ if movimientos.count() == 0:
     print("\n✅ No hay movimientos para reclasificar")
     exit()
 
-# Clasificar cada movimiento
+# Clasificar cada movimiento (reglas de la empresa, memorizadas por concepto)
+clasificador = ClasificadorGastos.para_empresa(empresa)
 reclasificaciones = {}
 
 for mov in movimientos:
@@ -65,14 +66,10 @@ for mov in movimientos:
     
     factura = mov.poliza.factura
     
-    # Obtener concepto
-    concepto = getattr(factura, 'concepto', '') or mov.descripcion or ""
-    
-    # Clasificar
-    codigo_nuevo = clasificar_gasto_por_concepto(
-        concepto=concepto,
-        emisor_rfc=factura.emisor_rfc
-    )
+    # Clasificar por los conceptos de la factura
+    conceptos = list(factura.conceptos.all())
+    concepto = conceptos[0].descripcion if conceptos else (mov.descripcion or "")
+    codigo_nuevo = clasificador.clasificar_factura(factura, conceptos)
     
     if codigo_nuevo not in reclasificaciones:
         reclasificaciones[codigo_nuevo] = []
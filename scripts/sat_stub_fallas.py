@@ -0,0 +1,142 @@
+"""
+Stub local del servicio de Consulta CFDI del SAT con inyección de fallas.
+
+Sirve respuestas SOAP válidas ('Vigente' o 'Cancelado') y, según las tasas
+configuradas, inyecta latencia, timeouts y errores HTTP 500 para ejercitar
+los reintentos, el backoff y el circuit breaker de SatStatusValidator.
+
+Uso:
+    # Solo servir el stub (apuntar la app con SAT_CONSULTA_ENDPOINT)
+    python scripts/sat_stub_fallas.py --servir --puerto 8765 --tasa-500 0.3
+
+    # Prueba autocontenida: levanta el stub y ejecuta N consultas
+    python scripts/sat_stub_fallas.py --consultas 50 --tasa-500 0.5 --tasa-timeout 0.1
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RESPUESTA_SOAP = """<?xml version="1.0" encoding="utf-8"?>
+<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/">
+  <s:Body>
+    <ConsultaResponse xmlns="http://tempuri.org/">
+      <ConsultaResult xmlns:a="http://schemas.datacontract.org/2004/07/Sat.Cfdi.Negocio.ConsultaCfdi.Servicio" xmlns:i="http://www.w3.org/2001/XMLSchema-instance">
+        <CodigoEstatus xmlns="http://tempuri.org/">S - Comprobante obtenido satisfactoriamente.</CodigoEstatus>
+        <Estado xmlns="http://tempuri.org/">{estado}</Estado>
+      </ConsultaResult>
+    </ConsultaResponse>
+  </s:Body>
+</s:Envelope>"""
+
+
+def crear_handler(opciones):
+    class SatStubHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            longitud = int(self.headers.get('Content-Length', 0))
+            self.rfile.read(longitud)
+
+            if opciones.latencia:
+                time.sleep(random.uniform(0, opciones.latencia))
+
+            dado = random.random()
+            if dado < opciones.tasa_timeout:
+                # Más largo que el timeout de lectura del cliente
+                time.sleep(opciones.duracion_timeout)
+            elif dado < opciones.tasa_timeout + opciones.tasa_500:
+                self.send_response(500)
+                self.end_headers()
+                self.wfile.write(b'Internal Server Error')
+                return
+
+            estado = 'Cancelado' if random.random() < opciones.tasa_cancelado else 'Vigente'
+            cuerpo = RESPUESTA_SOAP.format(estado=estado)
+            if estado == 'Cancelado':
+                cuerpo = cuerpo.replace('S - Comprobante obtenido satisfactoriamente.', 'Cancelado')
+            data = cuerpo.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/xml; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return SatStubHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stub SAT con inyección de fallas')
+    parser.add_argument('--puerto', type=int, default=8765)
+    parser.add_argument('--servir', action='store_true', help='Solo servir el stub')
+    parser.add_argument('--consultas', type=int, default=30)
+    parser.add_argument('--latencia', type=float, default=0.05, help='Latencia aleatoria máxima (s)')
+    parser.add_argument('--tasa-500', type=float, default=0.3)
+    parser.add_argument('--tasa-timeout', type=float, default=0.05)
+    parser.add_argument('--duracion-timeout', type=float, default=3.0)
+    parser.add_argument('--tasa-cancelado', type=float, default=0.1)
+    opciones = parser.parse_args()
+
+    servidor = ThreadingHTTPServer(('127.0.0.1', opciones.puerto), crear_handler(opciones))
+    endpoint = f'http://127.0.0.1:{opciones.puerto}/ConsultaCFDIService.svc'
+
+    if opciones.servir:
+        print(f'Stub SAT escuchando en {endpoint}')
+        servidor.serve_forever()
+        return
+
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+
+    # Cargar Django apuntando al stub
+    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    sys.path.insert(0, project_root)
+    os.environ['SAT_CONSULTA_ENDPOINT'] = endpoint
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'konta.settings')
+    import django
+    django.setup()
+
+    from core.services.sat_status import SatStatusValidator
+    SatStatusValidator.CONFIG.update({
+        'TIMEOUT_CONEXION': 1,
+        'TIMEOUT_LECTURA': 1,
+        'BACKOFF_BASE': 0.05,
+        'BACKOFF_MAX': 0.5,
+    })
+    SatStatusValidator.circuito.tiempo_apertura = 2
+
+    print('=' * 60)
+    print(f'PRUEBA DE RESILIENCIA SAT ({opciones.consultas} consultas)')
+    print(f'500: {opciones.tasa_500:.0%} | timeout: {opciones.tasa_timeout:.0%} | endpoint: {endpoint}')
+    print('=' * 60)
+
+    conteo = {}
+    inicio = time.monotonic()
+    for i in range(opciones.consultas):
+        resultado = SatStatusValidator.validar_cfdi(
+            uuid=f'00000000-0000-0000-0000-{i:012d}',
+            rfc_emisor='AAA010101AAA',
+            rfc_receptor='BBB010101BBB',
+            total='116.00',
+        )
+        clave = resultado['estado'] + (' (transitorio)' if resultado.get('transitorio') else '')
+        conteo[clave] = conteo.get(clave, 0) + 1
+    duracion = time.monotonic() - inicio
+
+    print('\n📊 Resultados:')
+    for clave, n in sorted(conteo.items()):
+        print(f'   {clave}: {n}')
+
+    metricas = SatStatusValidator.metricas()
+    print('\n📈 Métricas del cliente:')
+    for clave, valor in metricas.items():
+        print(f'   {clave}: {valor:.3f}' if isinstance(valor, float) else f'   {clave}: {valor}')
+    print(f'\n⏱️  Duración total: {duracion:.2f}s')
+    servidor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
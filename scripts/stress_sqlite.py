@@ -0,0 +1,151 @@
+"""
+Prueba de carga del modo SQLite: N escritores y M lectores concurrentes.
+
+Trabaja sobre una copia temporal de la base configurada (no toca los datos
+reales). Los escritores imitan a los workers: insertan y actualizan una
+BackgroundTask por operación, dentro de escritor_unico() salvo con
+--sin-escritor-unico. Los lectores imitan al dashboard: conteos y sumas de
+facturas por estado. Reporta operaciones por segundo, latencias y errores
+("database is locked"); termina con código 1 si hubo errores.
+
+Uso:
+    python scripts/stress_sqlite.py
+    python scripts/stress_sqlite.py --escritores 8 --lectores 8 --segundos 20
+    DB_SQLITE_WAL=0 python scripts/stress_sqlite.py --sin-escritor-unico   # comparación
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'konta.settings')
+
+
+def _configurar_django():
+    import django
+    django.setup()
+
+
+def escritor(indice, segundos, con_escritor_unico, resultados):
+    _configurar_django()
+    from contextlib import nullcontext
+    from django.db import OperationalError, connection, transaction
+    from core.models import BackgroundTask
+    from core.utils.escritor_unico import escritor_unico
+
+    latencias, errores = [], []
+    fin = time.monotonic() + segundos
+    while time.monotonic() < fin:
+        inicio = time.perf_counter()
+        try:
+            with escritor_unico() if con_escritor_unico else nullcontext():
+                with transaction.atomic():
+                    task = BackgroundTask.objects.create(
+                        task_type='stress_sqlite', status='PENDING', payload={'escritor': indice}
+                    )
+                    BackgroundTask.objects.filter(pk=task.pk, status='PENDING').update(status='COMPLETED')
+            latencias.append(time.perf_counter() - inicio)
+        except OperationalError as e:
+            errores.append(str(e))
+    connection.close()
+    resultados.put(('escritor', latencias, errores))
+
+
+def lector(indice, segundos, resultados):
+    _configurar_django()
+    from django.db import OperationalError, connection
+    from django.db.models import Count, Sum
+    from core.models import BackgroundTask, Factura
+
+    latencias, errores = [], []
+    fin = time.monotonic() + segundos
+    while time.monotonic() < fin:
+        inicio = time.perf_counter()
+        try:
+            list(Factura.objects.values('estado_contable').annotate(n=Count('id'), total=Sum('total')))
+            BackgroundTask.objects.filter(status='PENDING').count()
+            latencias.append(time.perf_counter() - inicio)
+        except OperationalError as e:
+            errores.append(str(e))
+    connection.close()
+    resultados.put(('lector', latencias, errores))
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--escritores', type=int, default=4)
+    parser.add_argument('--lectores', type=int, default=4)
+    parser.add_argument('--segundos', type=float, default=10)
+    parser.add_argument('--sin-escritor-unico', action='store_true', help='Escritores sin el candado de escritor único')
+    args = parser.parse_args()
+
+    # Copia consistente de la base configurada (API de backup de SQLite)
+    _configurar_django()
+    from django.conf import settings
+    from django.db import connection
+    if connection.vendor != 'sqlite':
+        print('❌ La prueba es para el modo SQLite (DB_ENGINE=sqlite)')
+        return 2
+    origen = str(settings.DATABASES['default']['NAME'])
+    directorio = tempfile.mkdtemp(prefix='konta-stress-')
+    copia = os.path.join(directorio, 'stress.sqlite3')
+    with sqlite3.connect(origen) as fuente, sqlite3.connect(copia) as destino:
+        fuente.backup(destino)
+    connection.close()
+    # Los procesos hijos abren la copia; el candado también queda en el directorio temporal
+    os.environ['DB_NAME'] = copia
+    os.environ['SQLITE_WRITER_LOCK'] = os.path.join(directorio, 'writer.lock')
+
+    contexto = multiprocessing.get_context('spawn')
+    resultados = contexto.Queue()
+    procesos = [
+        contexto.Process(target=escritor, args=(i, args.segundos, not args.sin_escritor_unico, resultados))
+        for i in range(args.escritores)
+    ] + [
+        contexto.Process(target=lector, args=(i, args.segundos, resultados))
+        for i in range(args.lectores)
+    ]
+
+    print(f"SQLite stress: {args.escritores} escritores, {args.lectores} lectores, {args.segundos:.0f}s "
+          f"({'sin' if args.sin_escritor_unico else 'con'} escritor único, WAL={os.environ.get('DB_SQLITE_WAL', '1')})")
+    for proceso in procesos:
+        proceso.start()
+    por_tipo = {'escritor': ([], []), 'lector': ([], [])}
+    for _ in procesos:
+        tipo, latencias, errores = resultados.get()
+        por_tipo[tipo][0].extend(latencias)
+        por_tipo[tipo][1].extend(errores)
+    for proceso in procesos:
+        proceso.join()
+    shutil.rmtree(directorio, ignore_errors=True)
+
+    total_errores = 0
+    print(f"{'':10} {'ops':>8} {'ops/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'errores':>8}")
+    for tipo, (latencias, errores) in por_tipo.items():
+        total_errores += len(errores)
+        print(
+            f"{tipo + 'es':10} {len(latencias):8d} {len(latencias) / args.segundos:8.1f} "
+            f"{percentil(latencias, 0.5) * 1000:8.1f} {percentil(latencias, 0.95) * 1000:8.1f} "
+            f"{max(latencias, default=0) * 1000:8.1f} {len(errores):8d}"
+        )
+        for mensaje in sorted(set(errores))[:3]:
+            print(f"   ⚠️  {mensaje}")
+    print('✅ Sin errores de bloqueo' if not total_errores else f'❌ {total_errores} errores')
+    return 1 if total_errores else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
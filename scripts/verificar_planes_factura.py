@@ -0,0 +1,59 @@
+"""
+Verifica con EXPLAIN que las consultas frecuentes sobre Factura usan índice.
+
+Construye cada consulta igual que la vista o el comando que la ejecuta
+(dashboard, bandeja, exportación a Excel, admin, reconstrucción, auditoría
+de gemelos) y revisa el plan:
+- SQLite: falla si aparece 'SCAN core_factura' sin índice, o un ordenamiento
+  en B-tree temporal en consultas que deben salir ordenadas del índice.
+- PostgreSQL: desactiva enable_seqscan en la sesión (con pocas filas el
+  planificador prefiere el Seq Scan aunque exista índice) y falla si aún
+  aparece 'Seq Scan on core_factura' o un Sort en las consultas ordenadas.
+
+Termina con código 1 si alguna consulta perdió su índice. Las consultas y
+la revisión del plan están en core/utils/planes_factura.py; la misma
+verificación corre en la suite (core.tests.test_planes_factura).
+
+Uso:
+    python scripts/verificar_planes_factura.py
+    python scripts/verificar_planes_factura.py --verbose    # imprime los planes
+"""
+import argparse
+import os
+import sys
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'konta.settings')
+
+import django
+django.setup()
+
+from core.models import Empresa
+from core.utils.planes_factura import consultas, desactivar_seqscan, problemas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--verbose', action='store_true', help='Imprime el plan de cada consulta')
+    args = parser.parse_args()
+
+    empresa = Empresa.objects.order_by('id').first()
+    empresa_id = empresa.id if empresa else 1
+    desactivar_seqscan()
+
+    fallidas = 0
+    for nombre, qs, ordenada in consultas(empresa_id):
+        plan = qs.explain()
+        encontrados = problemas(plan, ordenada)
+        fallidas += bool(encontrados)
+        print(f"{'❌' if encontrados else '✅'} {nombre}{': ' + ', '.join(encontrados) if encontrados else ''}")
+        if args.verbose or encontrados:
+            for linea in plan.splitlines():
+                print(f'      {linea}')
+    print('✅ Todas las consultas usan índice' if not fallidas else f'❌ {fallidas} consultas sin índice')
+    return 1 if fallidas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())